@@ -0,0 +1,38 @@
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None, database=None):
+    # Point Django at a throwaway database so benchmarks never touch db.sqlite3.
+    # database: extra keys for DATABASES['default'], e.g. to compare connection settings.
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projectlingap.settings')
+
+    from django.conf import settings
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix='lingap-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DATABASES['default'].update(database or {})
+    settings.DEBUG = False
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def time_call(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
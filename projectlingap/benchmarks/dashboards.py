@@ -0,0 +1,129 @@
+"""
+Compare dashboard latency when the views run under WSGI (reads one after another) and under ASGI
+(independent reads gathered concurrently), with several clients hitting them at once.
+
+    python benchmarks/dashboards.py --years 2 --clients 8 --requests 200
+
+Caches are cleared before every request (pass --warm to keep them), so the numbers are for the
+database reads the dashboards actually make.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from common import setup_django
+
+
+def percentiles(timings):
+    cuts = statistics.quantiles(timings, n=100)
+    return statistics.median(timings), cuts[94]
+
+
+def run_wsgi(url, user, clients, requests, warm):
+    from django.core.cache import cache
+    from django.test import Client
+
+    timings, lock = [], threading.Lock()
+    per_client = requests // clients
+
+    def worker():
+        from django.db import connection
+        client = Client()
+        client.force_login(user)
+        try:
+            for _ in range(per_client):
+                if not warm:
+                    cache.clear()
+                started = time.perf_counter()
+                assert client.get(url).status_code == 200
+                with lock:
+                    timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings
+
+
+def run_asgi(url, user, clients, requests, warm):
+    from django.core.cache import cache
+    from django.test import AsyncClient
+
+    timings = []
+    per_client = requests // clients
+
+    async def worker():
+        client = AsyncClient()
+        await client.aforce_login(user)
+        for _ in range(per_client):
+            if not warm:
+                cache.clear()
+            started = time.perf_counter()
+            assert (await client.get(url)).status_code == 200
+            timings.append((time.perf_counter() - started) * 1000)
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(clients)))
+
+    # As projectlingap/asgi.py does: no persistent connections under ASGI.
+    from django.db import connections
+    saved = {alias: connections[alias].settings_dict['CONN_MAX_AGE'] for alias in connections}
+    for alias in connections:
+        connections[alias].settings_dict['CONN_MAX_AGE'] = 0
+    try:
+        asyncio.run(main())
+    finally:
+        for alias, max_age in saved.items():
+            connections[alias].settings_dict['CONN_MAX_AGE'] = max_age
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="Requests per mode and dashboard.")
+    parser.add_argument('--warm', action='store_true', help="Keep the stock summary/forecast caches.")
+    parser.add_argument('--db', help="SQLite file to use (defaults to a temp file).")
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    from django.conf import settings
+    settings.ALLOWED_HOSTS = ['*']
+
+    from forecast import seed
+    print(f"Seeding {args.years} years of history into {db_path} ...")
+    seed(args.years, units_per_day=80, requests_per_day=60)
+
+    from django.contrib.auth.models import User
+    from django.urls import reverse
+    from core.models import BloodInventory, BloodRequest, Donor
+
+    staff = User.objects.create_user('bench-staff', is_staff=True)
+    donor_user = User.objects.create_user('bench-donor')
+    donor = Donor.objects.create(user=donor_user, blood_type='O+', contact_no='0917', address='Cavite')
+    BloodInventory.objects.filter(pk__in=BloodInventory.objects.order_by('-pk').values('pk')[:50]).update(donor=donor)
+    BloodRequest.objects.filter(pk__in=BloodRequest.objects.order_by('-pk').values('pk')[:50]).update(requestor=donor_user)
+
+    print(f"{args.clients} concurrent clients, {args.requests} requests per row, "
+          f"{'warm' if args.warm else 'cold'} caches\n")
+    print(f"{'dashboard':<22} {'mode':<6} {'p50 ms':>9} {'p95 ms':>9}")
+    admin = User.objects.create_superuser('bench-admin', 'admin@example.com', 'bench')
+    for name, url, user in (
+        ('redcross_dashboard', reverse('redcross_dashboard'), staff),
+        ('superuser_dashboard', reverse('superuser_dashboard'), admin),
+        ('donor_dashboard', reverse('donor_dashboard'), donor_user),
+    ):
+        for mode, runner in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+            p50, p95 = percentiles(runner(url, user, args.clients, args.requests, args.warm))
+            print(f"{name:<22} {mode:<6} {p50:>9.2f} {p95:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Seed several years of collections, expiries and requests and time the days-of-supply forecast
+shown on the red cross dashboard (cold, i.e. without its cache).
+
+    python benchmarks/forecast.py --years 5 --units-per-day 80 --requests-per-day 60
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from common import setup_django, time_call
+
+
+def seed(years, units_per_day, requests_per_day):
+    from django.db import connection
+    from django.utils import timezone
+    from core.models import BloodInventory, BloodRequest, Donor
+
+    now = timezone.now()
+    groups = [code for code, _ in Donor.BLOOD_TYPES]
+    weights = [30, 2, 8, 1, 4, 1, 38, 1]  # rough Philippine ABO/Rh mix, in BLOOD_TYPES order
+    rng = random.Random(42)
+    days = years * 365
+
+    batch, serial = [], 0
+    for day in range(days):
+        for _ in range(rng.randint(units_per_day // 2, units_per_day * 3 // 2)):
+            collected = now - timedelta(days=day, minutes=rng.randint(0, 1439))
+            expiry = collected + timedelta(days=42)
+            status = 'AVAILABLE' if expiry > now else rng.choice(['DISTRIBUTED'] * 4 + ['EXPIRED'])
+            serial += 1
+            batch.append(BloodInventory(
+                serial_number=f"FC-{serial:09d}",
+                blood_group=rng.choices(groups, weights)[0],
+                status=status,
+                date_collected=collected,
+                expiry_date=expiry,
+            ))
+        if len(batch) >= 5000:
+            BloodInventory.objects.bulk_create(batch)
+            batch = []
+    BloodInventory.objects.bulk_create(batch)
+
+    batch = []
+    for i in range(days * requests_per_day):
+        batch.append(BloodRequest(
+            patient_name=f"Patient {i}",
+            patient_blood_type=rng.choices(groups, weights)[0],
+            hospital_name="General Hospital",
+            hospital_address="Cavite",
+            physician_name="Santos",
+            physician_license="LIC-1",
+            quantity=rng.randint(1, 3),
+            status=rng.choice(['PENDING', 'APPROVED', 'COMPLETED', 'COMPLETED', 'REJECTED']),
+            reason="Benchmark",
+        ))
+        if len(batch) == 5000:
+            BloodRequest.objects.bulk_create(batch)
+            batch = []
+    BloodRequest.objects.bulk_create(batch)
+
+    # request_date is auto_now_add, so spread it over the history afterwards.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE core_bloodrequest SET request_date = datetime('now', '-' || (id %% %s) || ' days')",
+            [days],
+        )
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--units-per-day', type=int, default=80)
+    parser.add_argument('--requests-per-day', type=int, default=60)
+    parser.add_argument('--db', help="SQLite file to use (defaults to a temp file).")
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f"Seeding {args.years} years of history into {db_path} ...")
+    seed(args.years, args.units_per_day, args.requests_per_day)
+
+    from core.forecast import compute_forecast, load_series, project
+    from core.models import BloodInventory, BloodRequest
+    from django.utils import timezone
+
+    print(f"{BloodInventory.objects.count()} units, {BloodRequest.objects.count()} requests")
+    today = timezone.localdate()
+    series = load_series(today)
+    print(f"\n{'queries (load_series)':<28} {time_call(lambda: load_series(today)):>9.2f} ms")
+    print(f"{'numpy (project)':<28} {time_call(lambda: project(series, today)):>9.2f} ms")
+    print(f"{'total (compute_forecast)':<28} {time_call(compute_forecast):>9.2f} ms\n")
+
+    for row in compute_forecast():
+        print(
+            f"{row['group']:<4} on hand {row['on_hand']:>5}  demand/day {row['demand_per_day']:>6}  "
+            f"supply {row['days_of_supply'] if row['days_of_supply'] is not None else '-':>6} days  "
+            f"shortage {row['shortage_date'] or '-'}"
+        )
+
+
+if __name__ == '__main__':
+    main()
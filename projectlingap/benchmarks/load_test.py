@@ -0,0 +1,203 @@
+"""
+Drive every page in core/urls.py as the role that uses it, with several clients at once, and
+report throughput and p50/p95/p99 latency per view.
+
+Fill a database first, then run against it in-process (no server needed):
+
+    export LINGAP_LOAD_PASSWORD=...
+    python manage.py generate_data --donors 500000 --units 2000000 --requests 200000
+    python benchmarks/load_test.py --db db.sqlite3 --concurrency 8 --requests 200
+
+or over HTTP against a server using the same database (runserver, gunicorn, uvicorn):
+
+    python benchmarks/load_test.py --db db.sqlite3 --base-url http://127.0.0.1:8000
+
+Clients log in as the load-admin / load-staff / load-donor accounts generate_data creates, with the
+same LINGAP_LOAD_PASSWORD (or --password).
+Roles and URL arguments come from the route table in core/routes.py, which the query budget tests
+also check, so a new URL is load-tested as soon as it is listed there.
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from common import setup_django
+
+SKIPPED = {
+    'logout': "ends the session",
+    'event_stream': "long-lived stream",
+    'shortage_alert': "POST only, sends notifications",
+    'donor_export': "full-table export", 'donor_recall_export': "full-table export",
+    'request_export': "full-table export", 'inventory_export': "full-table export",
+}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # time the view itself, not the page it redirects to
+
+
+class HttpSession:
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+        if username:
+            self.get('/login/')
+            token = next(cookie.value for cookie in self.cookies if cookie.name == 'csrftoken')
+            status = self.request('/login/', {'username': username, 'password': password, 'csrfmiddlewaretoken': token})
+            if status != 302:
+                raise SystemExit(f"Could not log in as {username} (HTTP {status}); run generate_data first.")
+
+    def request(self, path, data=None):
+        url = self.base_url + path
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(url, data=body, headers={'Referer': url})
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+
+    def get(self, path):
+        return self.request(path)
+
+
+class ClientSession:
+    def __init__(self, user):
+        from django.test import Client
+        self.client = Client()
+        if user:
+            self.client.force_login(user)
+
+    def get(self, path):
+        response = self.client.get(path)
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        return response.status_code
+
+
+def url_kwargs(users):
+    from core.models import BloodInventory, BloodRequest, Campaign
+
+    campaign = Campaign.objects.order_by('-start_datetime').first()
+    return {
+        'campaign': {'pk': campaign.pk},
+        'campaign_donor': {'campaign_id': campaign.pk, 'donor_id': users['donor'].donor_profile.pk},
+        'donor': {'pk': users['donor'].donor_profile.pk},
+        'volunteer': {'pk': users['staff'].pk},
+        'request': {'pk': BloodRequest.objects.filter(status='PENDING').order_by('-pk').values_list('pk', flat=True).first()},
+        'unit': {'pk': BloodInventory.objects.filter(status='AVAILABLE').order_by('-pk').values_list('pk', flat=True).first()},
+    }
+
+
+def run_route(path, make_session, concurrency, requests):
+    from django.db import connection
+
+    # Log in and warm up one client at a time: logins and the first page write session rows, and
+    # that is not what is being measured.
+    sessions = [make_session() for _ in range(concurrency)]
+    for session in sessions:
+        session.get(path)
+
+    timings, errors, failures, lock = [], [], [], threading.Lock()
+    per_client = max(requests // concurrency, 1)
+
+    def worker(session):
+        try:
+            for _ in range(per_client):
+                started = time.perf_counter()
+                status = session.get(path)
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    if status >= 400:
+                        errors.append(status)
+        except Exception as exc:
+            failures.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(session,)) for session in sessions]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    return timings, errors, time.perf_counter() - started
+
+
+def percentiles(timings):
+    if len(timings) < 2:
+        return timings * 3 if timings else [0.0] * 3
+    cuts = statistics.quantiles(timings, n=100)
+    return cuts[49], cuts[94], cuts[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help="SQLite file filled by generate_data.")
+    parser.add_argument('--base-url', help="Load a running server over HTTP instead of calling the views in-process.")
+    parser.add_argument('--password', default=os.environ.get('LINGAP_LOAD_PASSWORD'),
+                        help="Password given to generate_data (default: $LINGAP_LOAD_PASSWORD).")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="Requests per view, spread over the clients.")
+    parser.add_argument('--routes', help="Comma-separated URL names to run (default: every read-only GET page).")
+    args = parser.parse_args()
+    if not args.password:
+        parser.error("give the load test accounts' password with --password or LINGAP_LOAD_PASSWORD")
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.urls import reverse
+    from core.synthetic import LOAD_USERS
+    from core.routes import ROUTES, WRITES
+
+    settings.ALLOWED_HOSTS = ['*']
+    users = {role: User.objects.select_related('donor_profile').get(username=name) for role, name in LOAD_USERS.items()}
+    kwargs = url_kwargs(users)
+    names = args.routes.split(',') if args.routes else [name for name in ROUTES if name not in {*SKIPPED, *WRITES}]
+    if WRITES.intersection(names):
+        parser.error(f"{', '.join(sorted(WRITES.intersection(names)))} write on GET; this is a read load test")
+
+    def session_factory(role):
+        if args.base_url:
+            return lambda: HttpSession(args.base_url, LOAD_USERS[role] if role else None, args.password)
+        return lambda: ClientSession(users[role] if role else None)
+
+    print(f"{args.concurrency} clients, {args.requests} requests per view, "
+          f"{args.base_url or 'in-process (WSGI handler, no HTTP)'}\n")
+    print(f"{'view':<24} {'role':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    totals, total_time = [], 0.0
+    for name in names:
+        role, kwargs_key, _ = ROUTES[name]
+        path = reverse(name, kwargs=kwargs[kwargs_key] if kwargs_key else None)
+        timings, errors, elapsed = run_route(path, session_factory(role), args.concurrency, args.requests)
+        p50, p95, p99 = percentiles(timings)
+        totals.extend(timings)
+        total_time += elapsed
+        print(f"{name:<24} {role or '-':<6} {len(timings) / elapsed:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} "
+              f"{len(errors):>7}{'  (HTTP ' + str(errors[0]) + ')' if errors else ''}")
+
+    p50, p95, p99 = percentiles(totals)
+    print(f"\n{'all views':<24} {'':<6} {len(totals) / total_time:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+    if not args.routes:
+        for name, reason in SKIPPED.items():
+            print(f"skipped {name}: {reason}")
+        for name in sorted(WRITES):
+            print(f"skipped {name}: writes on GET")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Seed a large inventory/request dataset and compare the hot list and dashboard
+queries with and without the composite indexes.
+
+    python benchmarks/query_indexes.py --units 200000 --requests 50000
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from common import setup_django, time_call
+
+PAGE_SIZE = 8
+DEEP_ROW = 5000  # 'page' also times the page after this row, like a user paging far down a list
+
+
+def seed(units, requests):
+    from django.utils import timezone
+    from core.models import BloodInventory, BloodRequest, Donor
+
+    now = timezone.now()
+    groups = [code for code, _ in Donor.BLOOD_TYPES]
+    statuses = ['AVAILABLE'] * 5 + ['RESERVED', 'EXPIRED', 'DISTRIBUTED', 'DISTRIBUTED']
+    rng = random.Random(42)
+
+    batch = []
+    for i in range(units):
+        collected = now - timedelta(days=rng.randint(0, 365 * 3))
+        batch.append(BloodInventory(
+            serial_number=f"BENCH-{i:08d}",
+            blood_group=rng.choice(groups),
+            status=rng.choice(statuses),
+            date_collected=collected,
+            expiry_date=collected + timedelta(days=42),
+        ))
+        if len(batch) == 5000:
+            BloodInventory.objects.bulk_create(batch)
+            batch = []
+    BloodInventory.objects.bulk_create(batch)
+
+    batch = []
+    for i in range(requests):
+        batch.append(BloodRequest(
+            patient_name=f"Patient {i}",
+            patient_blood_type=rng.choice(groups),
+            hospital_name=f"Hospital {i % 40}",
+            hospital_address="Cavite",
+            physician_name=f"Physician {i % 300}",
+            physician_license=f"LIC-{i % 300}",
+            urgency=rng.choice(['ROUTINE', 'URGENT', 'CRITICAL']),
+            status=rng.choice(['PENDING', 'APPROVED', 'COMPLETED', 'REJECTED']),
+            reason="Benchmark",
+        ))
+        if len(batch) == 5000:
+            BloodRequest.objects.bulk_create(batch)
+            batch = []
+    BloodRequest.objects.bulk_create(batch)
+
+    # bulk_create ignores auto_now_add overrides, so spread request dates afterwards.
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE core_bloodrequest SET request_date = datetime('now', '-' || (id % 1000) || ' days')"
+        )
+
+
+def list_queryset(view_class, path, params):
+    from django.test import RequestFactory
+
+    view = view_class()
+    view.request = RequestFactory().get(path, params)
+    view.kwargs = {}
+    return view.get_queryset()
+
+
+def hot_queries():
+    # (label, queryset, mode): 'page' mirrors KeysetPaginationMixin (first page, then a deep one from a
+    # cursor), 'count' and 'list' run as-is.
+    from django.utils import timezone
+    from core.models import BloodInventory, BloodRequest, Campaign
+    from core.views import InventoryListView, RequestListView
+
+    return [
+        ("inventory list (no filter)", list_queryset(InventoryListView, '/inventory/', {}), 'page'),
+        ("inventory list status", list_queryset(InventoryListView, '/inventory/', {'status': 'AVAILABLE'}), 'page'),
+        ("inventory list group", list_queryset(InventoryListView, '/inventory/', {'blood_group': 'O-'}), 'page'),
+        ("inventory list status+group", list_queryset(
+            InventoryListView, '/inventory/', {'status': 'AVAILABLE', 'blood_group': 'O-'}), 'page'),
+        ("request list (no filter)", list_queryset(RequestListView, '/requests/', {}), 'page'),
+        ("request list status", list_queryset(RequestListView, '/requests/', {'status': 'PENDING'}), 'page'),
+        ("request list status+urgency", list_queryset(
+            RequestListView, '/requests/', {'status': 'PENDING', 'urgency': 'CRITICAL'}), 'page'),
+        ("request list type+status", list_queryset(
+            RequestListView, '/requests/', {'blood_type': 'AB+', 'status': 'PENDING'}), 'page'),
+        # compatible_units runs this once per compatible group, in preference order.
+        ("allocation, one group", BloodInventory.objects.filter(
+            status='AVAILABLE', blood_group='AB+', expiry_date__gt=timezone.now()).order_by('expiry_date', 'id')[:10],
+         'list'),
+        ("dashboard available count", BloodInventory.objects.filter(status='AVAILABLE'), 'count'),
+        ("dashboard pending count", BloodRequest.objects.filter(status='PENDING'), 'count'),
+        ("dashboard recent donations", BloodInventory.objects.order_by('-date_collected')[:5], 'list'),
+        ("dashboard active campaigns", Campaign.objects.filter(end_datetime__gt=timezone.now()), 'count'),
+    ]
+
+
+def deep_page(queryset):
+    # A cursor DEEP_ROW rows in, and the query keyset_page runs for it (the first page's, for shorter lists).
+    from core.pagination import decode_cursor, encode_cursor, keyset_filter
+
+    ordering = queryset.query.order_by
+    rows = list(queryset[DEEP_ROW:DEEP_ROW + 1])
+    if not rows:
+        return None, queryset[:PAGE_SIZE + 1]
+    cursor = encode_cursor(rows[0], ordering)
+    values = decode_cursor(queryset.model, ordering, cursor)
+    return cursor, queryset.filter(keyset_filter(ordering, values))[:PAGE_SIZE + 1]
+
+
+def execute(queryset, mode, cursor=None):
+    if mode == 'page':
+        from core.pagination import keyset_page
+
+        ordering = queryset.query.order_by
+        keyset_page(queryset, ordering, PAGE_SIZE)
+        if cursor:
+            keyset_page(queryset, ordering, PAGE_SIZE, after=cursor)
+    elif mode == 'count':
+        queryset.count()
+    else:
+        list(queryset.all())
+
+
+def run(label, queries):
+    print(f"\n=== {label} ===")
+    results = {}
+    for name, queryset, mode in queries:
+        cursor, plan_source = deep_page(queryset) if mode == 'page' else (None, queryset)
+        results[name] = time_call(lambda: execute(queryset, mode, cursor))
+        print(f"{name:<32} {results[name]:>9.2f} ms")
+        for line in plan_source.explain().splitlines():
+            print(f"    {line}")
+    return results
+
+
+def set_indexes(enabled):
+    from django.db import connection
+    from core.models import BloodInventory, BloodRequest, Campaign
+
+    with connection.schema_editor() as editor:
+        for model in (BloodInventory, BloodRequest, Campaign):
+            for index in model._meta.indexes:
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--db', help="SQLite file to use (defaults to a temp file).")
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    print(f"Seeding {args.units} units and {args.requests} requests into {db_path} ...")
+    set_indexes(False)
+    seed(args.units, args.requests)
+
+    queries = hot_queries()
+    before = run("BEFORE (no composite indexes)", queries)
+    set_indexes(True)
+    after = run("AFTER (composite indexes)", queries)
+
+    print(f"\n{'query':<32} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name, _, _ in queries:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<32} {before[name]:>8.2f}ms {after[name]:>8.2f}ms {speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
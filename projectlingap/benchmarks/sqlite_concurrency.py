@@ -0,0 +1,144 @@
+"""
+Readers and writers on one SQLite file at the same time, with the bare settings the project used to
+ship (rollback journal, deferred transactions, a new connection per request, 5 s busy timeout) and
+with the production profile in settings.DATABASES (WAL, tuned pragmas, immediate transactions,
+persistent connections).
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 4 --seconds 10
+
+Readers run the inventory list and stock-by-group queries. Writers alternate the two transactions
+that used to fail with "database is locked": reserving a unit (read candidates, then a conditional
+UPDATE) and recording a donation (serial check, then INSERT). Every operation ends like a request
+does, with close_old_connections(). Each profile runs in its own process on its own file, because
+connection settings are read once at startup and journal_mode is stored in the file.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from itertools import count
+
+from common import setup_django
+
+PROFILES = {
+    'bare': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}},
+    'production': {},  # settings.DATABASES as shipped
+}
+
+
+def read_once():
+    from django.db.models import Count
+    from core.models import BloodInventory
+
+    list(BloodInventory.objects.select_related('donor__user').filter(status='AVAILABLE').order_by('-id')[:20])
+    list(BloodInventory.objects.filter(status='AVAILABLE').values('blood_group').annotate(units=Count('id')))
+
+
+def write_once(serials):
+    from django.db import transaction
+    from django.utils import timezone
+    from core.allocation import release_unit, reserve_unit
+    from core.models import BloodInventory
+
+    serial = next(serials)
+    if serial % 2:
+        unit = reserve_unit('O+')
+        if unit is not None:
+            release_unit(unit)
+        return
+    with transaction.atomic():
+        if not BloodInventory.objects.filter(serial_number=f'BENCH-{serial}').exists():
+            BloodInventory.objects.create(
+                serial_number=f'BENCH-{serial}', blood_group='O+', expiry_date=timezone.now() + timedelta(days=35),
+            )
+
+
+def run_child(profile, db_path, readers, writers, seconds, years):
+    setup_django(db_path, PROFILES[profile])
+    from django.db import OperationalError, close_old_connections, connection
+    from forecast import seed
+
+    seed(years, units_per_day=80, requests_per_day=60)
+    journal_mode = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+    connection.close()
+
+    serials, stop = count(), threading.Event()
+    results = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def worker(kind, operation):
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    operation()
+                except OperationalError:  # "database is locked"
+                    with lock:
+                        errors[kind] += 1
+                    continue
+                finally:
+                    close_old_connections()
+                with lock:
+                    results[kind].append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=('read', read_once)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', lambda: write_once(serials))) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        'journal_mode': journal_mode,
+        **{
+            kind: {
+                'ops': len(timings) / seconds,
+                'p50': statistics.median(timings) if timings else 0.0,
+                'p95': statistics.quantiles(timings, n=100)[94] if len(timings) > 1 else 0.0,
+                'errors': errors[kind],
+            }
+            for kind, timings in results.items()
+        },
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--years', type=int, default=1, help="History seeded into each file before the run.")
+    parser.add_argument('--child', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db, args.readers, args.writers, args.seconds, args.years)
+        return
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g} s per profile\n")
+    print(f"{'profile':<11} {'journal':<8} {'op':<6} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'locked':>7}")
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', profile, '--readers', str(args.readers), '--writers', str(args.writers),
+             '--seconds', str(args.seconds), '--years', str(args.years)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for kind in ('read', 'write'):
+            row = result[kind]
+            print(f"{profile:<11} {result['journal_mode']:<8} {kind:<6} {row['ops']:>8.1f} {row['p50']:>8.2f} "
+                  f"{row['p95']:>8.2f} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
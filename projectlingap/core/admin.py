@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Donor, BloodInventory, BloodRequest, Campaign
+from .models import Donor, BloodInventory, BloodRequest, Campaign, InventoryRollup, OutboxMessage
 
 @admin.register(Donor)
 class DonorAdmin(admin.ModelAdmin):
@@ -28,4 +28,25 @@ class RequestAdmin(admin.ModelAdmin):
 
 @admin.register(Campaign)
 class CampaignAdmin(admin.ModelAdmin):
-    list_display = ('title', 'location', 'start_datetime', 'end_datetime')
\ No newline at end of file
+    list_display = ('title', 'location', 'start_datetime', 'end_datetime')
+
+@admin.register(InventoryRollup)
+class InventoryRollupAdmin(admin.ModelAdmin):
+    # Written by the rollup_inventory command; read-only here.
+    list_display = ('date', 'blood_group', 'status', 'units')
+    list_filter = ('status', 'blood_group')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    # Filled by core.outbox and drained by send_notifications.
+    list_display = ('recipient', 'channel', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel')
+    search_fields = ('recipient',)
+    raw_id_fields = ('broadcast',)
@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .events import publish
+from .models import BloodInventory, InventoryStatusChange
+from .rollup import mark_dirty
+from .stock import invalidate_stock_summary
+
+# RED CELL COMPATIBILITY
+# Recipient blood type -> donor groups it can safely receive, in order of preference.
+# Exact match comes first and O- always comes last so universal stock is only used when needed.
+DONOR_PREFERENCE = {
+    'O-': ['O-'],
+    'O+': ['O+', 'O-'],
+    'A-': ['A-', 'O-'],
+    'A+': ['A+', 'A-', 'O+', 'O-'],
+    'B-': ['B-', 'O-'],
+    'B+': ['B+', 'B-', 'O+', 'O-'],
+    'AB-': ['AB-', 'A-', 'B-', 'O-'],
+    'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
+}
+
+DEFAULT_ALLOCATION_LIMIT = 10
+RESERVATION_ROUNDS = 5
+
+
+def compatible_groups(blood_type):
+    return DONOR_PREFERENCE.get(blood_type, [])
+
+
+def can_receive(recipient_type, donor_group):
+    return donor_group in compatible_groups(recipient_type)
+
+
+def compatible_filter(blood_type):
+    # Matches the (status, blood_group, expiry_date) index on BloodInventory.
+    return Q(
+        status='AVAILABLE',
+        blood_group__in=compatible_groups(blood_type),
+        expiry_date__gt=timezone.now(),
+    )
+
+
+def compatible_units(blood_type, limit=DEFAULT_ALLOCATION_LIMIT, exclude=()):
+    # Best N units: preferred group first, then first-expiry-first-out (FEFO). One query per group in
+    # preference order, each walking the (status, blood_group, expiry_date) index and stopping after the
+    # rows still needed; a single query over every compatible group would rank and sort all of them.
+    # Preference outranks expiry, so the groups' rows simply follow one another.
+    now = timezone.now()
+    units = []
+    for group in compatible_groups(blood_type):
+        if len(units) >= limit:
+            break
+        units += (
+            BloodInventory.objects.filter(status='AVAILABLE', blood_group=group, expiry_date__gt=now)
+            .exclude(pk__in=exclude)
+            .order_by('expiry_date', 'id')[:limit - len(units)]
+        )
+    return units
+
+
+def allocate_units(blood_type, limit=DEFAULT_ALLOCATION_LIMIT):
+    return compatible_units(blood_type, limit)
+
+
+# RESERVATION
+# Status changes are conditional UPDATEs ("... WHERE status = 'AVAILABLE'"), so two dispatchers can
+# never both claim a unit: the loser's UPDATE matches zero rows and it moves on to the next-best bag.
+
+def _claim(queryset, unit, to_status, from_statuses=('AVAILABLE',)):
+    # One conditional UPDATE per status the unit may be in, so the one that matches says which it left.
+    changed_at = timezone.now()
+    claimed_from = None
+    with transaction.atomic():
+        for from_status in from_statuses:
+            if queryset.filter(pk=unit.pk, status=from_status).update(status=to_status, status_changed_at=changed_at):
+                claimed_from = from_status
+                InventoryStatusChange.objects.create(
+                    unit_id=unit.pk, from_status=from_status, to_status=to_status, changed_at=changed_at,
+                )
+                mark_dirty(changed_at)
+                break
+    if claimed_from:
+        unit.moved(to_status, changed_at)
+        invalidate_stock_summary()  # update() sends no post_save
+        publish(f'unit.{to_status.lower()}', id=unit.pk, blood_group=unit.blood_group)
+    return bool(claimed_from)
+
+
+def reserve_unit(blood_type, preferred=None, rounds=RESERVATION_ROUNDS, limit=DEFAULT_ALLOCATION_LIMIT):
+    # Returns the reserved unit (the preferred one if still free), or None when nothing compatible is left.
+    still_free = BloodInventory.objects.filter(compatible_filter(blood_type))
+    tried = set()
+    with transaction.atomic():
+        if preferred is not None:
+            tried.add(preferred.pk)
+            if _claim(still_free, preferred, 'RESERVED'):
+                return preferred
+
+        for _ in range(rounds):
+            candidates = compatible_units(blood_type, limit, exclude=tried)
+            if not candidates:
+                return None
+            for unit in candidates:
+                tried.add(unit.pk)
+                if _claim(still_free, unit, 'RESERVED'):
+                    return unit
+    return None
+
+
+def release_unit(unit):
+    return _claim(BloodInventory.objects.all(), unit, 'AVAILABLE', from_statuses=('RESERVED',))
+
+
+def distribute_unit(unit, blood_type, held=False):
+    # A unit reserved for someone else can't be handed out; pass held=True for the request's own bag.
+    # Any other bag is re-checked the way reserve_unit checks one: compatible, still AVAILABLE, in date.
+    if held:
+        queryset = BloodInventory.objects.filter(expiry_date__gt=timezone.now())
+        return _claim(queryset, unit, 'DISTRIBUTED', from_statuses=('RESERVED', 'AVAILABLE'))
+    return _claim(BloodInventory.objects.filter(compatible_filter(blood_type)), unit, 'DISTRIBUTED')
@@ -0,0 +1,82 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .allocation import compatible_groups
+from .models import BloodInventory
+from .stock import BLOOD_GROUPS, inventory_version
+
+AVAILABILITY_CACHE_KEY = 'core:availability:{}'
+AVAILABILITY_LAST_KEY = 'core:availability:last'
+# Units passing their expiry date fire no signal; this bounds how long they stay in the counts.
+AVAILABILITY_TIMEOUT = 60
+
+
+# HOSPITAL AVAILABILITY
+# Counts are cached per inventory version, which every stock invalidation bumps. The ETag is a hash
+# of the counts themselves, so a version bump that changed nothing (a donor edit, another worker
+# process recomputing) still answers partners' conditional GETs with 304.
+
+def compute_availability():
+    counts = dict.fromkeys(BLOOD_GROUPS, 0)
+    rows = (
+        BloodInventory.objects.filter(status='AVAILABLE', expiry_date__gt=timezone.now())
+        .values_list('blood_group').annotate(units=Count('id')).order_by()
+    )
+    for group, units in rows:
+        if group in counts:
+            counts[group] = units
+    return counts
+
+
+def get_availability():
+    key = AVAILABILITY_CACHE_KEY.format(inventory_version())
+    entry = cache.get(key)
+    if entry is None:
+        counts = compute_availability()
+        etag = hashlib.sha1(json.dumps(counts, sort_keys=True).encode()).hexdigest()
+        last = cache.get(AVAILABILITY_LAST_KEY)
+        if last and last['etag'] == etag:
+            last_modified = last['last_modified']
+        else:
+            last_modified = timezone.now().replace(microsecond=0)  # HTTP dates have whole seconds
+        entry = {'counts': counts, 'etag': etag, 'last_modified': last_modified}
+        cache.set(key, entry, AVAILABILITY_TIMEOUT)
+        cache.set(AVAILABILITY_LAST_KEY, {'etag': etag, 'last_modified': last_modified}, timeout=None)
+    return entry
+
+
+def parse_blood_types(values):
+    # "?types=A+,O-" or repeated "?types=A+&types=O-"; an unencoded "+" arrives as a space.
+    requested = []
+    for value in values:
+        for part in value.split(','):
+            blood_type = part.strip().upper()
+            if not blood_type:
+                continue
+            if part.endswith(' ') and blood_type[-1] not in '+-':
+                blood_type += '+'
+            if blood_type not in BLOOD_GROUPS:
+                raise ValueError(f"Unknown blood type: {blood_type}")
+            if blood_type not in requested:
+                requested.append(blood_type)
+    return requested or BLOOD_GROUPS
+
+
+def availability_payload(entry, blood_types):
+    counts = entry['counts']
+    return {
+        'as_of': entry['last_modified'].isoformat(),
+        'blood_types': [
+            {
+                'blood_type': blood_type,
+                'available': counts[blood_type],
+                # Every unit a patient of this type could receive, exact match or not.
+                'compatible_available': sum(counts[group] for group in compatible_groups(blood_type)),
+            }
+            for blood_type in blood_types
+        ],
+    }
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Campaign
+
+CAMPAIGN_VERSION_KEY = 'core:campaign_version'
+CAMPAIGN_PAGE_KEY = 'core:campaigns:{}:{}:{}:{}'  # version, role, page size, page number
+CAMPAIGN_PAGE_TIMEOUT = 10 * 60
+
+
+# CAMPAIGN LISTING CACHE
+# The campaign list is the same for every donor (and for every staff member), so each page is
+# filled once per role and shared. Campaign saves and deletes bump the version, which retires
+# every cached page and card fragment at once. The only other thing that changes a page is the
+# clock: a drive ending (staff list) or starting (drops off the donor list). A fill expires at
+# the next such moment, so "ended" can be worked out once per fill instead of once per card.
+
+def campaign_version():
+    return cache.get(CAMPAIGN_VERSION_KEY, 0)
+
+
+def invalidate_campaigns(**kwargs):
+    try:
+        cache.incr(CAMPAIGN_VERSION_KEY)
+    except ValueError:
+        cache.set(CAMPAIGN_VERSION_KEY, 1, timeout=None)
+
+
+def campaign_queryset(staff, now=None):
+    if staff:
+        return Campaign.objects.order_by('-start_datetime')
+    return Campaign.objects.filter(start_datetime__gte=now or timezone.now()).order_by('start_datetime')
+
+
+def _fill_page(staff, number, page_size):
+    now = timezone.now()
+    queryset = campaign_queryset(staff, now)
+    # Count and next transition in one query; the paginator only needs the count.
+    next_change = 'end_datetime' if staff else 'start_datetime'
+    stats = queryset.aggregate(
+        count=Count('id'), next_change=Min(next_change, filter=Q(**{f'{next_change}__gt': now})),
+    )
+    page = Paginator(range(stats['count']), page_size).page(number)
+    campaigns = list(queryset[page.start_index() - 1:page.end_index()]) if stats['count'] else []
+    for campaign in campaigns:
+        campaign.ended = campaign.end_datetime <= now
+
+    timeout = CAMPAIGN_PAGE_TIMEOUT
+    if stats['next_change']:
+        timeout = min(timeout, max(int((stats['next_change'] - now) / timedelta(seconds=1)) + 1, 1))
+    return {
+        'count': stats['count'], 'number': page.number, 'campaigns': campaigns,
+        'filled_at': now.timestamp(), 'timeout': timeout,
+    }
+
+
+def get_campaign_page(staff, number, page_size):
+    # Raises InvalidPage like Paginator.page(); the cached entry rebuilds a real Page for the templates.
+    role = 'staff' if staff else 'donor'
+    version = campaign_version()
+    key = CAMPAIGN_PAGE_KEY.format(version, role, page_size, number)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _fill_page(staff, number, page_size)
+        cache.set(key, entry, entry['timeout'])
+
+    page = Paginator(range(entry['count']), page_size).page(entry['number'])
+    page.object_list = entry['campaigns']
+    # Varies the card fragment cache: a new fill (new version, or the clock moved a drive along) renders anew.
+    page.cache_key = f"{version}:{role}:{entry['filled_at']}"
+    page.cache_timeout = entry['timeout']
+    return page
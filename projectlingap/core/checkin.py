@@ -0,0 +1,103 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .eligibility import refresh_eligibility
+from .events import publish
+from .importer import SERIAL_MAX_LENGTH, parse_timestamp
+from .models import BloodInventory, CampaignParticipant
+from .stock import invalidate_stock_summary
+
+
+class CheckInResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = {}  # participant pk -> message
+
+
+def read_entries(data):
+    # "serial-<participant pk>" / "expiry-<participant pk>" inputs; a blank serial means "not donating yet".
+    default_expiry = (data.get('default_expiry') or '').strip()
+    entries = {}
+    for key, value in data.items():
+        if not key.startswith('serial-') or not value.strip():
+            continue
+        try:
+            participant_id = int(key[len('serial-'):])
+        except ValueError:
+            continue
+        expiry = (data.get(f'expiry-{participant_id}') or '').strip() or default_expiry
+        entries[participant_id] = (value.strip(), expiry)
+    return entries
+
+
+def check_in_donations(campaign, data, processed_by=None):
+    result = CheckInResult()
+    entries = read_entries(data)
+    if not entries:
+        return result
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked so a second device submitting the same rows can't record a donor twice.
+        participants = list(
+            campaign.participants.select_for_update()
+            .select_related('donor')
+            .filter(pk__in=entries, has_donated=False)
+        )
+        serials = [serial for serial, _ in entries.values()]
+        existing = set(BloodInventory.objects.filter(serial_number__in=serials).values_list('serial_number', flat=True))
+
+        found = {participant.pk for participant in participants}
+        for participant_id in entries.keys() - found:
+            result.errors[participant_id] = "Already checked in or not registered for this campaign."
+
+        seen, units, checked_in = set(), [], []
+        for participant in participants:
+            serial, expiry = entries[participant.pk]
+            try:
+                if len(serial) > SERIAL_MAX_LENGTH:
+                    raise ValueError(f"Serial number longer than {SERIAL_MAX_LENGTH} characters")
+                if serial in existing:
+                    raise ValueError("Serial number already exists")
+                if serial in seen:
+                    raise ValueError("Serial number entered twice")
+                expiry_date = parse_timestamp(expiry)
+                if expiry_date is None:
+                    raise ValueError("Missing expiry date")
+                if expiry_date <= now:
+                    raise ValueError("Expiry date is in the past")
+            except ValueError as exc:
+                result.errors[participant.pk] = str(exc)
+                continue
+
+            seen.add(serial)
+            units.append(BloodInventory(
+                serial_number=serial,
+                donor=participant.donor,
+                campaign=campaign,
+                blood_group=participant.donor.blood_type,
+                status='AVAILABLE',
+                expiry_date=expiry_date,
+                processed_by=processed_by,
+            ))
+            participant.has_donated = True
+            checked_in.append(participant)
+
+        if units:
+            try:
+                with transaction.atomic():
+                    BloodInventory.objects.bulk_create(units)
+                    CampaignParticipant.objects.bulk_update(checked_in, ['has_donated'])
+            except IntegrityError:
+                # A serial was taken between the lookup and the insert; nothing from this batch was saved.
+                for participant in checked_in:
+                    result.errors[participant.pk] = "Not saved: a serial number in this batch was just used elsewhere."
+                return result
+            refresh_eligibility(participant.donor_id for participant in checked_in)
+            result.created = len(units)
+
+    # bulk_create / bulk_update send no post_save signals.
+    if result.created:
+        invalidate_stock_summary()
+        publish('units.added', count=result.created, campaign=campaign.pk)
+    return result
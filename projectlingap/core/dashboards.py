@@ -0,0 +1,37 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+
+# CONCURRENT DASHBOARD READS
+# A dashboard is a few independent reads. Django's async ORM (acount, async for) sends every query
+# through the request's single thread-sensitive executor, so gathering those would still run them
+# one after another. Under ASGI each read therefore runs on its own pool thread, with its own
+# database connection, and the page waits for the slowest read rather than the sum of all of them.
+# Under WSGI there is no event loop to share, so the same reads simply run in order on the
+# request's thread and connection. asgi.py turns persistent connections off, so every gathered read
+# also pays for opening a connection; benchmarks/dashboards.py measures whether that is worth it.
+
+def _on_worker(read):
+    def run():
+        try:
+            return read()
+        finally:
+            # Pool threads outlive the request: close the connection as the end of a request would.
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def _in_order(reads):
+    return [read() for read in reads]
+
+
+async def run_reads(request, reads):
+    # reads: context name -> callable returning fully evaluated data (lists, not lazy querysets).
+    if isinstance(request, ASGIRequest):
+        values = await asyncio.gather(*(_on_worker(read)() for read in reads.values()))
+    else:
+        values = await sync_to_async(_in_order)(list(reads.values()))
+    return dict(zip(reads, values))
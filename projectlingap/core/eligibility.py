@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .allocation import compatible_groups
+from .models import BloodInventory, Donor
+
+DONATION_INTERVAL = timedelta(days=90)  # whole blood: three months between donations
+UPDATE_BATCH_SIZE = 500
+
+
+# DONOR ELIGIBILITY
+# last_donation_at / next_eligible_at are denormalized onto Donor whenever a donor's units change,
+# so "who can give again" is a range scan of the (blood_type, next_eligible_at) index rather than
+# a join over every donation ever recorded.
+
+def next_eligible(last_donation_at, joined):
+    return last_donation_at + DONATION_INTERVAL if last_donation_at else joined
+
+
+def refresh_eligibility(donor_ids):
+    donor_ids = set(donor_ids)
+    if not donor_ids:
+        return
+    latest = dict(
+        BloodInventory.objects.filter(donor_id__in=donor_ids)
+        .values_list('donor').annotate(last=Max('date_collected')).order_by()
+    )
+    donors = [
+        Donor(pk=pk, last_donation_at=latest.get(pk), next_eligible_at=next_eligible(latest.get(pk), joined))
+        for pk, joined in Donor.objects.filter(pk__in=donor_ids).values_list('pk', 'user__date_joined')
+    ]
+    Donor.objects.bulk_update(donors, ['last_donation_at', 'next_eligible_at'], batch_size=UPDATE_BATCH_SIZE)
+
+
+def recall_groups(blood_type, compatible=True):
+    # Donor blood types whose blood a patient of blood_type can receive.
+    return compatible_groups(blood_type) if compatible else [blood_type]
+
+
+def recall_queryset(blood_type, compatible=True, now=None):
+    # Donors who could give for blood_type and are due to give again.
+    return Donor.objects.filter(
+        blood_type__in=recall_groups(blood_type, compatible), next_eligible_at__lte=now or timezone.now(),
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+
+EVENT_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 20  # keeps proxies from closing an idle stream
+RECONNECT_MS = 5000
+RESYNC = {'type': 'resync'}
+
+
+# LIVE EVENTS
+# Signal handlers publish small change events once the transaction commits. Each open stream owns
+# a bounded asyncio.Queue on the server's event loop; publishing hands the event to every loop with
+# call_soon_threadsafe, so a sync view thread never blocks on a slow client. A client whose queue
+# fills up is told to resync (reload) instead of building an unbounded backlog. An idle stream is
+# one suspended coroutine and an empty queue.
+#
+# The broker lives in this process only: changes made by management commands running elsewhere
+# (the expiry sweeper) are not pushed.
+
+class Subscription:
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def put(self, event):
+        # Runs on the subscriber's own event loop.
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, size=EVENT_QUEUE_SIZE):
+        subscription = Subscription(asyncio.get_running_loop(), size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:  # the loop has shut down
+                self.unsubscribe(subscription)
+
+
+broker = EventBroker()
+
+
+def publish(event_type, **data):
+    if not len(broker):
+        return  # nobody is listening: don't even queue a commit hook
+    event = {'type': event_type, **data}
+    transaction.on_commit(lambda: broker.publish(event))
+
+
+def format_event(event):
+    return f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+async def stream_events(heartbeat=HEARTBEAT_SECONDS):
+    # Subscribes on first iteration, so a response that is never sent never holds a queue.
+    subscription = broker.subscribe()
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,54 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish
+from .models import BloodInventory, InventoryStatusChange
+from .rollup import mark_dirty
+from .stock import invalidate_stock_summary
+
+EXPIRABLE_STATUSES = ['AVAILABLE', 'RESERVED']
+DEFAULT_BATCH_SIZE = 500
+
+
+def stale_units(now=None):
+    now = now or timezone.now()
+    return BloodInventory.objects.filter(status__in=EXPIRABLE_STATUSES, expiry_date__lte=now)
+
+
+def sweep_expired_units(batch_size=DEFAULT_BATCH_SIZE, now=None, on_chunk=None):
+    # Each chunk is one small transaction committed on its own (pick the batch, flip it, log the moves),
+    # so SQLite only holds the write lock for one small batch at a time. The rows are locked as they are
+    # picked (SQLite: the transaction takes the write lock up front), so every picked row is flipped.
+    now = now or timezone.now()
+    chunks = []
+
+    while True:
+        started = time.perf_counter()
+        with transaction.atomic():
+            batch = list(stale_units(now).select_for_update().order_by('pk').values_list('pk', 'status')[:batch_size])
+            if batch:
+                BloodInventory.objects.filter(pk__in=[pk for pk, _ in batch]).update(status='EXPIRED', status_changed_at=now)
+                InventoryStatusChange.objects.bulk_create([
+                    InventoryStatusChange(unit_id=pk, from_status=status, to_status='EXPIRED', changed_at=now)
+                    for pk, status in batch
+                ])
+        touched = len(batch)
+        elapsed = time.perf_counter() - started
+
+        if not touched:
+            break
+
+        chunks.append((touched, elapsed))
+        if on_chunk:
+            on_chunk(len(chunks), touched, elapsed)
+        if touched < batch_size:
+            break
+
+    # Queryset.update() sends no post_save, so drop the cached dashboard counts here.
+    if chunks:
+        mark_dirty(now)
+        invalidate_stock_summary()
+        publish('units.expired', count=sum(touched for touched, _ in chunks))
+    return chunks
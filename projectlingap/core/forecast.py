@@ -0,0 +1,165 @@
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import BloodInventory, BloodRequest
+from .stock import BLOOD_GROUPS
+
+FORECAST_CACHE_KEY = 'core:stock_forecast'
+FORECAST_TIMEOUT = 15 * 60  # trends move slowly; writes don't invalidate this
+HISTORY_DAYS = 90
+HORIZON_DAYS = 42  # whole-blood shelf life
+RATE_WINDOW = 28
+TREND_WINDOW = 7
+CRITICAL_DAYS = 7
+LOW_DAYS = 14
+
+GROUP_INDEX = {group: index for index, group in enumerate(BLOOD_GROUPS)}
+
+
+# STOCK FORECAST
+# Each series is one GROUP BY (day, blood group) query over the history window, scattered into a
+# (blood group x day) matrix. Moving averages and the projection are whole-matrix NumPy operations,
+# so the cost depends on the window length, not on how many years of rows are in the tables.
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def _matrix(rows, start, days):
+    # rows: (day, blood group, amount); days outside [start, start + days) are dropped.
+    matrix = np.zeros((len(BLOOD_GROUPS), days))
+    if not rows:
+        return matrix
+    day_index, group_index, amount = (np.array(column) for column in zip(*rows))
+    day_index = day_index - start.toordinal()
+    keep = (day_index >= 0) & (day_index < days) & (group_index >= 0)
+    np.add.at(matrix, (group_index[keep], day_index[keep]), amount[keep].astype(float))
+    return matrix
+
+
+def _series(queryset, date_field, group_field, amount):
+    rows = (
+        queryset.annotate(day=TruncDate(date_field))
+        .values('day', group_field)
+        .annotate(amount=amount)
+        .order_by()
+        .values_list('day', group_field, 'amount')
+    )
+    return [(day.toordinal(), GROUP_INDEX.get(group, -1), value or 0) for day, group, value in rows]
+
+
+def moving_average(matrix, window):
+    # Trailing mean per row; the first window-1 days average over what exists so far.
+    totals = np.cumsum(matrix, axis=1)
+    totals[:, window:] = totals[:, window:] - totals[:, :-window]
+    return totals / np.minimum(np.arange(1, matrix.shape[1] + 1), window)
+
+
+def load_series(today, history_days=HISTORY_DAYS, horizon_days=HORIZON_DAYS):
+    start = today - timedelta(days=history_days)
+    since, until = _day_start(start), _day_start(today)  # whole days only; today is still filling up
+
+    collected = _series(
+        BloodInventory.objects.filter(date_collected__gte=since, date_collected__lt=until),
+        'date_collected', 'blood_group', Count('id'),
+    )
+    distributed = _series(
+        BloodRequest.objects.filter(
+            status='COMPLETED', assigned_bag__isnull=False, request_date__gte=since, request_date__lt=until,
+        ),
+        'request_date', 'assigned_bag__blood_group', Count('id'),
+    )
+    demand = _series(
+        BloodRequest.objects.exclude(status='REJECTED').filter(request_date__gte=since, request_date__lt=until),
+        'request_date', 'patient_blood_type', Sum('quantity'),
+    )
+    # Before today: units that went off the shelf unused. From now on: on-hand units that will.
+    now = timezone.now()
+    expiring = _series(
+        BloodInventory.objects.filter(
+            Q(expiry_date__lt=until) | Q(status='AVAILABLE', expiry_date__gt=now),
+            status__in=['AVAILABLE', 'EXPIRED'],
+            expiry_date__gte=since,
+            expiry_date__lt=_day_start(today + timedelta(days=horizon_days)),
+        ),
+        'expiry_date', 'blood_group', Count('id'),
+    )
+    on_hand = np.zeros(len(BLOOD_GROUPS))
+    for group, count in (
+        BloodInventory.objects.filter(status='AVAILABLE', expiry_date__gt=now)
+        .values_list('blood_group').annotate(count=Count('id')).order_by()
+    ):
+        if group in GROUP_INDEX:
+            on_hand[GROUP_INDEX[group]] = count
+
+    return {
+        'collected': _matrix(collected, start, history_days),
+        'distributed': _matrix(distributed, start, history_days),
+        'demand': _matrix(demand, start, history_days),
+        'expired': _matrix(expiring, start, history_days),
+        'expiring': _matrix(expiring, today, horizon_days),
+        'on_hand': on_hand,
+    }
+
+
+def project(series, today, horizon_days=HORIZON_DAYS):
+    collect_rate = moving_average(series['collected'], RATE_WINDOW)[:, -1]
+    demand_rate = moving_average(series['demand'], RATE_WINDOW)[:, -1]
+    demand_trend = moving_average(series['demand'], TREND_WINDOW)[:, -1]
+    on_hand = series['on_hand']
+
+    # Stock at the end of each future day: steady inflow/outflow at the recent rate, minus the
+    # on-hand units already known to expire that day.
+    elapsed = np.arange(1, horizon_days + 1)
+    projected = (
+        on_hand[:, None]
+        + np.outer(collect_rate - demand_rate, elapsed)
+        - np.cumsum(series['expiring'], axis=1)
+    )
+    short = (projected <= 0) & (demand_rate > 0)[:, None]
+    has_shortage = short.any(axis=1)
+    shortage_day = short.argmax(axis=1)
+
+    days_of_supply = np.divide(on_hand, demand_rate, out=np.full_like(on_hand, np.inf), where=demand_rate > 0)
+
+    forecast = []
+    for index, group in enumerate(BLOOD_GROUPS):
+        shortage_date = today + timedelta(days=int(shortage_day[index])) if has_shortage[index] else None
+        supply = None if np.isinf(days_of_supply[index]) else round(float(days_of_supply[index]), 1)
+        if shortage_date and shortage_day[index] < CRITICAL_DAYS:
+            level = 'critical'
+        elif shortage_date and shortage_day[index] < LOW_DAYS:
+            level = 'low'
+        else:
+            level = 'ok'
+        forecast.append({
+            'group': group,
+            'on_hand': int(on_hand[index]),
+            'collected_per_day': round(float(collect_rate[index]), 1),
+            'demand_per_day': round(float(demand_rate[index]), 1),
+            'demand_trend': round(float(demand_trend[index] - demand_rate[index]), 1),
+            'distributed_per_day': round(float(series['distributed'][index, -RATE_WINDOW:].mean()), 1),
+            'expired_last_window': int(series['expired'][index, -RATE_WINDOW:].sum()),
+            'days_of_supply': supply,
+            'shortage_date': shortage_date,
+            'level': level,
+        })
+    return forecast
+
+
+def compute_forecast(today=None, history_days=HISTORY_DAYS, horizon_days=HORIZON_DAYS):
+    today = today or timezone.localdate()
+    return project(load_series(today, history_days, horizon_days), today, horizon_days)
+
+
+def get_forecast():
+    forecast = cache.get(FORECAST_CACHE_KEY)
+    if forecast is None:
+        forecast = compute_forecast()
+        cache.set(FORECAST_CACHE_KEY, forecast, FORECAST_TIMEOUT)
+    return forecast
@@ -1,8 +1,10 @@
 from django import forms
-from .models import Donor, BloodInventory, BloodRequest, Campaign
+from .models import Donor, BloodInventory, BloodRequest, Campaign, OutboxBroadcast
+from .allocation import allocate_units, compatible_groups
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
 
 class DonorForm(forms.ModelForm):
     blood_type = forms.ChoiceField(
@@ -80,6 +82,7 @@ class InventoryDonationForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['donor'].queryset = Donor.objects.select_related('user')
         self.fields['donor'].required = False
         self.fields['donor'].label = "Source / Donor (Optional)"
         self.fields['donor'].empty_label = "--- External Source / Anonymous ---"
@@ -130,29 +133,39 @@ class RequestDispositionForm(forms.ModelForm):
         queryset=BloodInventory.objects.none(),
         required=False,
         label="Assign Blood Unit (Required for Approval)",
-        empty_label="--- Select a Matching Blood Bag ---",
+        empty_label="--- Select a Compatible Blood Bag ---",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
     class Meta:
         model = BloodRequest
-        fields = ['status', 'assigned_bag']
+        fields = ['status']  # assigned_bag is set by the view once the unit is actually claimed
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         if self.instance.pk:
-            available_bags = BloodInventory.objects.filter(
-                status='AVAILABLE',
-                blood_group=self.instance.patient_blood_type
-            )
-
-            if self.instance.assigned_bag:
-                current_bag = BloodInventory.objects.filter(pk=self.instance.assigned_bag.pk)
-                self.fields['blood_bag'].queryset = available_bags | current_bag
-                self.fields['blood_bag'].initial = self.instance.assigned_bag
-            else:
-                self.fields['blood_bag'].queryset = available_bags
+            blood_type = self.instance.patient_blood_type
+            current_bag = self.instance.assigned_bag
+
+            # Validation accepts any unit of a compatible group, the dropdown only renders the best few.
+            # Whether it is still free is decided when the view claims it, not here.
+            eligible = Q(blood_group__in=compatible_groups(blood_type))
+            if current_bag:
+                eligible |= Q(pk=current_bag.pk)
+            field = self.fields['blood_bag']
+            field.queryset = BloodInventory.objects.filter(eligible)
+
+            suggested = allocate_units(blood_type)
+            if current_bag:
+                field.initial = current_bag
+                if current_bag not in suggested:
+                    suggested.insert(0, current_bag)
+
+            field.widget.choices = [('', field.empty_label)] + [
+                (bag.pk, f"{bag.serial_number} ({bag.blood_group}) - expires {bag.expiry_date:%b %d, %Y}")
+                for bag in suggested
+            ]
 
 class VolunteerCreationForm(UserCreationForm):
     class Meta:
@@ -201,4 +214,27 @@ class CampaignDonationForm(forms.ModelForm):
         widgets = {
             'serial_number': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter Serial No.'}),
             'expiry_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+class InventoryImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label="Inventory CSV File",
+        help_text="Columns: serial_number, blood_group, expiry_date (optional: date_collected, status)",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'})
+    )
+
+class ShortageAlertForm(forms.Form):
+    blood_type = forms.ChoiceField(choices=Donor.BLOOD_TYPES, widget=forms.HiddenInput)
+    match = forms.CharField(required=False, widget=forms.HiddenInput)
+    channel = forms.ChoiceField(
+        choices=OutboxBroadcast.CHANNELS,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    subject = forms.CharField(
+        max_length=200, required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Subject (email only)'})
+    )
+    message = forms.CharField(
+        max_length=640,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3})
+    )
@@ -0,0 +1,159 @@
+import csv
+import time
+from datetime import datetime, time as dt_time
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import BloodInventory, Donor, InventoryStatusChange
+from .events import publish
+from .stock import invalidate_stock_summary
+
+REQUIRED_COLUMNS = ['serial_number', 'blood_group', 'expiry_date']
+BLOOD_GROUPS = {code for code, _ in Donor.BLOOD_TYPES}
+STATUSES = {code for code, _ in BloodInventory.STATUS_CHOICES}
+SERIAL_MAX_LENGTH = BloodInventory._meta.get_field('serial_number').max_length
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.rows = 0
+        self.errors = []  # (line number, serial number, message)
+        self.elapsed = 0.0
+
+    def add_error(self, line, serial, message):
+        self.errors.append((line, serial, message))
+
+
+def parse_timestamp(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date '{value}'")
+        parsed = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def build_unit(row, processed_by):
+    serial = (row.get('serial_number') or '').strip()
+    if not serial:
+        raise ValueError("Missing serial number")
+    if len(serial) > SERIAL_MAX_LENGTH:
+        raise ValueError(f"Serial number longer than {SERIAL_MAX_LENGTH} characters")
+
+    blood_group = (row.get('blood_group') or '').strip().upper()
+    if blood_group not in BLOOD_GROUPS:
+        raise ValueError(f"Unknown blood group '{blood_group}'")
+
+    status = (row.get('status') or 'AVAILABLE').strip().upper()
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status '{status}'")
+
+    expiry_date = parse_timestamp(row.get('expiry_date'))
+    if expiry_date is None:
+        raise ValueError("Missing expiry date")
+    date_collected = parse_timestamp(row.get('date_collected')) or timezone.now()
+
+    # Historical dumps: expired units left the shelf at expiry, everything else on the collection day.
+    status_changed_at = date_collected
+    if status == 'EXPIRED':
+        status_changed_at = max(date_collected, min(expiry_date, timezone.now()))
+
+    return BloodInventory(
+        serial_number=serial,
+        blood_group=blood_group,
+        status=status,
+        expiry_date=expiry_date,
+        date_collected=date_collected,
+        status_changed_at=status_changed_at,
+        processed_by=processed_by,
+    )
+
+
+def _flush(batch, result):
+    # One IN lookup per batch against existing serials; earlier batches are already committed,
+    # so duplicates spread across the file are caught without keeping every serial in memory.
+    serials = [unit.serial_number for _, unit in batch]
+    existing = set(BloodInventory.objects.filter(serial_number__in=serials).values_list('serial_number', flat=True))
+
+    fresh = []
+    for line, unit in batch:
+        if unit.serial_number in existing:
+            result.add_error(line, unit.serial_number, "Serial number already exists")
+        else:
+            fresh.append((line, unit))
+
+    try:
+        with transaction.atomic():
+            units = BloodInventory.objects.bulk_create([unit for _, unit in fresh])
+            InventoryStatusChange.objects.bulk_create(InventoryStatusChange.on_arrival(units))
+    except IntegrityError:
+        # Someone else saved one of these serials after the lookup (a donation recorded, another
+        # import). Insert the batch row by row so only the clashing rows are rejected.
+        _insert_each(fresh, result)
+    else:
+        result.created += len(fresh)
+
+
+def _insert_each(rows, result):
+    for line, unit in rows:
+        unit.pk = None
+        try:
+            with transaction.atomic():
+                unit.save(force_insert=True)
+        except IntegrityError:
+            result.add_error(line, unit.serial_number, "Serial number already exists")
+        else:
+            result.created += 1
+
+
+def import_inventory_csv(stream, processed_by=None, batch_size=DEFAULT_BATCH_SIZE):
+    started = time.perf_counter()
+    result = ImportResult()
+    reader = csv.DictReader(stream)
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        result.add_error(1, '', f"Missing column(s): {', '.join(missing)}")
+        return result
+
+    batch = []
+    batch_serials = set()
+    for row in reader:
+        result.rows += 1
+        line = reader.line_num
+        try:
+            unit = build_unit(row, processed_by)
+        except ValueError as exc:
+            result.add_error(line, (row.get('serial_number') or '').strip(), str(exc))
+            continue
+
+        if unit.serial_number in batch_serials:
+            result.add_error(line, unit.serial_number, "Duplicate serial number in file")
+            continue
+
+        batch.append((line, unit))
+        batch_serials.add(unit.serial_number)
+        if len(batch) >= batch_size:
+            _flush(batch, result)
+            batch, batch_serials = [], set()
+
+    if batch:
+        _flush(batch, result)
+
+    # bulk_create sends no post_save signals.
+    if result.created:
+        invalidate_stock_summary()
+        publish('units.added', count=result.created)
+    result.errors.sort()
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.expiry import DEFAULT_BATCH_SIZE, sweep_expired_units
+
+
+class Command(BaseCommand):
+    help = "Mark AVAILABLE/RESERVED blood units past their expiry date as EXPIRED in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Rows updated per UPDATE statement.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Repeat the sweep every N seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options['batch_size'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, batch_size):
+        def report(number, touched, elapsed):
+            self.stdout.write(f"  chunk {number}: {touched} rows in {elapsed * 1000:.1f} ms")
+
+        started = time.perf_counter()
+        chunks = sweep_expired_units(batch_size=batch_size, on_chunk=report)
+        total = sum(touched for touched, _ in chunks)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {total} units in {len(chunks)} chunks ({(time.perf_counter() - started) * 1000:.1f} ms)."
+        ))
@@ -0,0 +1,48 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollup import refresh_rollup
+from core.synthetic import LOAD_USERS, generate
+
+
+class Command(BaseCommand):
+    help = "Fill the database with production-sized synthetic donors, campaigns, units and requests for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=500_000)
+        parser.add_argument('--units', type=int, default=2_000_000)
+        parser.add_argument('--requests', type=int, default=200_000)
+        parser.add_argument('--campaigns', type=int, default=5_000)
+        parser.add_argument('--participants', type=int, default=60, help="Registrations per campaign.")
+        parser.add_argument('--years', type=int, default=3, help="Length of the history to spread it over.")
+        parser.add_argument('--password', default=os.environ.get('LINGAP_LOAD_PASSWORD'),
+                            help=f"Password for the {', '.join(LOAD_USERS.values())} accounts the load test logs in as "
+                                 "(default: $LINGAP_LOAD_PASSWORD).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--i-know-this-is-not-production', action='store_true', dest='not_production',
+                            help="Run even though DEBUG is off.")
+
+    def handle(self, *args, **options):
+        # It adds half a million fake donors and a superuser: only ever meant for a scratch database.
+        if not settings.DEBUG and not options['not_production']:
+            raise CommandError(
+                "DEBUG is off, so this may be a production database. "
+                "Pass --i-know-this-is-not-production to fill it with synthetic data anyway."
+            )
+        if not options['password']:
+            raise CommandError("Give the load test accounts a password with --password or LINGAP_LOAD_PASSWORD.")
+
+        def report(name, count, elapsed):
+            self.stdout.write(f"  {count:>9} {name} ({elapsed:.1f} s)")
+
+        result = generate(
+            donors=options['donors'], units=options['units'], requests=options['requests'],
+            campaigns=options['campaigns'], participants=options['participants'], years=options['years'],
+            password=options['password'], seed=options['seed'], on_step=report,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Generated {sum(result.counts.values())} rows in {result.elapsed:.1f} s."))
+
+        rollup = refresh_rollup()
+        self.stdout.write(f"Rolled up {rollup.days} day(s) of inventory history ({rollup.elapsed:.1f} s).")
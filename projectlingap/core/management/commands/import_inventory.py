@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import DEFAULT_BATCH_SIZE, import_inventory_csv
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV of blood units (serial_number, blood_group, expiry_date[, date_collected, status]) into inventory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--user', help="Username recorded as processed_by.")
+
+    def handle(self, *args, **options):
+        processed_by = None
+        if options['user']:
+            try:
+                processed_by = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        with open(options['csv_path'], newline='', encoding='utf-8-sig') as stream:
+            result = import_inventory_csv(stream, processed_by=processed_by, batch_size=options['batch_size'])
+
+        for line, serial, message in result.errors:
+            self.stderr.write(f"line {line} {serial}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} of {result.rows} rows in {result.elapsed:.2f}s ({len(result.errors)} errors)."
+        ))
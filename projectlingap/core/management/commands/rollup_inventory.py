@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollup import refresh_rollup
+
+
+class Command(BaseCommand):
+    help = "Bring the daily inventory rollup up to date, replaying only the days that changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Rebuild the whole history (backfill) instead of only the changed days.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Repeat the refresh every N seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            result = refresh_rollup(full=full)
+            if result.days:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Rolled up {result.days} day(s) from {result.start} into {result.rows} rows "
+                    f"({result.elapsed * 1000:.1f} ms)."
+                ))
+            else:
+                self.stdout.write("Rollup already up to date.")
+            if not options['interval']:
+                break
+            full = False
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import DEFAULT_BATCH_SIZE, DEFAULT_RATE, DEFAULT_WORKERS, MAX_ATTEMPTS, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued email/SMS notifications, fanning out donor broadcasts and retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Messages claimed per round.")
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help="Sender threads.")
+        parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                            help="Maximum messages per second over all threads (0 for no limit).")
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help="Give up on a message after this many failed sends.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Repeat every N seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        while True:
+            result = drain_outbox(
+                batch_size=options['batch_size'], workers=options['workers'], rate=options['rate'],
+                max_attempts=options['max_attempts'],
+            )
+            if result.sent or result.retried or result.failed or result.expanded:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Queued {result.expanded} broadcast message(s); sent {result.sent}, "
+                    f"retrying {result.retried}, failed {result.failed} ({result.elapsed:.1f} s)."
+                ))
+            else:
+                self.stdout.write("Nothing to send.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replica import copy_to_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database over the local stand-in replica (set LINGAP_REPLICA_DB first)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Copy again every N seconds, so the replica lags the primary like a real one.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                copy_to_replica()
+            except ImproperlyConfigured as exc:
+                raise CommandError(exc)
+            self.stdout.write(self.style.SUCCESS(f"Replica refreshed ({(time.perf_counter() - started) * 1000:.1f} ms)."))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
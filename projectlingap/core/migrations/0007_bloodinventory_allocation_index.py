@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_donor_email_donor_first_name_donor_last_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['status', 'blood_group', 'expiry_date'], name='inv_status_group_expiry_idx'),
+        ),
+    ]
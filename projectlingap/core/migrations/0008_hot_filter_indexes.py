@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_bloodinventory_allocation_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['status', 'expiry_date'], name='inv_status_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['blood_group', 'expiry_date'], name='inv_group_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['expiry_date'], name='inv_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['date_collected'], name='inv_collected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['donor', 'date_collected'], name='inv_donor_collected_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['request_date'], name='req_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', 'request_date'], name='req_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', 'urgency', 'request_date'], name='req_status_urgency_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['urgency', 'request_date'], name='req_urgency_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['patient_blood_type', 'status', 'request_date'], name='req_type_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['requestor', 'request_date'], name='req_requestor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['end_datetime'], name='campaign_end_idx'),
+        ),
+    ]
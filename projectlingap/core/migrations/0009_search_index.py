@@ -0,0 +1,84 @@
+from django.db import migrations
+
+# FTS5 shadow tables for the donor and request search boxes. Triggers keep them in sync on every
+# write path (forms, admin, bulk updates), including User name changes made through DonorForm.save.
+FORWARD_SQL = [
+    """CREATE VIRTUAL TABLE core_donor_fts USING fts5(
+        first_name, last_name, username,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER core_donor_fts_ai AFTER INSERT ON core_donor BEGIN
+        INSERT INTO core_donor_fts(rowid, first_name, last_name, username)
+        SELECT new.id, u.first_name, u.last_name, u.username FROM auth_user u WHERE u.id = new.user_id;
+    END""",
+    """CREATE TRIGGER core_donor_fts_ad AFTER DELETE ON core_donor BEGIN
+        DELETE FROM core_donor_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER core_donor_fts_au AFTER UPDATE OF user_id ON core_donor BEGIN
+        DELETE FROM core_donor_fts WHERE rowid = old.id;
+        INSERT INTO core_donor_fts(rowid, first_name, last_name, username)
+        SELECT new.id, u.first_name, u.last_name, u.username FROM auth_user u WHERE u.id = new.user_id;
+    END""",
+    """CREATE TRIGGER core_donor_fts_user_au AFTER UPDATE OF first_name, last_name, username ON auth_user BEGIN
+        UPDATE core_donor_fts
+        SET first_name = new.first_name, last_name = new.last_name, username = new.username
+        WHERE rowid IN (SELECT id FROM core_donor WHERE user_id = new.id);
+    END""",
+    """INSERT INTO core_donor_fts(rowid, first_name, last_name, username)
+        SELECT d.id, u.first_name, u.last_name, u.username
+        FROM core_donor d JOIN auth_user u ON u.id = d.user_id""",
+
+    """CREATE VIRTUAL TABLE core_bloodrequest_fts USING fts5(
+        patient_name, hospital_name, physician_name,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER core_bloodrequest_fts_ai AFTER INSERT ON core_bloodrequest BEGIN
+        INSERT INTO core_bloodrequest_fts(rowid, patient_name, hospital_name, physician_name)
+        VALUES (new.id, new.patient_name, new.hospital_name, new.physician_name);
+    END""",
+    """CREATE TRIGGER core_bloodrequest_fts_ad AFTER DELETE ON core_bloodrequest BEGIN
+        DELETE FROM core_bloodrequest_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER core_bloodrequest_fts_au
+        AFTER UPDATE OF patient_name, hospital_name, physician_name ON core_bloodrequest BEGIN
+        UPDATE core_bloodrequest_fts
+        SET patient_name = new.patient_name, hospital_name = new.hospital_name, physician_name = new.physician_name
+        WHERE rowid = new.id;
+    END""",
+    """INSERT INTO core_bloodrequest_fts(rowid, patient_name, hospital_name, physician_name)
+        SELECT id, patient_name, hospital_name, physician_name FROM core_bloodrequest""",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS core_bloodrequest_fts_au",
+    "DROP TRIGGER IF EXISTS core_bloodrequest_fts_ad",
+    "DROP TRIGGER IF EXISTS core_bloodrequest_fts_ai",
+    "DROP TABLE IF EXISTS core_bloodrequest_fts",
+    "DROP TRIGGER IF EXISTS core_donor_fts_user_au",
+    "DROP TRIGGER IF EXISTS core_donor_fts_au",
+    "DROP TRIGGER IF EXISTS core_donor_fts_ad",
+    "DROP TRIGGER IF EXISTS core_donor_fts_ai",
+    "DROP TABLE IF EXISTS core_donor_fts",
+]
+
+
+def run_sql(statements):
+    def apply(apps, schema_editor):
+        # Other backends fall back to icontains search in core.search.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0008_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:51
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_status_changed_at(apps, schema_editor):
+    # Best guess for rows that predate the column: expired units left the shelf at expiry, units on a
+    # request when the request came in, anything else (including AVAILABLE) on the collection day.
+    BloodInventory = apps.get_model('core', 'BloodInventory')
+    BloodRequest = apps.get_model('core', 'BloodRequest')
+    now = django.utils.timezone.now()
+    units = BloodInventory.objects.using(schema_editor.connection.alias)
+
+    units.filter(status='EXPIRED', expiry_date__lt=now).update(status_changed_at=F('expiry_date'))
+    request_date = BloodRequest.objects.filter(assigned_bag=OuterRef('pk')).values('request_date')[:1]
+    units.filter(status__in=['RESERVED', 'DISTRIBUTED'], request_assignment__isnull=False).update(
+        status_changed_at=Subquery(request_date),
+    )
+    units.filter(status__in=['AVAILABLE', 'RESERVED', 'DISTRIBUTED'], request_assignment__isnull=True).update(
+        status_changed_at=F('date_collected'),
+    )
+    # A unit can't leave the shelf before it was collected.
+    units.filter(status_changed_at__lt=F('date_collected')).update(status_changed_at=F('date_collected'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('blood_group', models.CharField(choices=[('A+', 'A Positive'), ('A-', 'A Negative'), ('B+', 'B Positive'), ('B-', 'B Negative'), ('AB+', 'AB Positive'), ('AB-', 'AB Negative'), ('O+', 'O Positive'), ('O-', 'O Negative')], max_length=3)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('RESERVED', 'Reserved'), ('EXPIRED', 'Expired'), ('DISTRIBUTED', 'Distributed')], max_length=20)),
+                ('units', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_day', models.DateField(blank=True, null=True)),
+                ('last_unit_id', models.BigIntegerField(default=0)),
+                ('dirty_from', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bloodinventory',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_status_changed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['status_changed_at'], name='inv_status_changed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='inventoryrollup',
+            unique_together={('date', 'blood_group', 'status')},
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:05
+
+from datetime import timedelta
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+# Adding a NOT NULL column makes SQLite rebuild core_donor (copy, drop, rename), which the FTS
+# triggers from 0009 don't survive; take them down for the rebuild and put them back after.
+search_index = import_module('core.migrations.0009_search_index')
+CREATE_DONOR_TRIGGERS = [sql for sql in search_index.FORWARD_SQL if sql.startswith('CREATE TRIGGER core_donor_')]
+DROP_DONOR_TRIGGERS = [sql for sql in search_index.REVERSE_SQL if sql.startswith('DROP TRIGGER IF EXISTS core_donor_')]
+
+
+def backfill_eligibility(apps, schema_editor):
+    Donor = apps.get_model('core', 'Donor')
+    BloodInventory = apps.get_model('core', 'BloodInventory')
+    donors = Donor.objects.using(schema_editor.connection.alias)
+
+    last_donation = BloodInventory.objects.filter(donor=OuterRef('pk')).order_by('-date_collected').values('date_collected')[:1]
+    donors.update(last_donation_at=Subquery(last_donation))
+    # core.eligibility.DONATION_INTERVAL at the time of writing.
+    donors.filter(last_donation_at__isnull=False).update(next_eligible_at=F('last_donation_at') + timedelta(days=90))
+    joined = Donor.objects.filter(pk=OuterRef('pk')).values('user__date_joined')[:1]
+    donors.filter(last_donation_at__isnull=True).update(next_eligible_at=Subquery(joined))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_inventory_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(search_index.run_sql(DROP_DONOR_TRIGGERS), search_index.run_sql(CREATE_DONOR_TRIGGERS)),
+        migrations.AddField(
+            model_name='donor',
+            name='last_donation_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='next_eligible_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_eligibility, migrations.RunPython.noop),
+        migrations.RunPython(search_index.run_sql(CREATE_DONOR_TRIGGERS), search_index.run_sql(DROP_DONOR_TRIGGERS)),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['blood_type', 'next_eligible_at'], name='donor_type_eligible_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_status_log(apps, schema_editor):
+    # Earlier moves were not kept: a unit off the shelf is taken to have gone straight there at
+    # status_changed_at. One INSERT ... SELECT, as there can be millions of these.
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote('core_inventorystatuschange')} "
+        f"({quote('unit_id')}, {quote('from_status')}, {quote('to_status')}, {quote('changed_at')}) "
+        f"SELECT {quote('id')}, 'AVAILABLE', {quote('status')}, {quote('status_changed_at')} "
+        f"FROM {quote('core_bloodinventory')} WHERE {quote('status')} <> 'AVAILABLE'"
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('AVAILABLE', 'Available'), ('RESERVED', 'Reserved'), ('EXPIRED', 'Expired'), ('DISTRIBUTED', 'Distributed')], max_length=20)),
+                ('to_status', models.CharField(choices=[('AVAILABLE', 'Available'), ('RESERVED', 'Reserved'), ('EXPIRED', 'Expired'), ('DISTRIBUTED', 'Distributed')], max_length=20)),
+                ('changed_at', models.DateTimeField()),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='core.bloodinventory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['changed_at'], name='inv_change_at_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_status_log, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:30
+
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_inventory_status_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonorSearchIndex',
+            fields=[
+                ('donor', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='core.donor')),
+                ('document', core.models.FullTextField(db_column='core_donor_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'core_donor_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestSearchIndex',
+            fields=[
+                ('request', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='core.bloodrequest')),
+                ('document', core.models.FullTextField(db_column='core_bloodrequest_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'core_bloodrequest_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DEFERRED
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -18,6 +19,15 @@ class Donor(models.Model):
     last_name = models.CharField(max_length=100, blank=True)
     email = models.EmailField(max_length=254, blank=True)
 
+    # Kept in sync with BloodInventory by core.eligibility; never-donated donors are eligible from signup.
+    last_donation_at = models.DateTimeField(null=True, blank=True)
+    next_eligible_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['blood_type', 'next_eligible_at'], name='donor_type_eligible_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.get_full_name()} ({self.blood_type})"
 
@@ -29,6 +39,11 @@ class Campaign(models.Model):
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['end_datetime'], name='campaign_end_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.start_datetime.date()}"
 
@@ -61,11 +76,71 @@ class BloodInventory(models.Model):
     date_collected = models.DateTimeField(default=timezone.now)
     expiry_date = models.DateTimeField()
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    # When the unit moved to its current status; InventoryStatusChange keeps every move for the daily rollup.
+    status_changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'blood_group', 'expiry_date'], name='inv_status_group_expiry_idx'),
+            models.Index(fields=['status', 'expiry_date'], name='inv_status_expiry_idx'),
+            models.Index(fields=['blood_group', 'expiry_date'], name='inv_group_expiry_idx'),
+            models.Index(fields=['expiry_date'], name='inv_expiry_idx'),
+            models.Index(fields=['date_collected'], name='inv_collected_idx'),
+            models.Index(fields=['donor', 'date_collected'], name='inv_donor_collected_idx'),
+            models.Index(fields=['status_changed_at'], name='inv_status_changed_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember()
+        return instance
+
+    def _remember(self):
+        # What save() compares against; fields that were never loaded are never treated as changed.
+        self._loaded = tuple(
+            self.__dict__.get(name, DEFERRED) for name in ('status', 'date_collected', 'blood_group', 'donor_id')
+        )
+
+    def moved(self, status, changed_at):
+        # For status changes written with a queryset update() (core.allocation), which logs them itself.
+        self.status, self.status_changed_at = status, changed_at
+        self._remember()
 
     def save(self, *args, **kwargs):
         if not self.blood_group and self.donor:
             self.blood_group = self.donor.blood_type
-        super().save(*args, **kwargs)
+
+        loaded_status, loaded_collected, loaded_group, loaded_donor = getattr(self, '_loaded', (DEFERRED,) * 4)
+        arriving = self._state.adding
+        moved = loaded_status is not DEFERRED and self.status != loaded_status
+        donors = {self.donor_id} if arriving else set()  # whose eligibility signals.py refreshes
+        rewritten = []  # first moments of history the daily rollup has to replay; signals.py marks it dirty
+        if moved:
+            self.status_changed_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'status_changed_at'}
+            rewritten.append(self.status_changed_at)  # logged below, so earlier days keep the old status
+        if loaded_collected is not DEFERRED and self.date_collected != loaded_collected:
+            rewritten.append(min(loaded_collected, self.date_collected))
+            donors.add(self.donor_id)
+        if loaded_donor is not DEFERRED and self.donor_id != loaded_donor:
+            donors |= {loaded_donor, self.donor_id}  # one loses the donation, the other gains it
+        if loaded_group is not DEFERRED and self.blood_group != loaded_group:
+            rewritten.append(self.date_collected)  # counted under the old group since it was collected
+        if rewritten:
+            self._rollup_dirty_from = min(rewritten)
+        self._eligibility_donors = donors - {None}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if arriving:
+                InventoryStatusChange.objects.bulk_create(InventoryStatusChange.on_arrival([self]))
+            elif moved:
+                InventoryStatusChange.objects.create(
+                    unit=self, from_status=loaded_status, to_status=self.status, changed_at=self.status_changed_at,
+                )
+        self._remember()
 
     def __str__(self):
         return f"{self.serial_number} ({self.blood_group})"
@@ -97,5 +172,161 @@ class BloodRequest(models.Model):
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='processed_requests',
                                      blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['request_date'], name='req_date_idx'),
+            models.Index(fields=['status', 'request_date'], name='req_status_date_idx'),
+            models.Index(fields=['status', 'urgency', 'request_date'], name='req_status_urgency_date_idx'),
+            models.Index(fields=['urgency', 'request_date'], name='req_urgency_date_idx'),
+            models.Index(fields=['patient_blood_type', 'status', 'request_date'], name='req_type_status_date_idx'),
+            models.Index(fields=['requestor', 'request_date'], name='req_requestor_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def __str__(self):
+        return f"{self.patient_name} ({self.urgency}) - {self.status}"
+
+class InventoryRollup(models.Model):
+    # End-of-day unit counts per blood group and status, maintained by core.rollup.
+    date = models.DateField()
+    blood_group = models.CharField(max_length=3, choices=Donor.BLOOD_TYPES)
+    status = models.CharField(max_length=20, choices=BloodInventory.STATUS_CHOICES)
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'blood_group', 'status')
+
+    def __str__(self):
+        return f"{self.date} {self.blood_group} {self.status}: {self.units}"
+
+class RollupState(models.Model):
+    # Single row: how far the rollup has been brought up to date.
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    last_day = models.DateField(null=True, blank=True)
+    last_unit_id = models.BigIntegerField(default=0)
+    dirty_from = models.DateField(null=True, blank=True)
+
+class InventoryStatusChange(models.Model):
+    # Append-only log of status moves, replayed by core.rollup so closed days keep the counts they had.
+    # A unit is AVAILABLE from its collection; one entered in another status gets a row for that too.
+    unit = models.ForeignKey(BloodInventory, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=BloodInventory.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=BloodInventory.STATUS_CHOICES)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['changed_at'], name='inv_change_at_idx')]
+
+    @classmethod
+    def on_arrival(cls, units):
+        # For units created in bulk; BloodInventory.save() writes these itself.
+        return [
+            cls(unit=unit, from_status='AVAILABLE', to_status=unit.status, changed_at=unit.status_changed_at)
+            for unit in units if unit.status != 'AVAILABLE'
+        ]
+
+    def __str__(self):
+        return f"{self.unit_id}: {self.from_status} -> {self.to_status}"
+
+class OutboxBroadcast(models.Model):
+    # One row per shortage alert or campaign announcement; send_notifications fans it out to donors.
+    CHANNELS = [('EMAIL', 'Email'), ('SMS', 'SMS')]
+
+    channel = models.CharField(max_length=5, choices=CHANNELS)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    blood_type = models.CharField(max_length=3, choices=Donor.BLOOD_TYPES, blank=True)  # blank: every eligible donor
+    compatible = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_donor_id = models.BigIntegerField(default=0)  # fan-out progress, so an interrupted run resumes
+    expanded_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.channel} to {self.blood_type or 'all'} donors: {self.subject or self.body[:40]}"
+
+class OutboxMessage(models.Model):
+    STATUS_CHOICES = [('PENDING', 'Pending'), ('SENT', 'Sent'), ('FAILED', 'Failed')]
+
+    channel = models.CharField(max_length=5, choices=OutboxBroadcast.CHANNELS)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    broadcast = models.ForeignKey(OutboxBroadcast, on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.patient_name} ({self.urgency}) - {self.status}"
\ No newline at end of file
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+class RequestProfile(models.Model):
+    # One row per request the SQL profiler sampled; see core.profiling.
+    url_name = models.CharField(max_length=100)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    db_ms = models.FloatField()
+    render_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    duplicate_queries = models.PositiveIntegerField()
+    slowest = models.JSONField(default=list)  # [{'ms', 'sql', 'site'}], slowest first
+    recorded_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.url_name} {self.duration_ms:.0f} ms, {self.queries} queries"
+
+# SEARCH INDEXES
+# The FTS5 tables migration 0009 creates and its triggers keep in step (SQLite only). Unmanaged, so
+# core.search can join them like any relation: one join, with MATCH driving the query.
+
+class FullTextField(models.TextField):
+    # FTS5's hidden column named after its table: "core_donor_fts MATCH 'query'" searches the whole row.
+    pass
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+class DonorSearchIndex(models.Model):
+    donor = models.OneToOneField(
+        Donor, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_index',
+    )
+    document = FullTextField(db_column='core_donor_fts')
+    rank = models.FloatField()  # FTS5's built-in bm25 rank of the match; lower is better
+
+    class Meta:
+        managed = False
+        db_table = 'core_donor_fts'
+
+class RequestSearchIndex(models.Model):
+    request = models.OneToOneField(
+        BloodRequest, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_index',
+    )
+    document = FullTextField(db_column='core_bloodrequest_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'core_bloodrequest_fts'
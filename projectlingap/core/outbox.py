@@ -0,0 +1,223 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import sms
+from .eligibility import recall_queryset
+from .models import Donor, OutboxBroadcast, OutboxMessage
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 20.0  # messages per second over all workers; gateways throttle or bill above their plan
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30  # seconds before the first retry, doubling after each failure
+RETRY_CAP = 60 * 60
+CLAIM_LEASE = timedelta(minutes=5)  # a crashed worker's batch becomes due again after this
+EXPAND_CHUNK_SIZE = 1000
+UPDATE_BATCH_SIZE = 500
+
+
+# NOTIFICATION OUTBOX
+# Views never talk to a mail server or SMS gateway. They add OutboxMessage rows (or a single
+# OutboxBroadcast for a donor-wide alert) inside the transaction that makes the change, so a
+# notification exists exactly when its change committed. The send_notifications worker expands
+# broadcasts into messages, claims due rows in batches and sends them from a thread pool under a
+# shared rate limit; failures are retried with exponential backoff until MAX_ATTEMPTS.
+
+class DrainResult:
+    def __init__(self):
+        self.expanded = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+
+def enqueue(channel, recipient, body, subject=''):
+    return OutboxMessage.objects.create(channel=channel, recipient=recipient, subject=subject, body=body)
+
+
+def notify_request_status(blood_request):
+    requestor = blood_request.requestor
+    if requestor is None or not requestor.email:
+        return None
+    return enqueue(
+        'EMAIL', requestor.email,
+        f"Your blood request for {blood_request.patient_name} is now {blood_request.get_status_display()}.",
+        subject="Blood request update",
+    )
+
+
+def broadcast(channel, body, subject='', blood_type='', compatible=True, created_by=None):
+    # One row however many donors it reaches; the worker does the fan-out.
+    return OutboxBroadcast.objects.create(
+        channel=channel, body=body, subject=subject, blood_type=blood_type or '', compatible=compatible,
+        created_by=created_by,
+    )
+
+
+# FAN-OUT
+
+def _audience(outbox_broadcast):
+    # Eligibility is frozen at the moment of the alert, so a resumed expansion sees the same donors.
+    if outbox_broadcast.blood_type:
+        donors = recall_queryset(outbox_broadcast.blood_type, outbox_broadcast.compatible, now=outbox_broadcast.created_at)
+    else:
+        donors = Donor.objects.filter(next_eligible_at__lte=outbox_broadcast.created_at)
+    field = 'contact_no' if outbox_broadcast.channel == 'SMS' else 'user__email'
+    return donors.exclude(**{field: ''}).values_list('pk', field)
+
+
+def expand_broadcast(outbox_broadcast, chunk_size=EXPAND_CHUNK_SIZE):
+    # One ordered read of the remaining audience, written in chunks. Each chunk commits together with
+    # the broadcast's progress marker, so an interrupted run resumes after the last donor written.
+    rows = list(_audience(outbox_broadcast).filter(pk__gt=outbox_broadcast.last_donor_id).order_by('pk'))
+    created = 0
+    for start in range(0, max(len(rows), 1), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        last_donor_id = chunk[-1][0] if chunk else outbox_broadcast.last_donor_id
+        done = start + chunk_size >= len(rows)
+        with transaction.atomic():
+            # Conditional on the old position, so two workers can't both write the same chunk.
+            moved = OutboxBroadcast.objects.filter(
+                pk=outbox_broadcast.pk, last_donor_id=outbox_broadcast.last_donor_id, expanded_at__isnull=True,
+            ).update(last_donor_id=last_donor_id, expanded_at=timezone.now() if done else None)
+            if not moved:
+                break
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage(
+                    channel=outbox_broadcast.channel, recipient=recipient, subject=outbox_broadcast.subject,
+                    body=outbox_broadcast.body, broadcast=outbox_broadcast,
+                )
+                for _, recipient in chunk
+            ], batch_size=UPDATE_BATCH_SIZE)
+        outbox_broadcast.last_donor_id = last_donor_id
+        created += len(chunk)
+    return created
+
+
+def expand_broadcasts(chunk_size=EXPAND_CHUNK_SIZE):
+    return sum(
+        expand_broadcast(outbox_broadcast, chunk_size)
+        for outbox_broadcast in OutboxBroadcast.objects.filter(expanded_at__isnull=True).order_by('pk')
+    )
+
+
+# SENDING
+
+class RateLimiter:
+    # Hands out send slots 1/rate seconds apart to every worker thread.
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE * 2 ** (attempts - 1), RETRY_CAP)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))  # jitter, so failed batches don't retry in lockstep
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE):
+    # Claiming pushes next_attempt_at out by the lease, so the same rows aren't due for another worker.
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = OutboxMessage.objects.filter(status='PENDING', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+    claimed = OutboxMessage.objects.filter(
+        pk__in=due.values('pk')[:batch_size], status='PENDING', next_attempt_at__lte=now,
+    ).update(claim_token=token, next_attempt_at=now + CLAIM_LEASE)
+    if not claimed:
+        return []
+    return list(OutboxMessage.objects.filter(claim_token=token))
+
+
+def _send_slice(messages, limiter):
+    # Runs on a pool thread without touching the database; one mail connection for the whole slice.
+    connection = mail.get_connection()
+    gateway = sms.get_backend()
+    outcomes = []
+    try:
+        for message in messages:
+            limiter.wait()
+            try:
+                if message.channel == 'SMS':
+                    gateway.send(message.recipient, message.body)
+                else:
+                    connection.open()  # no-op while the connection is up
+                    mail.EmailMessage(
+                        message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.recipient],
+                        connection=connection,
+                    ).send()
+                outcomes.append((message, None))
+            except Exception as exc:
+                if message.channel == 'EMAIL':
+                    connection.close()  # reconnect for the next message
+                outcomes.append((message, f"{type(exc).__name__}: {exc}"))
+    finally:
+        connection.close()
+    return outcomes
+
+
+def _record(outcomes, max_attempts, result):
+    # Successes (nearly everything) are one UPDATE per chunk; only failures need per-row values.
+    now = timezone.now()
+    sent = [message.pk for message, error in outcomes if error is None]
+    for start in range(0, len(sent), UPDATE_BATCH_SIZE):
+        OutboxMessage.objects.filter(pk__in=sent[start:start + UPDATE_BATCH_SIZE]).update(
+            status='SENT', sent_at=now, attempts=F('attempts') + 1, claim_token='', last_error='',
+        )
+    result.sent += len(sent)
+
+    failed = []
+    for message, error in outcomes:
+        if error is None:
+            continue
+        message.attempts += 1
+        message.claim_token, message.last_error = '', error
+        if message.attempts >= max_attempts:
+            message.status = 'FAILED'
+            result.failed += 1
+        else:
+            message.next_attempt_at = now + retry_delay(message.attempts)
+            result.retried += 1
+        failed.append(message)
+    OutboxMessage.objects.bulk_update(
+        failed, ['status', 'attempts', 'next_attempt_at', 'claim_token', 'last_error'], batch_size=UPDATE_BATCH_SIZE,
+    )
+
+
+def drain_outbox(batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, max_attempts=MAX_ATTEMPTS):
+    # Sends everything that is due now; rows rescheduled for a retry wait for a later run.
+    started = time.perf_counter()
+    result = DrainResult()
+    result.expanded = expand_broadcasts()
+    limiter = RateLimiter(rate)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while batch := claim_batch(batch_size):
+            slices = [batch[index::workers] for index in range(min(workers, len(batch)))]
+            outcomes = [outcome for part in pool.map(partial(_send_slice, limiter=limiter), slices) for outcome in part]
+            _record(outcomes, max_attempts, result)
+
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,144 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# KEYSET (CURSOR) PAGINATION
+# Pages are fetched with "WHERE (sort columns) > last row seen ... LIMIT n" instead of COUNT(*) + OFFSET,
+# so page N costs the same as page 1. The ordering must end with a unique column (id) as tiebreaker.
+
+
+def encode_cursor(obj, ordering):
+    values = [getattr(obj, name.lstrip('-')) for name in ordering]
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, token):
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            return None
+        return [model._meta.get_field(name.lstrip('-')).to_python(value) for name, value in zip(ordering, values)]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+def keyset_filter(ordering, values, forward=True):
+    # (a, b) > (x, y) becomes a >= x AND (a > x OR (a = x AND b > y)); the leading bound lets
+    # SQLite seek straight into the index instead of walking it from the start.
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') == forward else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+
+    first = ordering[0].lstrip('-')
+    first_lookup = 'lte' if ordering[0].startswith('-') == forward else 'gte'
+    return Q(**{f'{first}__{first_lookup}': values[0]}) & condition
+
+
+def reverse_ordering(ordering):
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+class KeysetPage:
+    is_keyset = True
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1], self.ordering) if self.has_next() else ''
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0], self.ordering) if self.has_previous() else ''
+
+
+def keyset_page(queryset, ordering, page_size, after=None, before=None):
+    queryset = queryset.order_by(*ordering)
+
+    cursor = decode_cursor(queryset.model, ordering, before)
+    if cursor is not None:
+        rows = list(
+            queryset.filter(keyset_filter(ordering, cursor, forward=False))
+            .order_by(*reverse_ordering(ordering))[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        return KeysetPage(rows[:page_size][::-1], ordering, has_next=True, has_previous=has_previous)
+
+    cursor = decode_cursor(queryset.model, ordering, after)
+    if cursor is not None:
+        queryset = queryset.filter(keyset_filter(ordering, cursor, forward=True))
+    rows = list(queryset[:page_size + 1])
+    return KeysetPage(rows[:page_size], ordering, has_next=len(rows) > page_size, has_previous=cursor is not None)
+
+
+def merged_keyset_page(querysets, ordering, page_size, after=None, before=None):
+    # One keyset page per queryset, merged in Python. For "col IN (a, b, c) ORDER BY x" each part walks
+    # its own (col, x) index range in order, where the combined query would sort every matching row.
+    # All ordering fields must sort in the same direction.
+    pages = [keyset_page(queryset, ordering, page_size, after=after, before=before) for queryset in querysets]
+    rows = sorted(
+        (obj for page in pages for obj in page.object_list),
+        key=lambda obj: [getattr(obj, name.lstrip('-')) for name in ordering],
+        reverse=ordering[0].startswith('-'),
+    )
+    more = len(rows) > page_size
+    model = querysets[0].model
+
+    if decode_cursor(model, ordering, before) is not None:
+        has_previous = more or any(page._has_previous for page in pages)
+        return KeysetPage(rows[-page_size:], ordering, has_next=True, has_previous=has_previous)
+    has_next = more or any(page._has_next for page in pages)
+    has_previous = decode_cursor(model, ordering, after) is not None
+    return KeysetPage(rows[:page_size], ordering, has_next=has_next, has_previous=has_previous)
+
+
+class KeysetPaginationMixin:
+    keyset_ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Querysets re-ordered elsewhere (e.g. ranked search results) keep offset pagination.
+        if tuple(queryset.query.order_by) != tuple(self.keyset_ordering):
+            return super().paginate_queryset(queryset, page_size)
+
+        page = keyset_page(
+            queryset, self.keyset_ordering, page_size,
+            after=self.request.GET.get('after'), before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query_params = self.request.GET.copy()
+        for key in ('page', 'after', 'before'):
+            query_params.pop(key, None)
+        context['search_params'] = query_params.urlencode()
+        return context
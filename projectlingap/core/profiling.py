@@ -0,0 +1,210 @@
+import heapq
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.utils import timezone
+
+from .models import RequestProfile
+
+FORCE_PARAM = '_profile'  # ?_profile=1 profiles the request regardless of the sample rate (superusers only)
+SLOWEST_KEPT = 5
+SQL_MAX_LENGTH = 2000
+RETENTION = timedelta(days=7)
+PRUNE_CHANCE = 0.01  # one sampled request in a hundred also deletes rows older than RETENTION
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+VIEWS_FILE = os.path.join(CORE_DIR, 'views.py')
+HANDLER_FILE = os.path.join('django', 'core', 'handlers', 'base.py')  # frames above it are middleware
+
+logger = logging.getLogger(__name__)
+slow_log = logging.getLogger('core.profiling.slow')  # JSON lines only; see LOGGING in settings
+_active = ContextVar('core_request_profile', default=None)
+
+
+# SQL PROFILING
+# Most requests pay one random() call and go straight through. A sampled request runs with a query
+# wrapper on every connection that counts and times each statement and keeps the slowest few together
+# with where they came from: the template line that triggered a lazy queryset, or the core module
+# (and the core/views.py line) that ran it. Template rendering is timed by the backend below. Each
+# sample becomes a RequestProfile row for the summary page; slow ones also go to the rotating log.
+# Not counted: reads core.dashboards gathers on worker threads (other connections) and queries run
+# while a streaming export is iterated, after the middleware has returned.
+
+def _call_site():
+    sites = []
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated' and 'token' in getattr(frame.f_locals.get('self'), '__dict__', {}):
+            node = frame.f_locals['self']
+            sites.append(f"{node.origin.template_name or node.origin.name}:{node.token.lineno}")
+            break
+        if code.co_filename.startswith(CORE_DIR) and code.co_filename != __file__:
+            sites.append(f"core/{os.path.relpath(code.co_filename, CORE_DIR)}:{frame.f_lineno} in {code.co_name}")
+            if code.co_filename == VIEWS_FILE:
+                break
+        elif code.co_filename.endswith(HANDLER_FILE) and sites:
+            break
+        frame = frame.f_back
+    return ' < '.join(sites)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.statements = Counter()
+        self.slowest = []  # min-heap of (ms, order, sql, site)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.db_ms += elapsed
+            self.statements[sql] += 1
+            # Only a statement that makes the top few pays for the stack walk.
+            if len(self.slowest) < SLOWEST_KEPT or elapsed > self.slowest[0][0]:
+                entry = (elapsed, self.queries, sql[:SQL_MAX_LENGTH], _call_site())
+                if len(self.slowest) < SLOWEST_KEPT:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heapreplace(self.slowest, entry)
+
+    @property
+    def duplicate_queries(self):
+        return self.queries - len(self.statements)
+
+    def slowest_statements(self):
+        return [
+            {'ms': round(ms, 2), 'sql': sql, 'site': site}
+            for ms, _, sql, site in sorted(self.slowest, reverse=True)
+        ]
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        recorder = _active.get()
+        if recorder is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorder.render_ms += (time.perf_counter() - started) * 1000
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    # The stock backend, with render() timed on sampled requests. {% include %} renders inside its
+    # parent template, so only top-level templates are timed and nothing is counted twice.
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class SQLProfileMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_PROFILE_SAMPLE_RATE and not self.forced(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = _active.set(recorder)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _active.reset(token)
+        record(request, response, recorder, (time.perf_counter() - started) * 1000)
+        return response
+
+    def forced(self, request):
+        return FORCE_PARAM in request.GET and request.user.is_superuser
+
+
+def record(request, response, recorder, duration_ms):
+    match = request.resolver_match
+    profile = RequestProfile(
+        url_name=(match.view_name if match else '(unresolved)')[:100],
+        method=request.method,
+        path=request.path[:255],
+        status_code=response.status_code,
+        duration_ms=round(duration_ms, 2),
+        db_ms=round(recorder.db_ms, 2),
+        render_ms=round(recorder.render_ms, 2),
+        queries=recorder.queries,
+        duplicate_queries=recorder.duplicate_queries,
+        slowest=recorder.slowest_statements(),
+    )
+    if duration_ms >= settings.SQL_PROFILE_SLOW_MS:
+        slow_log.warning(json.dumps({
+            'at': profile.recorded_at.isoformat(), 'url_name': profile.url_name, 'method': profile.method,
+            'path': profile.path, 'status': profile.status_code, 'ms': profile.duration_ms, 'db_ms': profile.db_ms,
+            'render_ms': profile.render_ms, 'queries': profile.queries, 'duplicates': profile.duplicate_queries,
+            'slowest': profile.slowest,
+        }))
+    try:
+        profile.save()
+        if random.random() < PRUNE_CHANCE:
+            RequestProfile.objects.filter(recorded_at__lt=timezone.now() - RETENTION).delete()
+    except DatabaseError:
+        # Profiling must never fail the request it measured (e.g. SQLite busy under load).
+        logger.exception("Could not store the profile for %s", profile.path)
+
+
+# SUMMARY
+
+def summarize(since):
+    # Per URL name, busiest first: a page that is a little slow but hit constantly costs more than
+    # a rare slow one. Percentiles are over the sampled requests only.
+    groups = defaultdict(list)
+    rows = RequestProfile.objects.filter(recorded_at__gte=since).values_list(
+        'url_name', 'duration_ms', 'db_ms', 'render_ms', 'queries', 'duplicate_queries',
+    )
+    for url_name, *values in rows:
+        groups[url_name].append(values)
+
+    summary = []
+    for url_name, values in groups.items():
+        duration, db, render, queries, duplicates = np.array(values, dtype=float).T
+        p50, p95 = np.percentile(duration, [50, 95])
+        summary.append({
+            'url_name': url_name, 'samples': len(duration), 'p50_ms': p50, 'p95_ms': p95, 'max_ms': duration.max(),
+            'db_ms': db.mean(), 'render_ms': render.mean(), 'queries': queries.mean(), 'max_queries': int(queries.max()),
+            'duplicates': duplicates.mean(), 'total_ms': duration.sum(),
+            'slow': int((duration >= settings.SQL_PROFILE_SLOW_MS).sum()),
+        })
+    summary.sort(key=lambda row: row['total_ms'], reverse=True)
+    return summary
+
+
+def slow_requests(since, limit=20):
+    return RequestProfile.objects.filter(
+        recorded_at__gte=since, duration_ms__gte=settings.SQL_PROFILE_SLOW_MS,
+    ).order_by('-duration_ms')[:limit]
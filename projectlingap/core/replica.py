@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'lingap_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_replica_reads = ContextVar('core_replica_reads', default=False)
+_pinned = ContextVar('core_replica_pinned', default=False)
+
+
+# READ REPLICA
+# Nothing goes to the replica by default. List pages, exports, dashboards and reports opt in with
+# ReplicaReadsMixin / @replica_reads (or `with reading_from_replica():` in reporting code), and even
+# then only reads of core models move: sessions and auth stay on the primary, as does anything inside
+# an atomic block, select_for_update() and every write. A client that just POSTed is pinned to the
+# primary for REPLICA_PIN_SECONDS, so the page it is redirected to shows its own change even if the
+# replica is behind.
+
+def replica_alias():
+    return REPLICA_ALIAS if REPLICA_ALIAS in settings.DATABASES else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None or not _replica_reads.get() or _pinned.get() or model._meta.app_label != 'core':
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS  # a transaction's reads must see its own writes
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so an object loaded from the replica is still saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # same data on both
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS  # the replica gets its schema from the primary
+
+
+@contextmanager
+def reading_from_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view):
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with reading_from_replica():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with reading_from_replica():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadsMixin:
+    def dispatch(self, request, *args, **kwargs):
+        with reading_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    def __init__(self, get_response):
+        if replica_alias() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writing = request.method not in SAFE_METHODS
+        token = _pinned.set(writing or PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        if writing:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+
+# LOCAL STAND-IN
+
+def copy_to_replica():
+    # Refreshes a replica that is just a second SQLite file (development, load tests) with SQLite's
+    # online backup, which copies a consistent snapshot while the primary stays writable.
+    alias = replica_alias()
+    if alias is None:
+        raise ImproperlyConfigured(f"No '{REPLICA_ALIAS}' database is configured.")
+    primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+        raise ImproperlyConfigured("Only a SQLite replica can be copied; use the database's own replication.")
+    primary.ensure_connection()
+    replica.ensure_connection()
+    primary.connection.backup(replica.connection)
@@ -0,0 +1,110 @@
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+RED_CROSS_GROUP = 'Red Cross'
+ROLE_SESSION_KEY = '_core_roles'
+ROLE_VERSION_KEY = 'core:role_version:{}'
+ROLE_GLOBAL_VERSION_KEY = 'core:role_version:all'
+ROLE_SESSION_MAX_AGE = 15 * 60  # backstop in case the version keys were evicted from the cache
+
+
+# ROLE RESOLUTION
+# Staff and superusers are decided from columns already on request.user, so they never query.
+# Everyone else needs the "Red Cross" group lookup: it runs once, is kept on the user object for the
+# rest of the request and in the session for later ones. The session copy is tagged with is_staff,
+# is_superuser and a version that the signals bump whenever group membership changes.
+
+def _compute_roles(user):
+    red_cross = user.is_staff or user.groups.filter(name=RED_CROSS_GROUP).exists()
+    return {'superuser': user.is_superuser, 'red_cross': red_cross, 'donor': not user.is_staff}
+
+
+def _fingerprint(user):
+    versions = cache.get_many([ROLE_VERSION_KEY.format(user.pk), ROLE_GLOBAL_VERSION_KEY])
+    return [
+        user.pk, user.is_staff, user.is_superuser,
+        versions.get(ROLE_VERSION_KEY.format(user.pk), 0), versions.get(ROLE_GLOBAL_VERSION_KEY, 0),
+    ]
+
+
+def _resolve(user, session):
+    if not user.is_authenticated:
+        return {'superuser': False, 'red_cross': False, 'donor': False}
+    if user.is_staff:
+        return _compute_roles(user)
+
+    fingerprint = _fingerprint(user)
+    cached = session.get(ROLE_SESSION_KEY) if session is not None else None
+    if cached and cached['fingerprint'] == fingerprint and cached['expires'] > time.time():
+        return cached['roles']
+
+    roles = _compute_roles(user)
+    if session is not None:
+        session[ROLE_SESSION_KEY] = {
+            'fingerprint': fingerprint, 'roles': roles, 'expires': time.time() + ROLE_SESSION_MAX_AGE,
+        }
+    return roles
+
+
+def get_roles(user):
+    roles = getattr(user, '_core_roles', None)
+    if roles is None:
+        roles = user._core_roles = _resolve(user, getattr(user, '_core_session', None))
+    return roles
+
+
+def remember_roles(sender, request, user, **kwargs):
+    # Resolved at login, so the first page afterwards doesn't need its own session write.
+    _resolve(user, request.session)
+
+
+def is_red_cross(user):
+    return get_roles(user)['red_cross']
+
+
+def is_donor(user):
+    return get_roles(user)['donor']
+
+
+def invalidate_roles(user_ids=None):
+    # None means "everyone", e.g. when a group is renamed or deleted.
+    keys = [ROLE_GLOBAL_VERSION_KEY] if user_ids is None else [ROLE_VERSION_KEY.format(pk) for pk in user_ids]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def _user_with_session(request, user):
+    user.is_authenticated  # evaluate the auth middleware's lazy user
+    user = getattr(user, '_wrapped', user)
+    user._core_session = request.session
+    return user
+
+
+def _evaluated(user):
+    user.is_authenticated  # evaluate the lazy object
+    return user._wrapped
+
+
+async def _auser(request):
+    # Async views (and the auth decorators wrapping them) get the same user object as request.user,
+    # so the user is loaded once per request and its roles still come from the session.
+    return await sync_to_async(_evaluated)(request.user)
+
+
+class RoleMiddleware:
+    # Must come after AuthenticationMiddleware. request.user stays lazy, so pages that never
+    # look at the user (the landing page) still cost nothing.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user = SimpleLazyObject(partial(_user_with_session, request, request.user))
+        request.auser = partial(_auser, request)
+        return self.get_response(request)
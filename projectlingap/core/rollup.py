@@ -0,0 +1,200 @@
+import calendar
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import BloodInventory, InventoryRollup, InventoryStatusChange, RollupState
+from .stock import BLOOD_GROUPS
+
+STATUSES = [code for code, _ in BloodInventory.STATUS_CHOICES]
+GROUP_INDEX = {group: index for index, group in enumerate(BLOOD_GROUPS)}
+STATUS_INDEX = {status: index for index, status in enumerate(STATUSES)}
+AVAILABLE = STATUS_INDEX['AVAILABLE']
+WRITE_BATCH_SIZE = 2000
+
+
+# DAILY INVENTORY ROLLUP
+# InventoryRollup holds end-of-day unit counts per (date, blood group, status). A unit counts as
+# AVAILABLE from its collection day and moves between statuses as InventoryStatusChange records, so
+# a day's counts are the previous day's plus that day's collections and status moves. A refresh
+# only replays days from the earliest one touched since the last run: new units (id watermark) and
+# dirty_from, which writers move back to the first day their change rewrites. A status move only
+# appends to the log, so it touches today; a deleted, re-dated or re-grouped unit rewrites from its
+# collection day.
+
+class RollupResult:
+    def __init__(self):
+        self.start = None
+        self.days = 0
+        self.rows = 0
+        self.elapsed = 0.0
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def get_state():
+    return RollupState.objects.select_for_update().get_or_create(pk=1)[0]
+
+
+def mark_dirty(moment):
+    day = timezone.localdate(moment)
+    RollupState.objects.filter(Q(dirty_from__isnull=True) | Q(dirty_from__gt=day), pk=1).update(dirty_from=day)
+
+
+def _first_dirty_day(state, today, full):
+    if full or state.last_day is None:
+        first = BloodInventory.objects.aggregate(first=Min('date_collected'))['first']
+        return timezone.localdate(first) if first else today
+
+    candidates = [state.last_day + timedelta(days=1)]
+    if state.dirty_from:
+        candidates.append(state.dirty_from)
+    added = BloodInventory.objects.filter(pk__gt=state.last_unit_id).aggregate(first=Min('date_collected'))['first']
+    if added:
+        candidates.append(timezone.localdate(added))
+    return min(candidates)
+
+
+def _daily_events(start, today):
+    since, until = _day_start(start), _day_start(today + timedelta(days=1))
+    collected = (
+        BloodInventory.objects.filter(date_collected__gte=since, date_collected__lt=until)
+        .annotate(day=TruncDate('date_collected'))
+        .values('day', 'blood_group').annotate(units=Count('id')).order_by()
+        .values_list('day', 'blood_group', 'units')
+    )
+    changed = (
+        InventoryStatusChange.objects.filter(changed_at__gte=since, changed_at__lt=until)
+        .annotate(day=TruncDate('changed_at'))
+        .values('day', 'unit__blood_group', 'from_status', 'to_status').annotate(units=Count('id')).order_by()
+        .values_list('day', 'unit__blood_group', 'from_status', 'to_status', 'units')
+    )
+    return list(collected), list(changed)
+
+
+def _scatter(deltas, start, rows, status_index, sign):
+    if not rows:
+        return
+    days, groups, units = (np.array(column) for column in zip(*rows))
+    days = np.array([day.toordinal() for day in days]) - start.toordinal()
+    groups = np.array([GROUP_INDEX.get(group, -1) for group in groups])
+    keep = groups >= 0
+    np.add.at(deltas, (days[keep], groups[keep], status_index[keep]), sign * units[keep])
+
+
+def refresh_rollup(full=False, today=None):
+    started = time.perf_counter()
+    today = today or timezone.localdate()
+    result = RollupResult()
+
+    # Take the dirty mark up front: changes marked while this runs are left for the next run.
+    with transaction.atomic():
+        state = get_state()
+        RollupState.objects.filter(pk=state.pk).update(dirty_from=None)
+    try:
+        _replay(state, today, full, result)
+    except Exception:
+        if state.dirty_from:
+            mark_dirty(_day_start(state.dirty_from))
+        raise
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _replay(state, today, full, result):
+    started_at = timezone.now()
+    last_unit_id = BloodInventory.objects.aggregate(last=Max('pk'))['last'] or 0
+    start = _first_dirty_day(state, today, full)
+    result.start = start
+
+    if start <= today:
+        result.days = (today - start).days + 1
+        deltas = np.zeros((result.days, len(BLOOD_GROUPS), len(STATUSES)), dtype=np.int64)
+        collected, changed = _daily_events(start, today)
+
+        _scatter(deltas, start, collected, np.full(len(collected), AVAILABLE), 1)
+        if changed:
+            left = np.array([STATUS_INDEX[status] for _, _, status, _, _ in changed])
+            entered = np.array([STATUS_INDEX[status] for _, _, _, status, _ in changed])
+            moved = [(day, group, units) for day, group, _, _, units in changed]
+            _scatter(deltas, start, moved, left, -1)
+            _scatter(deltas, start, moved, entered, 1)
+
+        base = np.zeros((len(BLOOD_GROUPS), len(STATUSES)), dtype=np.int64)
+        if not full:
+            for group, status, units in InventoryRollup.objects.filter(date=start - timedelta(days=1)).values_list(
+                'blood_group', 'status', 'units'
+            ):
+                base[GROUP_INDEX[group], STATUS_INDEX[status]] = units
+        counts = base + np.cumsum(deltas, axis=0)
+
+        day_index, group_index, status_index = np.nonzero(counts > 0)
+        rows = [
+            InventoryRollup(
+                date=start + timedelta(days=int(d)), blood_group=BLOOD_GROUPS[g], status=STATUSES[s],
+                units=int(counts[d, g, s]),
+            )
+            for d, g, s in zip(day_index, group_index, status_index)
+        ]
+        with transaction.atomic():
+            stale = InventoryRollup.objects.all() if full else InventoryRollup.objects.filter(date__gte=start)
+            stale.delete()
+            InventoryRollup.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+        result.rows = len(rows)
+
+    RollupState.objects.filter(pk=state.pk).update(
+        refreshed_at=started_at, last_day=today, last_unit_id=last_unit_id,
+    )
+
+
+# READS
+# Each report below is one indexed query against the rollup, whatever the size of the inventory.
+
+def snapshot(day):
+    counts = {group: {status: 0 for status in STATUSES} for group in BLOOD_GROUPS}
+    for group, status, units in InventoryRollup.objects.filter(date=day).values_list('blood_group', 'status', 'units'):
+        counts[group][status] = units
+    return counts
+
+
+def status_series(status, start, end):
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    series = {day: {group: 0 for group in BLOOD_GROUPS} for day in days}
+    rows = InventoryRollup.objects.filter(status=status, date__gte=start, date__lte=end).values_list(
+        'date', 'blood_group', 'units'
+    )
+    for day, group, units in rows:
+        series[day][group] = units
+    return series
+
+
+def month_ends(last_day, months):
+    ends = [last_day]
+    year, month = last_day.year, last_day.month
+    for _ in range(months):
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+        ends.append(last_day.replace(year=year, month=month, day=calendar.monthrange(year, month)[1]))
+    return ends[::-1]
+
+
+def monthly_expired(last_day, months=12):
+    # EXPIRED only ever grows, so a month's expiries are the difference between two month-end counts.
+    ends = month_ends(last_day, months)
+    totals = {day: {group: 0 for group in BLOOD_GROUPS} for day in ends}
+    rows = InventoryRollup.objects.filter(status='EXPIRED', date__in=ends).values_list('date', 'blood_group', 'units')
+    for day, group, units in rows:
+        totals[day][group] = units
+    return [
+        (end, {group: max(totals[end][group] - totals[previous][group], 0) for group in BLOOD_GROUPS})
+        for previous, end in zip(ends, ends[1:])
+    ]
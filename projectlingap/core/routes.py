@@ -0,0 +1,57 @@
+# ROUTE TABLE
+# Every URL name in core/urls.py -> (role that uses it, key into the url_kwargs fixtures or None, most
+# queries a cold-cache GET may run). QueryBudgetTests enforces the budgets and fails on a URL missing
+# here; benchmarks/load_test.py drives each page as its role, except the WRITES below.
+
+ROUTES = {
+    'home': (None, None, 0),
+    'availability_api': (None, None, 1),
+    'login': (None, None, 0),
+    'logout': ('donor', None, 0),
+    'register': (None, None, 0),
+    'dashboard': ('staff', None, 2),
+    'redcross_dashboard': ('staff', None, 9),  # cold stock summary + forecast; both are cached
+    'campaign_create': ('staff', None, 2),
+    'campaign_manage': ('staff', 'campaign', 4),
+    'campaign_tallies': ('staff', 'campaign', 3),
+    'event_stream': ('staff', None, 2),
+    'record_donation': ('staff', 'campaign_donor', 4),
+    'donor_list': ('staff', None, 3),
+    'donor_export': ('staff', None, 3),
+    'donor_recall': ('staff', None, 4),
+    'donor_recall_export': ('staff', None, 3),
+    'shortage_alert': ('staff', None, 2),  # POST only; GET is a 405
+    'donor_create': ('staff', None, 2),
+    'donor_update': ('staff', 'donor', 3),
+    'campaign_edit': ('staff', 'campaign', 3),
+    'campaign_delete': ('staff', 'campaign', 3),
+    'superuser_dashboard': ('admin', None, 3),
+    'query_profile': ('admin', None, 4),
+    'volunteer_list': ('admin', None, 4),
+    'volunteer_add': ('admin', None, 2),
+    'volunteer_edit': ('admin', 'volunteer', 3),
+    'volunteer_delete': ('admin', 'volunteer', 3),
+    'donor_dashboard': ('donor', None, 6),
+    'create_donor_profile': ('donor', None, 2),
+    'campaign_list': ('donor', None, 4),
+    'join_campaign': ('donor', 'campaign', 8),
+    'donor_history': ('donor', None, 5),
+    'request_blood': ('donor', None, 2),
+    'request_list': ('staff', None, 3),
+    'request_export': ('staff', None, 3),
+    'request_manage': ('staff', 'request', 4),
+    'inventory_list': ('staff', None, 3),
+    'inventory_create': ('staff', None, 3),
+    'inventory_import': ('staff', None, 2),
+    'inventory_export': ('staff', None, 3),
+    'inventory_report': ('staff', None, 6),
+    'inventory_update': ('staff', 'unit', 4),
+    'inventory_delete': ('staff', 'unit', 3),
+    'donor_delete': ('staff', 'donor', 3),
+    'profile': ('donor', None, 2),
+}
+
+# GETs that change data, so a read load test must leave them out.
+WRITES = {
+    'join_campaign',  # registers the donor for the campaign
+}
@@ -0,0 +1,57 @@
+import re
+
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+DONOR_SEARCH_FIELDS = ['user__first_name', 'user__last_name', 'user__username']
+REQUEST_SEARCH_FIELDS = ['patient_name', 'hospital_name', 'physician_name']
+
+
+def match_expression(text):
+    # Every word must match as a prefix: "jua dela" -> "jua"* "dela"*
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', text))
+
+
+def icontains_filter(queryset, fields, text):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': text})
+    return queryset.filter(condition)
+
+
+def search_filter(queryset, fts_table, fields, text):
+    # Unranked, for a queryset that keeps its own ordering (e.g. a keyset-paged roster), as an
+    # id IN (...) filter rather than a join.
+    match = match_expression(text)
+    if connections[queryset.db].vendor != 'sqlite' or not match:
+        return icontains_filter(queryset, fields, text)
+    return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s", (match,)))
+
+
+def ranked_search(queryset, fields, text):
+    match = match_expression(text)
+    if connections[queryset.db].vendor != 'sqlite' or not match:
+        return icontains_filter(queryset, fields, text)
+
+    # The FTS table is joined once (the model's search_index relation): MATCH drives the query and
+    # each hit is joined to its row by primary key, so FTS5's built-in rank (bm25, lower is better)
+    # is computed once per match. The view's own ordering breaks ties.
+    ordering = queryset.query.order_by
+    return (
+        queryset.filter(search_index__document__match=match)
+        .annotate(search_rank=F('search_index__rank'))
+        .order_by('search_rank', *ordering)
+    )
+
+
+def filter_donors(queryset, text):
+    return search_filter(queryset, 'core_donor_fts', DONOR_SEARCH_FIELDS, text)
+
+
+def search_donors(queryset, text):
+    return ranked_search(queryset, DONOR_SEARCH_FIELDS, text)
+
+
+def search_requests(queryset, text):
+    return ranked_search(queryset, REQUEST_SEARCH_FIELDS, text)
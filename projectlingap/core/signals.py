@@ -0,0 +1,79 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import DEFERRED
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .campaigns import invalidate_campaigns
+from .eligibility import refresh_eligibility
+from .events import publish
+from .models import BloodInventory, BloodRequest, Campaign, Donor
+from .roles import invalidate_roles, remember_roles
+from .rollup import mark_dirty
+from .stock import invalidate_stock_summary
+
+for model in (BloodInventory, BloodRequest, Campaign, Donor):
+    post_save.connect(invalidate_stock_summary, sender=model, dispatch_uid=f'stock_summary_save_{model.__name__}')
+    post_delete.connect(invalidate_stock_summary, sender=model, dispatch_uid=f'stock_summary_delete_{model.__name__}')
+
+post_save.connect(invalidate_campaigns, sender=Campaign, dispatch_uid='campaign_list_save')
+post_delete.connect(invalidate_campaigns, sender=Campaign, dispatch_uid='campaign_list_delete')
+
+
+def inventory_saved(sender, instance, created, **kwargs):
+    dirty_from = instance.__dict__.pop('_rollup_dirty_from', None)
+    if dirty_from:
+        mark_dirty(dirty_from)
+    donors = instance.__dict__.pop('_eligibility_donors', None)
+    if donors:
+        refresh_eligibility(donors)
+
+    # save() refreshes _loaded only after post_save, so it still holds the previous status here.
+    loaded_status = getattr(instance, '_loaded', (DEFERRED,))[0]
+    if created:
+        publish('unit.added', id=instance.pk, blood_group=instance.blood_group)
+    elif loaded_status is not DEFERRED and instance.status != loaded_status:
+        publish(f'unit.{instance.status.lower()}', id=instance.pk, blood_group=instance.blood_group)
+
+
+def inventory_deleted(sender, instance, **kwargs):
+    mark_dirty(instance.date_collected)
+    if instance.donor_id:
+        refresh_eligibility([instance.donor_id])
+
+
+post_save.connect(inventory_saved, sender=BloodInventory, dispatch_uid='rollup_inventory_save')
+post_delete.connect(inventory_deleted, sender=BloodInventory, dispatch_uid='rollup_inventory_delete')
+
+
+def request_saved(sender, instance, created, **kwargs):
+    loaded_status = getattr(instance, '_loaded_status', None)
+    if created:
+        publish(
+            'request.created', id=instance.pk, blood_type=instance.patient_blood_type,
+            urgency=instance.urgency, status=instance.status,
+        )
+    elif loaded_status and instance.status != loaded_status:
+        publish('request.status', id=instance.pk, status=instance.status)
+    instance._loaded_status = instance.status
+
+
+post_save.connect(request_saved, sender=BloodRequest, dispatch_uid='events_request_save')
+
+
+def group_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_roles([instance.pk])
+    else:
+        invalidate_roles(pk_set)  # group.user_set.clear() sends no pk_set -> everyone
+
+
+def group_changed(sender, **kwargs):
+    invalidate_roles()
+
+
+m2m_changed.connect(group_membership_changed, sender=User.groups.through, dispatch_uid='roles_group_membership')
+post_save.connect(group_changed, sender=Group, dispatch_uid='roles_group_save')
+post_delete.connect(group_changed, sender=Group, dispatch_uid='roles_group_delete')
+user_logged_in.connect(remember_roles, dispatch_uid='roles_login')
@@ -0,0 +1,24 @@
+import sys
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# SMS BACKENDS
+# Same idea as Django's EMAIL_BACKEND: settings.SMS_BACKEND names a class with send(to, body).
+# Swap in a gateway client for production; these two cover development and tests.
+
+outbox = []  # LocmemBackend appends (to, body) here, like django.core.mail.outbox
+
+
+class ConsoleBackend:
+    def send(self, to, body):
+        sys.stdout.write(f"SMS to {to}: {body}\n")
+
+
+class LocmemBackend:
+    def send(self, to, body):
+        outbox.append((to, body))
+
+
+def get_backend():
+    return import_string(getattr(settings, 'SMS_BACKEND', 'core.sms.ConsoleBackend'))()
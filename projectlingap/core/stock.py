@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from .models import BloodInventory, BloodRequest, Campaign, Donor
+
+STOCK_SUMMARY_CACHE_KEY = 'core:stock_summary'
+# Writes invalidate the summary immediately (in every worker once the cache is shared, see settings.CACHES);
+# the timeout only bounds staleness for changes that fire no signal (campaigns ending, volunteer edits, raw SQL).
+STOCK_SUMMARY_TIMEOUT = 60
+INVENTORY_VERSION_KEY = 'core:inventory_version'
+
+BLOOD_GROUPS = [code for code, _ in Donor.BLOOD_TYPES]
+
+
+def _summary_querysets():
+    now = timezone.now()
+    querysets = {
+        'pending_requests': BloodRequest.objects.filter(status='PENDING'),
+        'available_blood': BloodInventory.objects.filter(status='AVAILABLE'),
+        'active_campaigns': Campaign.objects.filter(end_datetime__gt=now),
+        'total_donors': Donor.objects.all(),
+        'total_volunteers': User.objects.filter(is_staff=True, is_superuser=False),
+    }
+    for index, group in enumerate(BLOOD_GROUPS):
+        querysets[f'group_{index}'] = BloodInventory.objects.filter(status='AVAILABLE', blood_group=group)
+    return querysets
+
+
+def compute_stock_summary(using='default'):
+    # Every count becomes a scalar subquery of one SELECT, so a cache miss is a single round trip
+    # and each count is answered from an index.
+    querysets = _summary_querysets()
+    columns, params = [], []
+    for alias, queryset in querysets.items():
+        sql, sql_params = queryset.order_by().values('pk').query.sql_with_params()
+        columns.append(f"(SELECT COUNT(*) FROM ({sql}) AS {alias}_rows) AS {alias}")
+        params.extend(sql_params)
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(columns)}", params)
+        row = dict(zip(querysets, cursor.fetchone()))
+
+    summary = {alias: row[alias] for alias in querysets if not alias.startswith('group_')}
+    summary['available_by_group'] = [
+        (group, row[f'group_{index}']) for index, group in enumerate(BLOOD_GROUPS)
+    ]
+    return summary
+
+
+def get_stock_summary():
+    summary = cache.get(STOCK_SUMMARY_CACHE_KEY)
+    if summary is None:
+        summary = compute_stock_summary()
+        cache.set(STOCK_SUMMARY_CACHE_KEY, summary, STOCK_SUMMARY_TIMEOUT)
+    return summary
+
+
+def inventory_version():
+    return cache.get(INVENTORY_VERSION_KEY, 0)
+
+
+def invalidate_stock_summary(**kwargs):
+    cache.delete(STOCK_SUMMARY_CACHE_KEY)
+    try:
+        cache.incr(INVENTORY_VERSION_KEY)
+    except ValueError:
+        cache.set(INVENTORY_VERSION_KEY, 1, timeout=None)
+
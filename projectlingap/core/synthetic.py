@@ -0,0 +1,281 @@
+import time
+from itertools import repeat
+
+import numpy as np
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .eligibility import refresh_eligibility
+from .models import BloodInventory, BloodRequest, Campaign, CampaignParticipant, Donor, InventoryStatusChange
+from .stock import BLOOD_GROUPS, invalidate_stock_summary
+
+DONATION_INTERVAL_DAYS = 90
+SHELF_LIFE_DAYS = 42  # whole blood
+BATCH_SIZE = 20000
+BLOOD_WEIGHTS = np.array([30, 2, 8, 1, 4, 1, 38, 1]) / 85  # rough Philippine ABO/Rh mix, in BLOOD_TYPES order
+GROUP_NAMES = np.array(BLOOD_GROUPS)
+LOAD_USERS = {'admin': 'load-admin', 'staff': 'load-staff', 'donor': 'load-donor'}
+
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Kristine', 'John Paul', 'Angelica', 'Carlo', 'Patricia',
+               'Miguel', 'Camille', 'Rafael', 'Jasmine', 'Paolo', 'Bea', 'Enrique', 'Sofia', 'Ramon', 'Liza']
+LAST_NAMES = ['Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Bautista', 'Villanueva', 'Ramos', 'Aquino',
+              'Castillo', 'Flores', 'Torres', 'Gonzales', 'Cruz', 'Navarro', 'Salazar', 'Lopez', 'Rivera']
+CITIES = ['Imus', 'Bacoor', 'Dasmariñas', 'General Trias', 'Kawit', 'Tagaytay', 'Trece Martires', 'Silang',
+          'Tanza', 'Rosario', 'Carmona', 'Naic']
+HOSPITALS = ['Cavite Medical Center', 'General Emilio Aguinaldo Memorial Hospital', 'De La Salle University Medical Center',
+             'Divine Grace Medical Center', 'Medical Center Imus', 'Southern Tagalog Regional Hospital']
+REASONS = ['Scheduled surgery', 'Road accident', 'Dengue with low platelets', 'Childbirth', 'Anemia', 'Dialysis']
+
+
+# SYNTHETIC DATA
+# Production-sized data for load tests and benchmarks. Everything is drawn up front as NumPy arrays
+# (who donated when, which units are still on the shelf), so the denormalized columns (donor
+# eligibility, status_changed_at, request dates) come out consistent without a second pass, then
+# written with executemany in large batches: at millions of rows, building model instances is most
+# of bulk_create's cost. Ids are assigned here so later tables can point at earlier ones.
+
+class GenerateResult:
+    def __init__(self):
+        self.counts = {}
+        self.elapsed = 0.0
+
+
+def _timestamps(base, seconds):
+    # Naive UTC strings in the format Django stores in SQLite, so range filters compare correctly.
+    moments = base + (np.asarray(seconds) * 1_000_000).astype('timedelta64[us]')
+    return np.char.replace(np.datetime_as_string(moments, unit='us'), 'T', ' ').tolist()
+
+
+def _nullable(ids, index):
+    # ids[index], with NULL where index is -1.
+    return np.where(index >= 0, ids[index], None).tolist()
+
+
+def _insert(model, columns, rows, batch_size=BATCH_SIZE):
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in columns)
+    sql = f"INSERT INTO {table} ({names}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+    return len(rows)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _load_users(password):
+    users = {}
+    for role, username in LOAD_USERS.items():
+        user, _ = User.objects.get_or_create(username=username, defaults={
+            'first_name': 'Load', 'last_name': role.title(), 'email': f'{username}@example.com',
+            'is_staff': role in ('admin', 'staff'), 'is_superuser': role == 'admin',
+        })
+        user.set_password(password)
+        user.save()
+        users[role] = user
+    Donor.objects.get_or_create(user=users['donor'], defaults={
+        'blood_type': 'O+', 'contact_no': '09170000000', 'address': 'Imus, Cavite',
+    })
+    return users
+
+
+def generate(password, donors=500_000, units=2_000_000, requests=200_000, campaigns=5_000, participants=60, years=3,
+             seed=42, on_step=None):
+    started = time.perf_counter()
+    result = GenerateResult()
+    rng = np.random.default_rng(seed)
+    now = timezone.now()
+    base = np.datetime64(now.replace(tzinfo=None), 'us')
+    span = years * 365 * 86400
+    run = now.strftime('%y%m%d%H%M%S')  # keeps usernames and serials unique across runs
+
+    def step(name, count):
+        result.counts[name] = count
+        if on_step:
+            on_step(name, count, time.perf_counter() - started)
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA cache_size = -262144")  # 256 MB for this connection: keeps the indexes being filled in memory
+
+    with transaction.atomic():
+        users = _load_users(password)
+        staff_id = users['staff'].pk
+
+        # Donors and their accounts.
+        user_ids = np.arange(donors) + _next_id(User)
+        donor_ids = np.arange(donors) + _next_id(Donor)
+        donor_groups = rng.choice(len(BLOOD_GROUPS), size=donors, p=BLOOD_WEIGHTS)
+        joined = -rng.uniform(0, span + 365 * 86400, size=donors)  # some joined before the history starts
+
+        # Campaigns: the history plus two months of upcoming drives.
+        campaign_ids = np.arange(campaigns) + _next_id(Campaign)
+        campaign_start = np.sort(rng.uniform(-span, 60 * 86400, size=campaigns))
+        campaign_hours = rng.integers(4, 10, size=campaigns)
+
+        # Participants: distinct donors per campaign; past drives mostly turned into donations.
+        joined_campaign = np.repeat(np.arange(campaigns), participants)
+        joined_donor = rng.integers(0, donors, size=campaigns * participants)
+        pairs = np.unique(joined_campaign.astype(np.int64) * donors + joined_donor)
+        joined_campaign, joined_donor = pairs // donors, pairs % donors
+        donated = (campaign_start[joined_campaign] + campaign_hours[joined_campaign] * 3600 < 0) & (
+            rng.random(len(pairs)) < 0.7
+        )
+
+        # Units: campaign donations first, the rest walk-ins (10% without a donor record, e.g. imports).
+        drive_units = np.flatnonzero(donated)[:units]
+        walk_ins = units - len(drive_units)
+        unit_donor = np.concatenate([joined_donor[drive_units], rng.integers(0, donors, size=walk_ins)])
+        unit_donor[len(drive_units):][rng.random(walk_ins) < 0.1] = -1
+        unit_campaign = np.concatenate([joined_campaign[drive_units], np.full(walk_ins, -1)])
+        unit_collected = np.concatenate([
+            campaign_start[joined_campaign[drive_units]] + rng.uniform(0, 3600, size=len(drive_units))
+            * campaign_hours[joined_campaign[drive_units]],
+            -rng.uniform(0, span, size=walk_ins),
+        ])
+        # In collection order, as they would have been entered: the date indexes then fill by appending.
+        order = np.argsort(unit_collected, kind='stable')
+        unit_donor, unit_campaign, unit_collected = unit_donor[order], unit_campaign[order], unit_collected[order]
+        unit_groups = np.where(unit_donor >= 0, donor_groups[unit_donor], rng.choice(len(BLOOD_GROUPS), size=units, p=BLOOD_WEIGHTS))
+        unit_expiry = unit_collected + SHELF_LIFE_DAYS * 86400
+
+        # On the shelf: mostly AVAILABLE, a few RESERVED for approved requests. Off it: 80% used, 20% expired.
+        unit_status = np.where(unit_expiry > 0, np.where(rng.random(units) < 0.05, 1, 0), np.where(rng.random(units) < 0.8, 3, 2))
+        unit_changed = np.select(
+            [unit_status == 3, unit_status == 2, unit_status == 1],
+            [unit_collected + rng.uniform(1, SHELF_LIFE_DAYS - 1, size=units) * 86400, unit_expiry,
+             -rng.uniform(0, 2 * 86400, size=units)],
+            default=unit_collected,
+        )
+        unit_changed = np.maximum(unit_changed, unit_collected)
+        unit_ids = np.arange(units) + _next_id(BloodInventory)
+
+        # Eligibility straight from the units just drawn.
+        last_donation = np.full(donors, -np.inf)
+        has_donor = unit_donor >= 0
+        np.maximum.at(last_donation, unit_donor[has_donor], unit_collected[has_donor])
+        donated_ever = np.isfinite(last_donation)
+        next_eligible = np.where(donated_ever, last_donation + DONATION_INTERVAL_DAYS * 86400, joined)
+
+        usernames = [f'syn{run}-{i}' for i in range(donors)]
+        emails = [f'{username}@example.com' for username in usernames]
+        first_names = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), size=donors)].tolist()
+        last_names = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), size=donors)].tolist()
+        step('users', _insert(User, [
+            'id', 'username', 'password', 'first_name', 'last_name', 'email', 'is_staff', 'is_superuser',
+            'is_active', 'date_joined',
+        ], list(zip(
+            user_ids.tolist(), usernames, repeat(UNUSABLE_PASSWORD_PREFIX), first_names, last_names, emails,
+            repeat(False), repeat(False), repeat(True), _timestamps(base, joined),
+        ))))
+
+        addresses = (np.array(CITIES)[rng.integers(0, len(CITIES), size=donors)].astype(object) + ', Cavite').tolist()
+        phones = ['09' + str(number) for number in rng.integers(10**8, 10**9, size=donors).tolist()]
+        last_donation_at = np.where(donated_ever, _timestamps(base, np.where(donated_ever, last_donation, 0)), None)
+        step('donors', _insert(Donor, [
+            'id', 'user', 'blood_type', 'contact_no', 'address', 'first_name', 'last_name', 'email',
+            'last_donation_at', 'next_eligible_at',
+        ], list(zip(
+            donor_ids.tolist(), user_ids.tolist(), GROUP_NAMES[donor_groups].tolist(), phones, addresses,
+            first_names, last_names, emails, last_donation_at.tolist(), _timestamps(base, next_eligible),
+        ))))
+
+        towns = [CITIES[i % len(CITIES)] for i in range(campaigns)]
+        step('campaigns', _insert(Campaign, [
+            'id', 'title', 'location', 'start_datetime', 'end_datetime', 'description', 'created_at',
+        ], list(zip(
+            campaign_ids.tolist(), [f'{town} Blood Drive #{i + 1}' for i, town in enumerate(towns)],
+            [f'{town} Municipal Hall' for town in towns], _timestamps(base, campaign_start),
+            _timestamps(base, campaign_start + campaign_hours * 3600),
+            repeat('Walk-in donors welcome. Bring a valid ID and eat a full meal before donating.'),
+            _timestamps(base, campaign_start - 30 * 86400),
+        ))))
+
+        step('participants', _insert(CampaignParticipant, ['campaign', 'donor', 'joined_at', 'has_donated'], list(zip(
+            campaign_ids[joined_campaign].tolist(), donor_ids[joined_donor].tolist(),
+            _timestamps(base, campaign_start[joined_campaign] - rng.uniform(1, 21, size=len(pairs)) * 86400),
+            donated.tolist(),
+        ))))
+
+        statuses = np.array([code for code, _ in BloodInventory.STATUS_CHOICES])  # AVAILABLE, RESERVED, EXPIRED, DISTRIBUTED
+        step('units', _insert(BloodInventory, [
+            'id', 'serial_number', 'donor', 'campaign', 'blood_group', 'status', 'date_collected', 'expiry_date',
+            'processed_by', 'status_changed_at',
+        ], list(zip(
+            unit_ids.tolist(), [f'SYN{run}-{i:08d}' for i in range(units)], _nullable(donor_ids, unit_donor),
+            _nullable(campaign_ids, unit_campaign), GROUP_NAMES[unit_groups].tolist(), statuses[unit_status].tolist(),
+            _timestamps(base, unit_collected), _timestamps(base, unit_expiry), repeat(staff_id),
+            _timestamps(base, unit_changed),
+        ))))
+        # Units that left the shelf moved there once, at unit_changed (see InventoryStatusChange.on_arrival).
+        moved_off = np.flatnonzero(unit_status != 0)
+        step('status changes', _insert(InventoryStatusChange, ['unit', 'from_status', 'to_status', 'changed_at'], list(zip(
+            unit_ids[moved_off].tolist(), repeat('AVAILABLE'), statuses[unit_status[moved_off]].tolist(),
+            _timestamps(base, unit_changed[moved_off]),
+        ))))
+
+        # Requests: the newest are still pending; completed ones hold a distributed unit, approved
+        # ones a reserved unit, each used once.
+        request_at = np.sort(-rng.uniform(0, span, size=requests))
+        distributed = list(np.flatnonzero(unit_status == 3)[::-1])
+        reserved = list(np.flatnonzero(unit_status == 1))
+        request_dates = _timestamps(base, request_at)
+        outcome = rng.random(requests)
+        requestors = rng.integers(0, donors, size=requests)
+        patient_groups = rng.choice(len(BLOOD_GROUPS), size=requests, p=BLOOD_WEIGHTS)
+        rows = []
+        for i in range(requests):
+            bag, group = None, BLOOD_GROUPS[patient_groups[i]]
+            if request_at[i] > -2 * 86400 and outcome[i] < 0.6:
+                status = 'PENDING'
+            elif outcome[i] < 0.15:
+                status = 'REJECTED'
+            elif request_at[i] > -3 * 86400 and reserved:
+                status, bag = 'APPROVED', reserved.pop()
+            elif distributed:
+                status, bag = 'COMPLETED', distributed.pop()
+            else:
+                status = 'REJECTED'
+            if bag is not None:
+                group = BLOOD_GROUPS[unit_groups[bag]]
+            rows.append((
+                int(user_ids[requestors[i]]) if outcome[i] < 0.8 else None, int(unit_ids[bag]) if bag is not None else None,
+                f'{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i % len(LAST_NAMES)]}', group,
+                HOSPITALS[i % len(HOSPITALS)], 'Cavite', f'Dr. {LAST_NAMES[(i * 7) % len(LAST_NAMES)]}',
+                f'PRC-{100000 + i % 90000}', 'WHOLE', 1 + int(outcome[i] * 10) % 3,
+                ['ROUTINE', 'ROUTINE', 'URGENT', 'CRITICAL'][i % 4], REASONS[i % len(REASONS)], status,
+                request_dates[i], staff_id if status != 'PENDING' else None,
+            ))
+        step('requests', _insert(BloodRequest, [
+            'requestor', 'assigned_bag', 'patient_name', 'patient_blood_type', 'hospital_name', 'hospital_address',
+            'physician_name', 'physician_license', 'component', 'quantity', 'urgency', 'reason', 'status',
+            'request_date', 'processed_by',
+        ], rows))
+
+        # Some history for the load-donor account, so its dashboard and history pages have rows to show.
+        load_donor = users['donor'].donor_profile
+        BloodRequest.objects.filter(pk__in=BloodRequest.objects.order_by('-pk').values('pk')[:20]).update(requestor=users['donor'])
+        moved = list(
+            BloodInventory.objects.filter(donor__isnull=False, blood_group=load_donor.blood_type)
+            .order_by('-pk').values_list('pk', 'donor_id')[:8]
+        )
+        BloodInventory.objects.filter(pk__in=[pk for pk, _ in moved]).update(donor=load_donor)
+        # The donors those units came from lose a donation too, which can make them eligible sooner.
+        refresh_eligibility([load_donor.pk, *(donor_id for _, donor_id in moved)])
+
+        # Explicit ids leave sequences behind on backends that have them (SQLite needs nothing).
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Donor, Campaign, BloodInventory]):
+                cursor.execute(sql)
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    invalidate_stock_summary()  # raw inserts send no signals
+    result.elapsed = time.perf_counter() - started
+    return result
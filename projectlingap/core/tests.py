@@ -1,3 +1,1244 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, router
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import sms, urls as core_urls
+from .allocation import (
+    DONOR_PREFERENCE, allocate_units, can_receive, compatible_groups, distribute_unit, release_unit, reserve_unit,
+)
+from .campaigns import get_campaign_page
+from .dashboards import run_reads
+from .eligibility import recall_queryset
+from .events import EVENT_QUEUE_SIZE, RESYNC, EventBroker, broker, format_event, stream_events
+from .expiry import sweep_expired_units
+from .forecast import project
+from .forms import DonorForm
+from .importer import import_inventory_csv
+from .stock import BLOOD_GROUPS, get_stock_summary, inventory_version
+from .models import (
+    BloodInventory, BloodRequest, Campaign, CampaignParticipant, Donor, InventoryRollup, InventoryStatusChange,
+    OutboxMessage, RequestProfile, RollupState,
+)
+from .outbox import drain_outbox
+from .pagination import encode_cursor, keyset_page, merged_keyset_page
+from .replica import PIN_COOKIE, ReplicaPinMiddleware, reading_from_replica
+from .routes import ROUTES, WRITES
+from .search import search_donors, search_requests
+from .rollup import mark_dirty, refresh_rollup, snapshot
+
+SEED_ROWS = 12  # more than one page everywhere, so an N+1 shows up as a blown budget
+# A sampled request adds its own INSERT, which also quotes the statements it profiled.
+NO_SAMPLING = override_settings(SQL_PROFILE_SAMPLE_RATE=0)
+
+
+@NO_SAMPLING
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.staff = User.objects.create_user('staff', is_staff=True, first_name='Red', last_name='Cross')
+        cls.volunteer = User.objects.create_user('volunteer', is_staff=True)
+        cls.donor_user = User.objects.create_user('donor', first_name='Juan', last_name='Dela Cruz')
+        cls.donor = Donor.objects.create(user=cls.donor_user, blood_type='O+', contact_no='0917', address='Cavite')
+
+        cls.campaign = Campaign.objects.create(
+            title='City Drive', location='Imus', start_datetime=now + timedelta(days=1),
+            end_datetime=now + timedelta(days=1, hours=8),
+        )
+        for i in range(SEED_ROWS):
+            user = User.objects.create_user(f'donor{i}', first_name=f'First{i}', last_name=f'Last{i}')
+            donor = Donor.objects.create(user=user, blood_type='A+', contact_no='0917', address='Cavite')
+            CampaignParticipant.objects.create(campaign=cls.campaign, donor=donor, has_donated=i % 2 == 0)
+            Campaign.objects.create(
+                title=f'Drive {i}', location='Bacoor', start_datetime=now + timedelta(days=i + 2),
+                end_datetime=now + timedelta(days=i + 2, hours=8),
+            )
+            BloodInventory.objects.create(
+                serial_number=f'SN-{i:04d}', donor=donor, blood_group='A+',
+                expiry_date=now + timedelta(days=30 + i), processed_by=cls.staff,
+            )
+            BloodInventory.objects.create(
+                serial_number=f'SN-D-{i:04d}', donor=cls.donor, blood_group='O+',
+                expiry_date=now + timedelta(days=30 + i), processed_by=cls.staff,
+            )
+            BloodRequest.objects.create(
+                requestor=cls.donor_user, patient_name=f'Patient {i}', patient_blood_type='A+',
+                hospital_name='General Hospital', hospital_address='Cavite', physician_name='Santos',
+                physician_license='12345', reason='Surgery',
+            )
+
+        cls.unit = BloodInventory.objects.filter(donor__isnull=False).exclude(donor=cls.donor).first()
+        cls.request_obj = BloodRequest.objects.first()
+        cls.url_kwargs = {
+            'campaign': {'pk': cls.campaign.pk},
+            'campaign_donor': {'campaign_id': cls.campaign.pk, 'donor_id': cls.donor.pk},
+            'donor': {'pk': cls.donor.pk},
+            'volunteer': {'pk': cls.volunteer.pk},
+            'request': {'pk': cls.request_obj.pk},
+            'unit': {'pk': cls.unit.pk},
+        }
+
+    def get_with_budget(self, name, role, kwargs_key, budget):
+        cache.clear()  # measure the cold path, not a cached dashboard
+        if role:
+            self.client.force_login({'admin': self.admin, 'staff': self.staff, 'donor': self.donor_user}[role])
+        else:
+            self.client.logout()
+        url = reverse(name, kwargs=self.url_kwargs[kwargs_key] if kwargs_key else None)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 500, name)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{name} ran {len(queries)} queries (budget {budget}):\n"
+            + '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+
+    def test_every_core_url_has_a_budget(self):
+        names = {pattern.name for pattern in core_urls.urlpatterns if isinstance(pattern, URLPattern)}
+        self.assertEqual(names - set(ROUTES), set())
+        self.assertEqual(WRITES - set(ROUTES), set())
+
+    def test_query_budgets(self):
+        for name, (role, kwargs_key, budget) in ROUTES.items():
+            with self.subTest(url=name):
+                self.get_with_budget(name, role, kwargs_key, budget)
+
+
+@NO_SAMPLING
+class CampaignCheckInTests(TestCase):
+    DONORS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.campaign = Campaign.objects.create(
+            title='City Drive', location='Imus', start_datetime=now, end_datetime=now + timedelta(hours=8),
+        )
+        for i in range(cls.DONORS):
+            donor = Donor.objects.create(
+                user=User.objects.create_user(f'donor{i}'), blood_type='B+', contact_no='0917', address='Cavite',
+            )
+            CampaignParticipant.objects.create(campaign=cls.campaign, donor=donor)
+        BloodInventory.objects.create(serial_number='TAKEN', blood_group='O+', expiry_date=now + timedelta(days=30))
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.url = reverse('campaign_manage', kwargs={'pk': self.campaign.pk})
+        self.participants = list(self.campaign.participants.order_by('pk'))
+
+    def test_batch_check_in_uses_a_fixed_number_of_queries(self):
+        expiry = (timezone.now() + timedelta(days=35)).date().isoformat()
+        data = {'default_expiry': expiry}
+        data.update({f'serial-{participant.pk}': f'DRIVE-{participant.pk}' for participant in self.participants})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+        self.assertRedirects(response, self.url)
+        self.assertLessEqual(len(queries), 12)
+
+        self.assertEqual(BloodInventory.objects.filter(campaign=self.campaign, blood_group='B+').count(), self.DONORS)
+        self.assertFalse(self.campaign.participants.filter(has_donated=False).exists())
+
+    def test_bad_rows_are_reported_and_good_rows_saved(self):
+        first, second, third = self.participants[:3]
+        expiry = (timezone.now() + timedelta(days=35)).date().isoformat()
+        response = self.client.post(self.url, {
+            f'serial-{first.pk}': 'GOOD-1', f'expiry-{first.pk}': expiry,
+            f'serial-{second.pk}': 'TAKEN', f'expiry-{second.pk}': expiry,
+            f'serial-{third.pk}': 'NO-EXPIRY',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Serial number already exists')
+        self.assertContains(response, 'Missing expiry date')
+        self.assertEqual(
+            list(self.campaign.participants.filter(has_donated=True).values_list('pk', flat=True)), [first.pk],
+        )
+
+
+class InventoryImportTests(TestCase):
+    HEADER = 'serial_number,blood_group,expiry_date,status\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        BloodInventory.objects.create(
+            serial_number='TAKEN', blood_group='O+', expiry_date=timezone.now() + timedelta(days=30),
+        )
+
+    def run_import(self, rows, header=HEADER, **kwargs):
+        return import_inventory_csv(io.StringIO(header + ''.join(f'{row}\n' for row in rows)), **kwargs)
+
+    def test_missing_columns_reject_the_file(self):
+        result = self.run_import(['A,O+'], header='serial_number,blood_group\n')
+        self.assertEqual(result.errors, [(1, '', 'Missing column(s): expiry_date')])
+        self.assertEqual(result.created, 0)
+
+    def test_bad_rows_are_reported_and_good_rows_saved(self):
+        result = self.run_import([
+            'OK-1,a+,2030-01-01,',
+            ',O+,2030-01-01,',
+            'BAD-GROUP,C+,2030-01-01,',
+            'BAD-STATUS,O+,2030-01-01,LOST',
+            'BAD-DATE,O+,someday,',
+            'NO-EXPIRY,O+,,',
+            'OK-2,B-,2030-01-01T08:30:00,RESERVED',
+        ])
+        self.assertEqual(result.rows, 7)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([(line, message) for line, _, message in result.errors], [
+            (3, 'Missing serial number'),
+            (4, "Unknown blood group 'C+'"),
+            (5, "Unknown status 'LOST'"),
+            (6, "Invalid date 'someday'"),
+            (7, 'Missing expiry date'),
+        ])
+        self.assertEqual(
+            dict(BloodInventory.objects.filter(serial_number__startswith='OK-').values_list('serial_number', 'status')),
+            {'OK-1': 'AVAILABLE', 'OK-2': 'RESERVED'},
+        )
+        self.assertEqual(BloodInventory.objects.get(serial_number='OK-1').blood_group, 'A+')
+        # The rollup sees the reserved unit arrive on hold.
+        self.assertEqual(
+            list(InventoryStatusChange.objects.values_list('unit__serial_number', 'from_status', 'to_status')),
+            [('OK-2', 'AVAILABLE', 'RESERVED')],
+        )
+
+    def test_duplicates_in_the_file_and_in_the_database_are_skipped(self):
+        # batch_size=2 puts the second DUP and TAKEN in later batches than the rows they clash with.
+        result = self.run_import([
+            'DUP,O+,2030-01-01,',
+            'NEW-1,O+,2030-01-01,',
+            'NEW-2,O+,2030-01-01,',
+            'DUP,A+,2030-01-01,',
+            'TAKEN,O+,2030-01-01,',
+            'NEW-3,O+,2030-01-01,',
+        ], batch_size=2)
+        self.assertEqual(result.created, 4)
+        self.assertEqual(result.errors, [
+            (5, 'DUP', 'Serial number already exists'),
+            (6, 'TAKEN', 'Serial number already exists'),
+        ])
+        self.assertEqual(BloodInventory.objects.get(serial_number='DUP').blood_group, 'O+')
+
+    def test_duplicate_within_a_batch_is_caught_before_the_database(self):
+        result = self.run_import(['SAME,O+,2030-01-01,', 'SAME,O+,2030-01-01,'])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, 'SAME', 'Duplicate serial number in file')])
+
+    def test_serial_saved_after_the_lookup_only_rejects_that_row(self):
+        # Another writer inserts TAKEN between the existence check and bulk_create.
+        lookup = mock.Mock()
+        lookup.return_value.values_list.return_value = []
+        with mock.patch.object(BloodInventory.objects, 'filter', lookup):
+            result = self.run_import(['RACE-1,O+,2030-01-01,', 'TAKEN,O+,2030-01-01,', 'RACE-2,O+,2030-01-01,'])
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [(3, 'TAKEN', 'Serial number already exists')])
+        self.assertEqual(BloodInventory.objects.filter(serial_number__startswith='RACE-').count(), 2)
+
+
+class StockSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = BloodInventory.objects.create(
+            serial_number='STOCK-1', blood_group='O+', expiry_date=timezone.now() + timedelta(days=30),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def available(self):
+        summary = get_stock_summary()
+        return summary['available_blood'], dict(summary['available_by_group'])['O+']
+
+    def assert_refreshed(self, change, expected):
+        self.assertEqual(self.available(), (1, 1))
+        version = inventory_version()
+        change()
+        self.assertGreater(inventory_version(), version)
+        self.assertEqual(self.available(), expected)
+
+    def test_summary_is_served_from_the_cache(self):
+        with self.assertNumQueries(1):
+            get_stock_summary()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.available(), (1, 1))
+
+    def test_saving_a_unit_refreshes_it(self):
+        def change():
+            self.unit.status = 'EXPIRED'
+            self.unit.save()
+        self.assert_refreshed(change, (0, 0))
+
+    def test_reserve_and_distribute_refresh_it(self):
+        self.assert_refreshed(lambda: reserve_unit('O+'), (0, 0))
+        self.unit.refresh_from_db()
+        self.assertTrue(release_unit(self.unit))
+        self.assert_refreshed(lambda: distribute_unit(self.unit, 'O+'), (0, 0))
+
+    def test_bulk_import_refreshes_it(self):
+        rows = 'serial_number,blood_group,expiry_date\nSTOCK-2,O+,2099-01-01\nSTOCK-3,A-,2099-01-01\n'
+        self.assert_refreshed(lambda: import_inventory_csv(io.StringIO(rows)), (3, 2))
+
+
+class ExpirySweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.expired = [
+            BloodInventory.objects.create(
+                serial_number=f'OLD-{i}', blood_group='A+', status='RESERVED' if i % 4 == 0 else 'AVAILABLE',
+                expiry_date=now - timedelta(days=1 + i),
+            ).pk
+            for i in range(8)
+        ]
+        cls.distributed = BloodInventory.objects.create(
+            serial_number='GIVEN', blood_group='A+', status='DISTRIBUTED', expiry_date=now - timedelta(days=3),
+        )
+        cls.fresh = BloodInventory.objects.create(
+            serial_number='FRESH', blood_group='A+', expiry_date=now + timedelta(days=3),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_expired_units_flip_in_chunks(self):
+        self.assertEqual(get_stock_summary()['available_blood'], 7)
+        now = timezone.now()
+        calls = []
+
+        chunks = sweep_expired_units(batch_size=3, now=now, on_chunk=lambda *args: calls.append(args[:2]))
+
+        self.assertEqual([touched for touched, _ in chunks], [3, 3, 2])
+        self.assertEqual(calls, [(1, 3), (2, 3), (3, 2)])
+        self.assertEqual(
+            list(BloodInventory.objects.filter(status='EXPIRED').order_by('pk').values_list('pk', flat=True)),
+            self.expired,
+        )
+        self.assertFalse(BloodInventory.objects.filter(pk__in=self.expired).exclude(status_changed_at=now).exists())
+        self.assertEqual(get_stock_summary()['available_blood'], 1)  # the cached count was dropped
+
+    def test_distributed_and_unexpired_units_are_untouched(self):
+        sweep_expired_units(batch_size=3)
+        self.distributed.refresh_from_db()
+        self.fresh.refresh_from_db()
+        self.assertEqual((self.distributed.status, self.fresh.status), ('DISTRIBUTED', 'AVAILABLE'))
+
+    def test_nothing_to_expire_is_two_queries(self):
+        sweep_expired_units()
+        with self.assertNumQueries(3):  # the empty first chunk, inside its savepoint
+            self.assertEqual(sweep_expired_units(), [])
+
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        user = User.objects.create_user('ana', first_name='Ana', last_name='Reyes')
+        donor = Donor.objects.create(user=user, blood_type='A+', contact_no='0917', address='Cavite')
+        campaign = Campaign.objects.create(
+            title='Imus, Cavite Drive', location='Imus', start_datetime=timezone.now(), end_datetime=timezone.now(),
+        )
+        expiry = timezone.now() + timedelta(days=30)
+        units = [('EXP-1', 'A+', 'AVAILABLE'), ('EXP-2', 'A+', 'EXPIRED'), ('EXP-3', 'B+', 'AVAILABLE')]
+        for serial, group, status in units:
+            BloodInventory.objects.create(
+                serial_number=serial, blood_group=group, status=status, expiry_date=expiry,
+                donor=donor, campaign=campaign,
+            )
+        for patient, status in [('Pedro Penduko', 'PENDING'), ('Pedro Santos', 'APPROVED'), ('Juan Cruz', 'PENDING')]:
+            BloodRequest.objects.create(
+                patient_name=patient, patient_blood_type='O+', hospital_name='General Hospital',
+                hospital_address='Cavite', physician_name='Dr. Lim', physician_license='12345', reason='Surgery', status=status,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def export(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_header_and_one_line_per_row(self):
+        response, body = self.export('inventory_export', blood_group='A+')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="inventory-\d{8}-\d{4}\.csv"$')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], [
+            'serial_number', 'blood_group', 'status', 'date_collected', 'expiry_date',
+            'donor_first_name', 'donor_last_name', 'campaign',
+        ])
+        self.assertEqual([row[:3] + row[5:] for row in rows[1:]], [
+            ['EXP-1', 'A+', 'AVAILABLE', 'Ana', 'Reyes', 'Imus, Cavite Drive'],
+            ['EXP-2', 'A+', 'EXPIRED', 'Ana', 'Reyes', 'Imus, Cavite Drive'],
+        ])
+
+    def test_list_filters_and_search_carry_over(self):
+        _, body = self.export('inventory_export', blood_group='A+', status='AVAILABLE')
+        self.assertEqual([row[0] for row in csv.reader(io.StringIO(body))][1:], ['EXP-1'])
+
+        _, body = self.export('request_export', q='pedro', status='PENDING')
+        self.assertEqual([row[2] for row in csv.reader(io.StringIO(body))][1:], ['Pedro Penduko'])
+
+        _, body = self.export('donor_export', q='rey')
+        self.assertEqual([row[1] for row in csv.reader(io.StringIO(body))][1:], ['ana'])
+
+    def test_ndjson_is_one_object_per_line(self):
+        response, body = self.export('request_export', format='ndjson', q='pedro')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson"'))
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual({record['patient_name'] for record in records}, {'Pedro Penduko', 'Pedro Santos'})
+        self.assertIsNone(records[0]['assigned_bag'])
+        self.assertEqual(len(records[0]), 12)
+
+    def test_rows_are_sent_in_batches(self):
+        with mock.patch('core.exports.LINES_PER_WRITE', 2):
+            response = self.client.get(reverse('inventory_export'))
+            chunks = list(response.streaming_content)
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [2, 2])
+
+
+class DashboardReadsTests(SimpleTestCase):
+    def thread_names(self, request):
+        reads = {f'read{i}': lambda: threading.current_thread().name for i in range(3)}
+        return asyncio.run(run_reads(request, reads))
+
+    def test_wsgi_runs_the_reads_in_order_on_one_thread(self):
+        names = self.thread_names(RequestFactory().get('/'))
+        self.assertEqual(list(names), ['read0', 'read1', 'read2'])
+        self.assertEqual(len(set(names.values())), 1)
+
+    def test_asgi_gathers_the_reads_on_worker_threads(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def read():
+            barrier.wait()  # only returns once all three reads are running at the same time
+            return threading.current_thread().name
+
+        request = AsyncRequestFactory().get('/')
+        values = asyncio.run(run_reads(request, {'a': read, 'b': read, 'c': read}))
+        self.assertEqual(len(set(values.values())), 3)
+
+
+class ForecastTests(SimpleTestCase):
+    def test_projection_finds_the_shortage_day(self):
+        groups, history, horizon = len(BLOOD_GROUPS), 90, 42
+        series = {
+            name: np.zeros((groups, history)) for name in ('collected', 'distributed', 'demand', 'expired')
+        }
+        series['expiring'] = np.zeros((groups, horizon))
+        series['on_hand'] = np.zeros(groups)
+
+        o_neg = BLOOD_GROUPS.index('O-')
+        series['on_hand'][o_neg] = 20
+        series['collected'][o_neg] = 1  # 1 in, 3 out a day: 2/day net burn
+        series['demand'][o_neg] = 3
+        series['expiring'][o_neg, 2] = 4  # 4 of the 20 expire on day 3
+
+        today = date(2026, 1, 1)
+        forecast = {row['group']: row for row in project(series, today, horizon)}
+
+        self.assertEqual(forecast['O-']['days_of_supply'], round(20 / 3, 1))
+        # End of day n: 20 - 2n - 4 (from day index 2) <= 0 first at n = 8, i.e. index 7.
+        self.assertEqual(forecast['O-']['shortage_date'], today + timedelta(days=7))
+        self.assertEqual(forecast['O-']['level'], 'low')
+        self.assertIsNone(forecast['A+']['shortage_date'])
+        self.assertIsNone(forecast['A+']['days_of_supply'])
+
+
+@NO_SAMPLING
+class CampaignListCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.donor_user = User.objects.create_user('donor')
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.upcoming = Campaign.objects.create(
+            title='Upcoming Drive', location='Imus', start_datetime=now + timedelta(days=2),
+            end_datetime=now + timedelta(days=2, hours=8),
+        )
+        Campaign.objects.create(
+            title='Past Drive', location='Bacoor', start_datetime=now - timedelta(days=3),
+            end_datetime=now - timedelta(days=3) + timedelta(hours=8),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def campaign_queries(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('campaign_list'))
+        return response, [query for query in queries.captured_queries if 'core_campaign' in query['sql']]
+
+    def test_pages_are_shared_per_role_and_filled_once(self):
+        response, queries = self.campaign_queries(self.donor_user)
+        self.assertEqual(len(queries), 2)  # count + page
+        self.assertContains(response, 'Upcoming Drive')
+        self.assertNotContains(response, 'Past Drive')
+
+        response, queries = self.campaign_queries(User.objects.create_user('other donor'))
+        self.assertEqual(queries, [])
+        self.assertContains(response, 'Join Campaign')
+
+        response, _ = self.campaign_queries(self.staff)
+        self.assertContains(response, 'Past Drive')
+        self.assertContains(response, 'Completed')
+        self.assertContains(response, 'Manage')
+
+    def test_saving_a_campaign_invalidates_every_page(self):
+        self.campaign_queries(self.donor_user)
+        self.upcoming.title = 'Renamed Drive'
+        self.upcoming.save()
+        response, queries = self.campaign_queries(self.donor_user)
+        self.assertEqual(len(queries), 2)
+        self.assertContains(response, 'Renamed Drive')
+
+    def test_fill_expires_when_the_next_campaign_starts(self):
+        now = timezone.now()
+        Campaign.objects.create(
+            title='Starting Soon', location='Imus', start_datetime=now + timedelta(seconds=30),
+            end_datetime=now + timedelta(hours=8),
+        )
+        self.assertLessEqual(get_campaign_page(False, 1, 6).cache_timeout, 31)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.noon = timezone.make_aware(datetime.combine(self.today, time(12)))
+
+    def unit(self, serial, group, days_ago, status='AVAILABLE', changed_days_ago=None):
+        collected = self.noon - timedelta(days=days_ago)
+        changed = collected if changed_days_ago is None else self.noon - timedelta(days=changed_days_ago)
+        return BloodInventory.objects.create(
+            serial_number=serial, blood_group=group, status=status, date_collected=collected,
+            expiry_date=collected + timedelta(days=42), status_changed_at=changed,
+        )
+
+    def on(self, days_ago, group, status):
+        return snapshot(self.today - timedelta(days=days_ago))[group][status]
+
+    def test_incremental_refresh_replays_only_the_touched_days(self):
+        self.unit('R-0', 'AB+', 8)
+        a_pos = self.unit('R-1', 'A+', 5)
+        self.unit('R-2', 'O-', 3, status='EXPIRED', changed_days_ago=1)
+        refresh_rollup(full=True)
+
+        self.assertEqual(self.on(5, 'A+', 'AVAILABLE'), 1)
+        self.assertEqual(self.on(2, 'O-', 'AVAILABLE'), 1)
+        self.assertEqual(self.on(1, 'O-', 'AVAILABLE'), 0)
+        self.assertEqual(self.on(1, 'O-', 'EXPIRED'), 1)
+        untouched = InventoryRollup.objects.get(date=self.today - timedelta(days=6), blood_group='AB+')
+
+        # A unit entered late for two days ago, and a status change today: only days from the late
+        # unit's collection are replayed, everything before that is kept as is.
+        late = self.unit('R-3', 'B+', 2)
+        a_pos.status = 'DISTRIBUTED'
+        a_pos.save()
+        result = refresh_rollup()
+
+        self.assertEqual(result.start, self.today - timedelta(days=2))
+        self.assertTrue(InventoryRollup.objects.filter(pk=untouched.pk).exists())
+        self.assertEqual(self.on(2, 'B+', 'AVAILABLE'), 1)
+        self.assertEqual(self.on(1, 'A+', 'AVAILABLE'), 1)
+        self.assertEqual(self.on(0, 'A+', 'AVAILABLE'), 0)
+        self.assertEqual(self.on(0, 'A+', 'DISTRIBUTED'), 1)
+
+        late.delete()
+        self.assertEqual(RollupState.objects.get().dirty_from, self.today - timedelta(days=2))
+        refresh_rollup()
+        self.assertEqual(self.on(0, 'B+', 'AVAILABLE'), 0)
+        self.assertIsNone(RollupState.objects.get().dirty_from)
+
+    def assert_matches_full_rebuild(self):
+        incremental = set(InventoryRollup.objects.values_list('date', 'blood_group', 'status', 'units'))
+        refresh_rollup(full=True)
+        self.assertEqual(incremental, set(InventoryRollup.objects.values_list('date', 'blood_group', 'status', 'units')))
+
+    def past_days(self):
+        return set(InventoryRollup.objects.filter(date__lt=self.today).values_list('date', 'blood_group', 'status', 'units'))
+
+    def test_status_changes_leave_closed_days_as_they_were(self):
+        old = self.unit('R-OLD', 'A+', 40)
+        self.unit('R-HELD', 'O+', 40, status='RESERVED', changed_days_ago=3)
+        refresh_rollup(full=True)
+        held = BloodInventory.objects.get(serial_number='R-HELD')
+        closed = self.past_days()
+        self.assertEqual(self.on(3, 'O+', 'RESERVED'), 1)
+
+        reserved = reserve_unit('A+')
+        self.assertEqual(reserved, old)
+        self.assertEqual(refresh_rollup().start, self.today)
+        self.assertEqual(self.on(1, 'A+', 'AVAILABLE'), 1)
+        self.assertEqual(self.on(0, 'A+', 'RESERVED'), 1)
+
+        # Released today: it was on hold for the last three days, and the rollup keeps saying so.
+        self.assertTrue(release_unit(held))
+        self.assertEqual(refresh_rollup().start, self.today)
+        self.assertEqual(self.on(0, 'O+', 'AVAILABLE'), 1)
+        self.assertEqual(self.on(0, 'O+', 'RESERVED'), 0)
+        self.assertEqual(self.past_days(), closed)
+        self.assert_matches_full_rebuild()
+
+        old.refresh_from_db()
+        self.assertTrue(distribute_unit(old, 'A+', held=True))
+        old.status = 'AVAILABLE'  # corrected by hand through the inventory form
+        old.save()
+        self.assertEqual(refresh_rollup().start, self.today)
+        self.assertEqual(self.on(0, 'A+', 'AVAILABLE'), 1)
+        self.assertEqual(self.past_days(), closed)
+        self.assert_matches_full_rebuild()
+        self.assertEqual(
+            list(old.status_changes.order_by('pk').values_list('from_status', 'to_status')),
+            [('AVAILABLE', 'RESERVED'), ('RESERVED', 'DISTRIBUTED'), ('DISTRIBUTED', 'AVAILABLE')],
+        )
+
+    def test_expiry_sweep_only_touches_today(self):
+        self.unit('R-AV', 'B+', 45)
+        self.unit('R-RES', 'B+', 45, status='RESERVED', changed_days_ago=6)
+        refresh_rollup(full=True)
+        closed = self.past_days()
+
+        sweep_expired_units()
+        self.assertEqual(refresh_rollup().start, self.today)
+        self.assertEqual(self.on(0, 'B+', 'EXPIRED'), 2)
+        self.assertEqual(self.on(1, 'B+', 'RESERVED'), 1)
+        self.assertEqual(self.past_days(), closed)
+        self.assert_matches_full_rebuild()
+
+    def test_blood_group_correction_replays_from_the_collection_day(self):
+        unit = self.unit('R-TYPO', 'A+', 5, status='DISTRIBUTED', changed_days_ago=2)
+        refresh_rollup(full=True)
+
+        unit = BloodInventory.objects.get(pk=unit.pk)
+        unit.blood_group = 'B+'
+        unit.save()
+        self.assertEqual(refresh_rollup().start, self.today - timedelta(days=5))
+        self.assertEqual((self.on(5, 'A+', 'AVAILABLE'), self.on(5, 'B+', 'AVAILABLE')), (0, 1))
+        self.assertEqual((self.on(1, 'A+', 'DISTRIBUTED'), self.on(1, 'B+', 'DISTRIBUTED')), (0, 1))
+        self.assert_matches_full_rebuild()
+
+    def test_failed_refresh_keeps_the_dirty_mark(self):
+        self.unit('R-1', 'A+', 5)
+        refresh_rollup(full=True)
+        mark_dirty(self.noon - timedelta(days=4))
+        with mock.patch('core.rollup._daily_events', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                refresh_rollup()
+        self.assertEqual(RollupState.objects.get().dirty_from, self.today - timedelta(days=4))
+        self.assertEqual(refresh_rollup().start, self.today - timedelta(days=4))
+
+
+@NO_SAMPLING
+class AvailabilityApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        for i, group in enumerate(['A+', 'A+', 'O-']):
+            BloodInventory.objects.create(serial_number=f'AV-{i}', blood_group=group, expiry_date=now + timedelta(days=30))
+        self.url = reverse('availability_api')
+
+    def test_batch_of_types_with_unencoded_plus(self):
+        response = self.client.get(self.url + '?types=A+,O-')
+        self.assertEqual(response.json()['blood_types'], [
+            {'blood_type': 'A+', 'available': 2, 'compatible_available': 3},
+            {'blood_type': 'O-', 'available': 1, 'compatible_available': 1},
+        ])
+        self.assertEqual(self.client.get(self.url, {'types': 'C+'}).status_code, 400)
+
+    def test_unchanged_poll_is_a_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A write that doesn't change the counts keeps the ETag; one that does, changes it.
+        Donor.objects.create(user=User.objects.create_user('ana'), blood_type='B+', contact_no='0917', address='Cavite')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        BloodInventory.objects.get(serial_number='AV-2').delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class LiveEventTests(TestCase):
+    async def test_stream_delivers_events_and_resyncs_a_client_that_falls_behind(self):
+        stream = stream_events(heartbeat=0.05)
+        self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+
+        broker.publish({'type': 'unit.reserved', 'id': 1})
+        self.assertEqual(await anext(stream), 'data: {"type":"unit.reserved","id":1}\n\n')
+        self.assertEqual(await anext(stream), ': keep-alive\n\n')
+
+        for i in range(EVENT_QUEUE_SIZE + 1):
+            broker.publish({'type': 'unit.added', 'id': i})
+        self.assertEqual(await anext(stream), format_event(RESYNC))
+
+        await stream.aclose()
+        self.assertEqual(len(broker), 0)
+
+    def test_request_changes_are_published_on_commit(self):
+        published = []
+        with mock.patch.object(broker, 'publish', published.append), \
+                mock.patch.object(EventBroker, '__len__', return_value=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                request = BloodRequest.objects.create(
+                    patient_name='Maria', patient_blood_type='O-', hospital_name='General Hospital',
+                    hospital_address='Cavite', physician_name='Santos', physician_license='12345', reason='Surgery',
+                )
+            request = BloodRequest.objects.get(pk=request.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                request.urgency = 'URGENT'
+                request.save()
+                request.status = 'APPROVED'
+                request.save()
+
+        self.assertEqual(published, [
+            {'type': 'request.created', 'id': request.pk, 'blood_type': 'O-', 'urgency': 'ROUTINE', 'status': 'PENDING'},
+            {'type': 'request.status', 'id': request.pk, 'status': 'APPROVED'},
+        ])
+
+
+class DonorEligibilityTests(TestCase):
+    def donor(self, username, blood_type):
+        user = User.objects.create_user(username, date_joined=timezone.now() - timedelta(days=365))
+        return Donor.objects.create(user=user, blood_type=blood_type, contact_no='0917', address='Cavite')
+
+    def test_recall_list_follows_recorded_donations(self):
+        now = timezone.now()
+        recent, rested, never, o_pos = (
+            self.donor('recent', 'O-'), self.donor('rested', 'O-'), self.donor('never', 'O-'), self.donor('opos', 'O+'),
+        )
+        BloodInventory.objects.create(serial_number='EL-1', donor=recent, expiry_date=now + timedelta(days=42))
+        BloodInventory.objects.create(
+            serial_number='EL-2', donor=rested, date_collected=now - timedelta(days=120), expiry_date=now - timedelta(days=78),
+        )
+
+        self.assertEqual(set(recall_queryset('O-')), {rested, never})
+        self.assertEqual(set(recall_queryset('O+')), {rested, never, o_pos})
+        self.assertEqual(set(recall_queryset('O+', compatible=False)), {o_pos})
+
+        BloodInventory.objects.get(serial_number='EL-1').delete()
+        self.assertIn(recent, recall_queryset('O-'))
+        recent.refresh_from_db()
+        self.assertIsNone(recent.last_donation_at)
+
+    def test_unit_moved_to_another_donor_refreshes_both(self):
+        # Recorded against the wrong donor at check-in, then corrected through the inventory form.
+        wrong, right = self.donor('wrong', 'A+'), self.donor('right', 'A+')
+        collected = timezone.now() - timedelta(days=10)
+        unit = BloodInventory.objects.create(
+            serial_number='EL-MOVE', donor=wrong, date_collected=collected, expiry_date=collected + timedelta(days=42),
+        )
+        self.assertEqual(list(recall_queryset('A+', compatible=False)), [right])
+
+        unit = BloodInventory.objects.get(pk=unit.pk)
+        unit.donor = right
+        unit.save()
+        wrong.refresh_from_db()
+        right.refresh_from_db()
+        self.assertIsNone(wrong.last_donation_at)
+        self.assertEqual(right.last_donation_at, collected)
+        self.assertEqual(list(recall_queryset('A+', compatible=False)), [wrong])
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', SMS_BACKEND='core.sms.LocmemBackend',
+)
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.requestor = User.objects.create_user('requestor', email='requestor@example.com')
+        past = timezone.now() - timedelta(days=1)
+        for i, blood_type in enumerate(['O-', 'O-', 'A+', 'B+']):
+            user = User.objects.create_user(f'donor{i}')
+            Donor.objects.create(
+                user=user, blood_type=blood_type, contact_no=f'0917{i:07d}', address='Cavite', next_eligible_at=past,
+            )
+        cls.blood_request = BloodRequest.objects.create(
+            requestor=cls.requestor, patient_name='Patient', patient_blood_type='A+', hospital_name='General Hospital',
+            hospital_address='Cavite', physician_name='Santos', physician_license='12345', reason='Surgery',
+        )
+
+    def setUp(self):
+        sms.outbox.clear()
+
+    def test_status_change_is_queued_not_sent_inline(self):
+        self.client.force_login(self.staff)
+        self.client.post(reverse('request_manage', kwargs={'pk': self.blood_request.pk}), {'status': 'REJECTED'})
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxMessage.objects.get().recipient, 'requestor@example.com')
+
+        result = drain_outbox(rate=0)
+        self.assertEqual(result.sent, 1)
+        self.assertEqual(mail.outbox[0].to, ['requestor@example.com'])
+        self.assertIn('Rejected', mail.outbox[0].body)
+        self.assertEqual(OutboxMessage.objects.get().status, 'SENT')
+
+    def test_shortage_alert_fans_out_to_compatible_eligible_donors(self):
+        self.client.force_login(self.staff)
+        self.client.post(reverse('shortage_alert'), {
+            'blood_type': 'A+', 'match': 'compatible', 'channel': 'SMS', 'message': 'A+ stock is low, please donate.',
+        })
+        self.assertEqual(OutboxMessage.objects.count(), 0)  # one broadcast row; the worker expands it
+
+        result = drain_outbox(rate=0, workers=2, batch_size=2)
+        self.assertEqual((result.expanded, result.sent), (3, 3))
+        self.assertEqual(sorted(to for to, _ in sms.outbox), ['09170000000', '09170000001', '09170000002'])
+
+    def test_failed_send_is_retried_with_backoff_then_given_up(self):
+        OutboxMessage.objects.create(channel='SMS', recipient='0917', body='Hello')
+        with mock.patch.object(sms.LocmemBackend, 'send', side_effect=ConnectionError('gateway down')):
+            result = drain_outbox(rate=0, max_attempts=2)
+            message = OutboxMessage.objects.get()
+            self.assertEqual((result.retried, message.status, message.attempts), (1, 'PENDING', 1))
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            self.assertIn('gateway down', message.last_error)
+
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+            drain_outbox(rate=0, max_attempts=2)
+        self.assertEqual(OutboxMessage.objects.get().status, 'FAILED')
+
+
+@override_settings(SQL_PROFILE_SAMPLE_RATE=0, SQL_PROFILE_SLOW_MS=0)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def test_forced_sample_records_queries_call_sites_and_render_time(self):
+        self.client.force_login(self.admin)
+        with self.assertLogs('core.profiling.slow') as logs:
+            # A sync view: reads the async dashboards gather run on other threads and connections.
+            self.client.get(reverse('inventory_report'), {'_profile': 1})
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.url_name, 'inventory_report')
+        self.assertGreater(profile.queries, 0)
+        self.assertGreater(profile.render_ms, 0)
+        self.assertTrue(any('core/views.py' in statement['site'] for statement in profile.slowest))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['url_name'], entry['queries']), ('inventory_report', profile.queries))
+
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.force_login(self.staff)  # ?_profile=1 only forces a sample for superusers
+        self.client.get(reverse('inventory_list'), {'_profile': 1})
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_summary_is_aggregated_by_url_name(self):
+        for duration, queries in [(10, 2), (30, 4), (900, 40)]:
+            RequestProfile.objects.create(
+                url_name='donor_list', method='GET', path='/donors/', status_code=200, duration_ms=duration,
+                db_ms=duration / 2, render_ms=1, queries=queries, duplicate_queries=0,
+            )
+        RequestProfile.objects.create(
+            url_name='home', method='GET', path='/', status_code=200, duration_ms=5, db_ms=0, render_ms=1,
+            queries=0, duplicate_queries=0, recorded_at=timezone.now() - timedelta(days=2),
+        )
+        self.client.force_login(self.admin)
+        with self.settings(SQL_PROFILE_SLOW_MS=500):
+            response = self.client.get(reverse('query_profile'))
+
+        [row] = response.context['rows']  # the home sample is older than the default one day
+        self.assertEqual(
+            (row['url_name'], row['samples'], row['p50_ms'], row['max_queries'], row['slow']), ('donor_list', 3, 30, 40, 1),
+        )
+        self.assertEqual([profile.duration_ms for profile in response.context['slow_requests']], [900])
+        self.assertEqual(self.client.get(reverse('query_profile'), {'days': 7}).context['rows'][1]['url_name'], 'home')
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('query_profile')).status_code, 302)
+
+
+@mock.patch('core.replica.replica_alias', return_value='replica')
+class ReplicaRoutingTests(SimpleTestCase):
+    def test_only_designated_core_reads_go_to_the_replica(self, _):
+        self.assertEqual(BloodInventory.objects.all().db, 'default')
+        with reading_from_replica():
+            self.assertEqual(BloodInventory.objects.all().db, 'replica')
+            self.assertEqual(User.objects.all().db, 'default')  # sessions and auth stay on the primary
+            self.assertEqual(BloodInventory.objects.select_for_update().db, 'default')
+            unit = BloodInventory(serial_number='SN-1')
+            unit._state.db = 'replica'
+            self.assertEqual(router.db_for_write(BloodInventory, instance=unit), 'default')
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.assertEqual(BloodInventory.objects.all().db, 'default')
+
+    def test_a_post_pins_the_client_to_the_primary(self, _):
+        used = []
+
+        def view(request):
+            with reading_from_replica():
+                used.append(BloodInventory.objects.all().db)
+            return HttpResponse()
+
+        middleware, factory = ReplicaPinMiddleware(view), RequestFactory()
+        self.assertNotIn(PIN_COOKIE, middleware(factory.get('/')).cookies)
+        response = middleware(factory.post('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+        pinned = factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        middleware(pinned)
+        self.assertEqual(used, ['replica', 'default', 'default'])
+
+
+class KeysetPaginationTests(TestCase):
+    ORDERING = ['expiry_date', 'id']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        # Four expiry dates, three or four units each, so page edges fall inside runs of equal values.
+        base = timezone.now() + timedelta(days=10)
+        for i in range(14):
+            BloodInventory.objects.create(
+                serial_number=f'U{i:02}', blood_group='O+', expiry_date=base + timedelta(days=i % 4),
+            )
+        # Recall: equal next_eligible_at values spread over several blood types.
+        due = timezone.now() - timedelta(days=30)
+        for i, blood_type in enumerate(['O-', 'A+', 'A-', 'O+', 'A+', 'O-', 'A-', 'O+', 'O-', 'A+', 'B+']):
+            Donor.objects.create(
+                user=User.objects.create_user(f'donor{i}'), blood_type=blood_type, contact_no='0917', address='Cavite',
+                next_eligible_at=due + timedelta(days=i // 3),
+            )
+
+    def walk(self, page_of, page_size):
+        # All pages forward via next_cursor, then back from the last page via previous_cursor.
+        forward = [page_of()]
+        while forward[-1].has_next():
+            forward.append(page_of(after=forward[-1].next_cursor))
+        backward = [forward[-1]]
+        while backward[-1].has_previous():
+            backward.append(page_of(before=backward[-1].previous_cursor))
+        for page in forward:
+            self.assertLessEqual(len(page), page_size)
+        return [[obj.pk for obj in page] for page in forward], [[obj.pk for obj in page] for page in backward[::-1]]
+
+    def test_cursors_cross_tied_values_without_gaps_or_repeats(self):
+        queryset = BloodInventory.objects.all()
+        expected = list(queryset.order_by(*self.ORDERING).values_list('pk', flat=True))
+        for ordering in (self.ORDERING, ['-expiry_date', '-id']):
+            expected_order = expected if ordering[0] == 'expiry_date' else expected[::-1]
+            forward, backward = self.walk(lambda **cursor: keyset_page(queryset, ordering, 3, **cursor), 3)
+            self.assertEqual(sum(forward, []), expected_order)
+            self.assertEqual(backward, forward)
+            self.assertFalse(keyset_page(queryset, ordering, 3).has_previous())
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        queryset = BloodInventory.objects.all()
+        first = [unit.pk for unit in keyset_page(queryset, self.ORDERING, 3)]
+        unit = queryset.first()
+        for token in [
+            'garbage', '!!!', '=', encode_cursor(unit, ['expiry_date']), encode_cursor(unit, ['id', 'serial_number']),
+            'eyJhIjogMX0',  # {"a": 1}
+            'WyJub3QgYSBkYXRlIiwgMV0',  # ["not a date", 1]
+        ]:
+            for direction in ('after', 'before'):
+                page = keyset_page(queryset, self.ORDERING, 3, **{direction: token})
+                self.assertEqual([unit.pk for unit in page], first, (direction, token))
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('inventory_list'), {'after': 'WyJub3QgYSBkYXRlIiwgMV0', 'before': '%%%'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [unit.pk for unit in response.context['inventory_items']],
+            [unit.pk for unit in keyset_page(queryset, self.ORDERING, 8)],
+        )
+
+    def test_ranked_search_uses_offset_pages(self):
+        for i in range(10):
+            user = User.objects.create_user(f'santos{i}', first_name='Maria', last_name=f'Santos{i}')
+            Donor.objects.create(user=user, blood_type='O+', contact_no='0917', address='Cavite')
+        self.client.force_login(self.staff)
+
+        pages = [self.client.get(reverse('donor_list'), {'q': 'santos', 'page': number}) for number in (1, 2)]
+        for response in pages:
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(getattr(response.context['page_obj'], 'is_keyset', False))
+        names = [donor.user.username for response in pages for donor in response.context['donors']]
+        self.assertEqual(sorted(names), [f'santos{i}' for i in range(10)])
+        self.assertEqual(pages[1].context['page_obj'].number, 2)
+
+    def test_merged_recall_pages_match_one_sorted_query(self):
+        ordering = ['next_eligible_at', 'id']
+        groups = ['A+', 'A-', 'O+', 'O-']
+        querysets = [Donor.objects.filter(blood_type=group) for group in groups]
+        expected = list(Donor.objects.filter(blood_type__in=groups).order_by(*ordering).values_list('pk', flat=True))
+        for page_size in (1, 2, 3, 4, 10):
+            forward, backward = self.walk(
+                lambda **cursor: merged_keyset_page(querysets, ordering, page_size, **cursor), page_size,
+            )
+            self.assertEqual(sum(forward, []), expected, page_size)
+            self.assertEqual(backward, forward, page_size)
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def donor(username, first_name, last_name):
+            user = User.objects.create_user(username, first_name=first_name, last_name=last_name)
+            return Donor.objects.create(user=user, blood_type='O+', contact_no='0917', address='Cavite')
+
+        cls.marquez = donor('markmarquez', 'Mark', 'Marquez')
+        cls.maria = donor('lopez1', 'Maria', 'Lopez')
+        cls.juan = donor('juan', 'Juan', 'Cruz')
+        cls.blood_request = BloodRequest.objects.create(
+            patient_name='Pedro Penduko', patient_blood_type='A+', hospital_name='General Hospital',
+            hospital_address='Cavite', physician_name='Santos', physician_license='12345', reason='Surgery',
+        )
+
+    def donors(self, text):
+        return list(search_donors(Donor.objects.order_by('-id'), text))
+
+    def requests(self, text):
+        return list(search_requests(BloodRequest.objects.order_by('-id'), text))
+
+    def test_prefix_matches_are_ordered_by_rank(self):
+        # "mar" hits all three columns of Mark Marquez and only the first name of Maria Lopez.
+        self.assertEqual(self.donors('mar'), [self.marquez, self.maria])
+        self.assertEqual(self.donors('mar lop'), [self.maria])
+        self.assertEqual(self.donors('xyz'), [])
+
+    def test_rename_through_donor_form_updates_the_index(self):
+        form = DonorForm({
+            'first_name': 'Ramon', 'last_name': 'Magsaysay', 'email': 'ramon@example.com', 'blood_type': 'O+',
+            'contact_no': '0917', 'address': 'Cavite',
+        }, instance=self.juan)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.donors('ramon mag'), [self.juan])
+        self.assertEqual(self.donors('cruz'), [])
+
+    def test_request_edit_and_delete_update_the_index(self):
+        self.blood_request.patient_name = 'Cardo Dalisay'
+        self.blood_request.save()
+        self.assertEqual(self.requests('cardo'), [self.blood_request])
+        self.assertEqual(self.requests('penduko'), [])
+
+        self.blood_request.delete()
+        self.assertEqual(self.requests('cardo'), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM core_bloodrequest_fts")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+@NO_SAMPLING
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('juan')
+        Donor.objects.create(user=self.user, blood_type='O+', contact_no='0917', address='Cavite')
+        self.client.force_login(self.user)
+
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query for query in queries.captured_queries if 'auth_group' in query['sql']]
+
+    def test_roles_are_served_from_the_session(self):
+        for _ in range(2):
+            _, lookups = self.group_queries(reverse('campaign_list'))
+            self.assertEqual(lookups, [])
+
+    def test_joining_the_red_cross_group_takes_effect_on_the_next_request(self):
+        self.assertRedirects(self.client.get(reverse('dashboard')), reverse('donor_dashboard'))
+        self.user.groups.add(Group.objects.create(name='Red Cross'))
+        response, lookups = self.group_queries(reverse('dashboard'))
+        self.assertRedirects(response, reverse('redcross_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(len(lookups), 1)
+
+    def test_is_staff_change_takes_effect_on_the_next_request(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertRedirects(self.client.get(reverse('dashboard')), reverse('redcross_dashboard'), fetch_redirect_response=False)
+
+
+class AllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.units = {}
+        for serial, group, days, status in [
+            ('O-LATE', 'O-', 30, 'AVAILABLE'),
+            ('O-SOON', 'O-', 2, 'AVAILABLE'),
+            ('A+LATE', 'A+', 20, 'AVAILABLE'),
+            ('A+SOON', 'A+', 5, 'AVAILABLE'),
+            ('A+GONE', 'A+', -1, 'AVAILABLE'),  # past expiry, not swept yet
+            ('A+HELD', 'A+', 1, 'RESERVED'),
+            ('A-ONLY', 'A-', 40, 'AVAILABLE'),
+            ('B+ONLY', 'B+', 3, 'AVAILABLE'),
+        ]:
+            cls.units[serial] = BloodInventory.objects.create(
+                serial_number=serial, blood_group=group, status=status, expiry_date=now + timedelta(days=days),
+            )
+
+    def serials(self, units):
+        return [unit.serial_number for unit in units]
+
+    def test_compatibility_matrix(self):
+        donors_for = {
+            'O-': {'O-'}, 'O+': {'O-', 'O+'}, 'A-': {'O-', 'A-'}, 'A+': {'O-', 'O+', 'A-', 'A+'},
+            'B-': {'O-', 'B-'}, 'B+': {'O-', 'O+', 'B-', 'B+'}, 'AB-': {'O-', 'A-', 'B-', 'AB-'},
+            'AB+': set(BLOOD_GROUPS),
+        }
+        self.assertEqual(set(DONOR_PREFERENCE), set(BLOOD_GROUPS))
+        for recipient, donors in donors_for.items():
+            groups = compatible_groups(recipient)
+            self.assertEqual(set(groups), donors, recipient)
+            self.assertEqual(groups[0], recipient)
+            self.assertEqual(groups[-1], 'O-')
+            for donor in BLOOD_GROUPS:
+                self.assertEqual(can_receive(recipient, donor), donor in donors)
+        self.assertEqual(compatible_groups('unknown'), [])
+
+    def test_exact_match_first_then_fefo_within_each_group(self):
+        self.assertEqual(self.serials(allocate_units('A+')), ['A+SOON', 'A+LATE', 'A-ONLY', 'O-SOON', 'O-LATE'])
+        self.assertEqual(self.serials(allocate_units('AB+')), [
+            'A+SOON', 'A+LATE', 'A-ONLY', 'B+ONLY', 'O-SOON', 'O-LATE',
+        ])
+
+    def test_expired_and_held_units_are_never_offered(self):
+        offered = set(self.serials(allocate_units('AB+', limit=50)))
+        self.assertNotIn('A+GONE', offered)
+        self.assertNotIn('A+HELD', offered)
+
+    def test_limit_stops_before_later_groups(self):
+        with CaptureQueriesContext(connection) as queries:
+            units = allocate_units('A+', limit=2)
+        self.assertEqual(self.serials(units), ['A+SOON', 'A+LATE'])
+        self.assertEqual(len(queries), 1)
+
+    def test_reserve_takes_the_best_unit(self):
+        unit = reserve_unit('B-')
+        self.assertEqual(unit.serial_number, 'O-SOON')
+        self.assertEqual(BloodInventory.objects.get(pk=unit.pk).status, 'RESERVED')
+        self.assertEqual(reserve_unit('O-').serial_number, 'O-LATE')
+        self.assertIsNone(reserve_unit('O-'))
+
+    def test_a_bag_picked_at_distribution_is_checked_like_a_reservation(self):
+        for serial in ('A+GONE', 'B+ONLY', 'A+HELD'):  # expired, incompatible, another request's
+            with self.subTest(serial=serial):
+                self.assertFalse(distribute_unit(self.units[serial], 'A+'))
+        self.assertFalse(BloodInventory.objects.filter(status='DISTRIBUTED').exists())
+        self.assertTrue(distribute_unit(self.units['A-ONLY'], 'A+'))
+        self.assertTrue(distribute_unit(self.units['A+HELD'], 'A+', held=True))
+
+
+class CompletedRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.unit = BloodInventory.objects.create(
+            serial_number='DONE-1', blood_group='A+', status='DISTRIBUTED', expiry_date=timezone.now() + timedelta(days=30),
+        )
+        cls.spare = BloodInventory.objects.create(
+            serial_number='SPARE-1', blood_group='A+', expiry_date=timezone.now() + timedelta(days=30),
+        )
+        cls.blood_request = BloodRequest.objects.create(
+            patient_name='Patient', patient_blood_type='A+', hospital_name='General Hospital', hospital_address='Cavite',
+            physician_name='Santos', physician_license='12345', reason='Surgery', status='COMPLETED', assigned_bag=cls.unit,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.url = reverse('request_manage', kwargs={'pk': self.blood_request.pk})
+
+    def assert_unchanged(self):
+        self.blood_request.refresh_from_db()
+        self.assertEqual((self.blood_request.status, self.blood_request.assigned_bag_id), ('COMPLETED', self.unit.pk))
+        self.assertEqual(BloodInventory.objects.get(pk=self.unit.pk).status, 'DISTRIBUTED')
+        self.assertEqual(BloodInventory.objects.get(pk=self.spare.pk).status, 'AVAILABLE')
+
+    def test_resaving_a_completed_request_is_a_no_op(self):
+        response = self.client.post(self.url, {'status': 'COMPLETED', 'blood_bag': self.unit.pk})
+        self.assertRedirects(response, reverse('request_list'), fetch_redirect_response=False)
+        self.assert_unchanged()
+
+    def test_a_completed_request_cannot_be_reopened_or_given_another_bag(self):
+        for data in (
+            {'status': 'APPROVED'}, {'status': 'PENDING'}, {'status': 'REJECTED'},
+            {'status': 'COMPLETED', 'blood_bag': self.spare.pk},
+        ):
+            with self.subTest(**data):
+                response = self.client.post(self.url, data)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'already distributed')
+                self.assert_unchanged()
+
+
+class ReservationRaceTests(TransactionTestCase):
+    # Real threads with their own connections and real commits; TestCase's wrapping transaction would hide the race.
+    UNITS = 6
+    WORKERS = 16
+
+    def setUp(self):
+        expiry = timezone.now() + timedelta(days=30)
+        self.units = [
+            BloodInventory.objects.create(serial_number=f'RACE-{i:03d}', blood_group='O-', expiry_date=expiry + timedelta(hours=i))
+            for i in range(self.UNITS)
+        ]
+
+    def reserve_concurrently(self, preferred=None):
+        barrier = threading.Barrier(self.WORKERS)
+        results, failures = [], []
+
+        def worker():
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        results.append(reserve_unit('O-', preferred=preferred))
+                        return
+                    except OperationalError:
+                        continue  # SQLite "database is locked": the whole transaction rolled back, try again
+            except Exception as exc:  # surface anything else in the main thread
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        return results
+
+    def assert_no_double_allocation(self, results):
+        claimed = [unit.pk for unit in results if unit is not None]
+        self.assertEqual(len(claimed), len(set(claimed)), "a unit was reserved twice")
+        self.assertEqual(len(claimed), self.UNITS)
+        self.assertEqual(results.count(None), self.WORKERS - self.UNITS)
+        self.assertEqual(BloodInventory.objects.filter(status='RESERVED').count(), self.UNITS)
+
+    def test_concurrent_reservations_never_share_a_unit(self):
+        self.assert_no_double_allocation(self.reserve_concurrently())
+
+    def test_everyone_wanting_the_same_bag_falls_back_to_the_next_best(self):
+        results = self.reserve_concurrently(preferred=self.units[0])
+        self.assert_no_double_allocation(results)
+        self.assertEqual(sum(1 for unit in results if unit is not None and unit.pk == self.units[0].pk), 1)
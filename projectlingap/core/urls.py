@@ -6,6 +6,9 @@ urlpatterns = [
     # PUBLIC LANDING PAGE
     path('', views.landing_page, name='home'),
 
+    # HOSPITAL AVAILABILITY API
+    path('api/availability/', views.availability_api, name='availability_api'),
+
     # AUTHENTICATION
     path('login/', auth_views.LoginView.as_view(template_name='core/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='home'), name='logout'),  # Redirect to home after logout
@@ -18,14 +21,21 @@ urlpatterns = [
     path('redcross/dashboard/', views.redcross_dashboard, name='redcross_dashboard'),
     path('campaign/create/', views.CampaignCreateView.as_view(), name='campaign_create'),
     path('campaign/manage/<int:pk>/', views.campaign_manage, name='campaign_manage'),
+    path('campaign/manage/<int:pk>/tallies/', views.campaign_tallies, name='campaign_tallies'),
+    path('events/', views.event_stream, name='event_stream'),
     path('campaign/record-donation/<int:campaign_id>/<int:donor_id>/', views.record_donation, name='record_donation'),
     path('donors/', views.DonorListView.as_view(), name='donor_list'),
+    path('donors/export/', views.DonorExportView.as_view(), name='donor_export'),
+    path('donors/recall/', views.DonorRecallView.as_view(), name='donor_recall'),
+    path('donors/recall/export/', views.DonorRecallExportView.as_view(), name='donor_recall_export'),
+    path('donors/recall/alert/', views.shortage_alert, name='shortage_alert'),
     path('donors/add/', views.AdminDonorCreateView.as_view(), name='donor_create'),
     path('donors/edit/<int:pk>/', views.DonorUpdateView.as_view(), name='donor_update'),
     path('campaign/manage/<int:pk>/', views.campaign_manage, name='campaign_manage'),
     path('campaign/edit/<int:pk>/', views.CampaignUpdateView.as_view(), name='campaign_edit'),
     path('campaign/delete/<int:pk>/', views.CampaignDeleteView.as_view(), name='campaign_delete'),
     path('dashboard/admin/', views.superuser_dashboard, name='superuser_dashboard'),
+    path('dashboard/admin/queries/', views.query_profile, name='query_profile'),
     path('volunteers/', views.VolunteerListView.as_view(), name='volunteer_list'),
     path('volunteers/add/', views.VolunteerCreateView.as_view(), name='volunteer_add'),
     path('volunteers/<int:pk>/edit/', views.VolunteerUpdateView.as_view(), name='volunteer_edit'),
@@ -41,11 +51,15 @@ urlpatterns = [
     # BLOOD REQUESTS
     path('request/blood/', views.RequestCreateView.as_view(), name='request_blood'),
     path('requests/', views.RequestListView.as_view(), name='request_list'),
+    path('requests/export/', views.RequestExportView.as_view(), name='request_export'),
     path('requests/manage/<int:pk>/', views.RequestUpdateView.as_view(), name='request_manage'),
 
     # INVENTORY & DONOR MANAGEMENT
     path('inventory/', views.InventoryListView.as_view(), name='inventory_list'),
     path('inventory/add/', views.InventoryCreateView.as_view(), name='inventory_create'),
+    path('inventory/import/', views.inventory_import, name='inventory_import'),
+    path('reports/inventory/', views.inventory_report, name='inventory_report'),
+    path('inventory/export/', views.InventoryExportView.as_view(), name='inventory_export'),
     path('inventory/edit/<int:pk>/', views.InventoryUpdateView.as_view(), name='inventory_update'),
     path('inventory/delete/<int:pk>/', views.InventoryDeleteView.as_view(), name='inventory_delete'),
 
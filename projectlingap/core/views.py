@@ -1,9 +1,21 @@
+import io
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views.decorators.http import require_GET, require_POST
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q
-from django.core.paginator import Paginator
+from django.utils.dateparse import parse_date
+from django.db import transaction
+from django.db.models import Count, Q
+from django.core.paginator import InvalidPage, Paginator
 from django.contrib.auth import login
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -17,7 +29,8 @@ from .models import (
     BloodInventory,
     BloodRequest,
     Campaign,
-    CampaignParticipant
+    CampaignParticipant,
+    RollupState
 )
 from .forms import (
     UserRegistrationForm,
@@ -29,32 +42,64 @@ from .forms import (
     AdminDonorCreationForm,
     RequestDispositionForm,
     VolunteerCreationForm,
-    VolunteerUpdateForm
+    VolunteerUpdateForm,
+    InventoryImportForm,
+    ShortageAlertForm
 )
+from .search import filter_donors, search_donors, search_requests
+from .pagination import KeysetPaginationMixin, keyset_page, merged_keyset_page
+from .stock import BLOOD_GROUPS, get_stock_summary
+from .forecast import get_forecast
+from .rollup import STATUSES as ROLLUP_STATUSES, monthly_expired, snapshot, status_series
+from .roles import get_roles, is_red_cross
+from .allocation import distribute_unit, release_unit, reserve_unit
+from .importer import import_inventory_csv
+from .checkin import check_in_donations
+from .exports import StreamingExportMixin
+from .events import stream_events
+from .dashboards import run_reads
+from .replica import ReplicaReadsMixin, replica_reads
+from .profiling import RETENTION as PROFILE_RETENTION, slow_requests, summarize as summarize_profiles
+from .eligibility import DONATION_INTERVAL, recall_groups, recall_queryset
+from .availability import availability_payload, get_availability, parse_blood_types
+from .outbox import broadcast, notify_request_status
+from .campaigns import campaign_queryset, get_campaign_page
+
+ROSTER_PAGE_SIZE = 50
+REPORT_TREND_DAYS = 30
 
 # PUBLIC LANDING PAGE
 def landing_page(request):
     return render(request, 'core/home.html')
 
-# DASHBOARD REDIRECTOR
-@login_required
-def dashboard_view(request):
-    if is_red_cross(request.user):
-        return redirect('redcross_dashboard')
-    else:
-        return redirect('donor_dashboard')
-
-def is_red_cross(user):
-    return user.is_staff or user.groups.filter(name='Red Cross').exists()
-
-
-def is_donor(user):
-    return not user.is_staff
+# HOSPITAL AVAILABILITY API
+# Public and read-only: counts per blood group, no unit or donor details. A poll whose ETag or
+# Last-Modified still matches is answered from the cache with a 304 and never reaches the database.
+@require_GET
+def availability_api(request):
+    try:
+        blood_types = parse_blood_types(request.GET.getlist('types'))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    entry = get_availability()
+    etag = quote_etag(entry['etag'])
+    last_modified = int(entry['last_modified'].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(availability_payload(entry, blood_types))
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
 
-# MAIN DASHBOARD
+# DASHBOARD REDIRECTOR
 @login_required
 def dashboard_view(request):
-    if is_red_cross(request.user):
+    roles = get_roles(request.user)
+    if roles['superuser']:
+        return redirect('superuser_dashboard')
+    elif roles['red_cross']:
         return redirect('redcross_dashboard')
     else:
         return redirect('donor_dashboard')
@@ -63,21 +108,26 @@ def dashboard_view(request):
 # RED CROSS / ADMIN SIDE
 @login_required
 @user_passes_test(is_red_cross)
-def redcross_dashboard(request):
-
-    pending_requests = BloodRequest.objects.filter(status='PENDING').count()
-    available_blood = BloodInventory.objects.filter(status='AVAILABLE').count()
-    active_campaigns = Campaign.objects.filter(end_datetime__gt=timezone.now()).count()
-
-    recent_donations = BloodInventory.objects.all().order_by('-date_collected')[:5]
+@replica_reads
+async def redcross_dashboard(request):
+    reads = await run_reads(request, {
+        'summary': get_stock_summary,
+        'recent_donations': lambda: list(
+            BloodInventory.objects.select_related('donor__user').order_by('-date_collected')[:5]
+        ),
+        'forecast': get_forecast,
+    })
+    summary = reads['summary']
 
     context = {
-        'pending_requests': pending_requests,
-        'available_blood': available_blood,
-        'active_campaigns': active_campaigns,
-        'recent_donations': recent_donations,
+        'pending_requests': summary['pending_requests'],
+        'available_blood': summary['available_blood'],
+        'available_by_group': summary['available_by_group'],
+        'active_campaigns': summary['active_campaigns'],
+        'recent_donations': reads['recent_donations'],
+        'forecast': reads['forecast'],
     }
-    return render(request, 'core/dashboard_redcross.html', context)
+    return await sync_to_async(render)(request, 'core/dashboard_redcross.html', context)
 
 
 class CampaignCreateView(CreateView):
@@ -91,29 +141,101 @@ class CampaignCreateView(CreateView):
         return super().dispatch(*args, **kwargs)
 
 
+def with_participant_counts(queryset):
+    return queryset.annotate(
+        total_participants=Count('participants'),
+        donated_count=Count('participants', filter=Q(participants__has_donated=True)),
+    )
+
+
 @login_required
 @user_passes_test(is_red_cross)
 def campaign_manage(request, pk):
-    campaign = get_object_or_404(Campaign, pk=pk)
-    participants = campaign.participants.select_related('donor', 'donor__user').all()
+    campaign = get_object_or_404(with_participant_counts(Campaign.objects.all()), pk=pk)
 
-    total_participants = participants.count()
-    donated_count = participants.filter(has_donated=True).count()
+    # Batch check-in: one POST records every donation entered on the roster.
+    checkin = None
+    if request.method == 'POST':
+        checkin = check_in_donations(campaign, request.POST, processed_by=request.user)
+        if checkin.created:
+            messages.success(request, f"Recorded {checkin.created} donation(s).")
+        if not checkin.errors:
+            return redirect(request.get_full_path())
+        messages.error(request, f"{len(checkin.errors)} row(s) were not saved. Check the highlighted donors.")
+        # Counts were read before the check-in saved anything.
+        campaign = get_object_or_404(with_participant_counts(Campaign.objects.all()), pk=pk)
+
+    # Roster: keyset-paged so a city-wide drive with thousands of registrants stays one small page.
+    participants = campaign.participants.select_related('donor', 'donor__user')
+    search_query = request.GET.get('q')
+    blood_filter = request.GET.get('blood_type')
+    if search_query:
+        participants = participants.filter(donor__in=filter_donors(Donor.objects.all(), search_query).values('pk'))
+    if blood_filter:
+        participants = participants.filter(donor__blood_type=blood_filter)
+
+    page = keyset_page(
+        participants, ('id',), ROSTER_PAGE_SIZE,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    )
+    if checkin:
+        for participant in page:
+            participant.checkin_error = checkin.errors.get(participant.pk)
+            if participant.checkin_error:
+                participant.checkin_serial = request.POST.get(f'serial-{participant.pk}', '')
+                participant.checkin_expiry = request.POST.get(f'expiry-{participant.pk}', '')
+
+    query_params = request.GET.copy()
+    for key in ('after', 'before'):
+        query_params.pop(key, None)
 
     context = {
         'campaign': campaign,
-        'participants': participants,
-        'total_participants': total_participants,
-        'donated_count': donated_count,  # Pass this clear number to the template
+        'participants': page,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'search_params': query_params.urlencode(),
+        'default_expiry': request.POST.get('default_expiry', '') if checkin else '',
+        'total_participants': campaign.total_participants,
+        'donated_count': campaign.donated_count,
+        'pending_count': campaign.total_participants - campaign.donated_count,
     }
     return render(request, 'core/campaign_manage.html', context)
 
 
+@login_required
+@user_passes_test(is_red_cross)
+def campaign_tallies(request, pk):
+    # Polled by campaign_manage during a live drive: one aggregate query, no roster.
+    counts = with_participant_counts(Campaign.objects.filter(pk=pk)).values('total_participants', 'donated_count').first()
+    if counts is None:
+        raise Http404("Campaign not found")
+    return JsonResponse({
+        'total': counts['total_participants'],
+        'donated': counts['donated_count'],
+        'pending': counts['total_participants'] - counts['donated_count'],
+    })
+
+
+# LIVE EVENTS
+# Needs the ASGI app (projectlingap.asgi): under WSGI every open stream would pin a worker thread,
+# so there the endpoint answers 204, which tells EventSource to stop reconnecting.
+@login_required
+@user_passes_test(is_red_cross)
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(stream_events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: flush each event instead of buffering
+    return response
+
+
 @login_required
 @user_passes_test(is_red_cross)
 def record_donation(request, campaign_id, donor_id):
     campaign = get_object_or_404(Campaign, pk=campaign_id)
-    donor = get_object_or_404(Donor, pk=donor_id)
+    donor = get_object_or_404(Donor.objects.select_related('user'), pk=donor_id)
 
     if request.method == 'POST':
         form = CampaignDonationForm(request.POST)
@@ -145,26 +267,21 @@ def record_donation(request, campaign_id, donor_id):
 
 # DONOR SIDE
 @login_required
-def donor_dashboard(request):
-    try:
-        donor = request.user.donor_profile
-    except Donor.DoesNotExist:
+@replica_reads
+async def donor_dashboard(request):
+    user = await request.auser()
+    donor = await Donor.objects.filter(user=user).afirst()
+    if donor is None:
         return redirect('create_donor_profile')
+    donor.user = user
 
-    donation_count = BloodInventory.objects.filter(donor=donor).count()
-
-    donations = BloodInventory.objects.filter(donor=donor).order_by('-date_collected')[:5]
-    requests = BloodRequest.objects.filter(processed_by=request.user).order_by('-request_date')[:5]
-
-    user_requests = BloodRequest.objects.filter(requestor=request.user).order_by('-request_date')[:5]
-
-    context = {
-        'donor': donor,
-        'donation_count': donation_count,
-        'donations': donations,
-        'requests': user_requests,  # Using the sliced lists
-    }
-    return render(request, 'core/dashboard_donor.html', context)
+    context = await run_reads(request, {
+        'donation_count': BloodInventory.objects.filter(donor=donor).count,
+        'donations': lambda: list(BloodInventory.objects.filter(donor=donor).order_by('-date_collected')[:5]),
+        'requests': lambda: list(BloodRequest.objects.filter(requestor=user).order_by('-request_date')[:5]),
+    })
+    context['donor'] = donor
+    return await sync_to_async(render)(request, 'core/dashboard_donor.html', context)
 
 
 # CREATE NEW HISTORY VIEW
@@ -175,20 +292,31 @@ def donor_history_view(request):
     except Donor.DoesNotExist:
         return redirect('create_donor_profile')
 
-    donation_list = BloodInventory.objects.filter(donor=donor).order_by('-date_collected')
-    request_list = BloodRequest.objects.filter(requestor=request.user).order_by('-request_date')
-
-    p_donations = Paginator(donation_list, 5)
-    d_page_num = request.GET.get('d_page')
-    page_donations = p_donations.get_page(d_page_num)
-
-    p_requests = Paginator(request_list, 5)
-    r_page_num = request.GET.get('r_page')
-    page_requests = p_requests.get_page(r_page_num)
+    donation_list = BloodInventory.objects.filter(donor=donor)
+    request_list = BloodRequest.objects.filter(requestor=request.user)
+
+    page_donations = keyset_page(
+        donation_list, ('-date_collected', '-id'), 5,
+        after=request.GET.get('d_after'), before=request.GET.get('d_before'),
+    )
+    page_requests = keyset_page(
+        request_list, ('-request_date', '-id'), 5,
+        after=request.GET.get('r_after'), before=request.GET.get('r_before'),
+    )
+
+    # Each card's links carry the other card's cursor so paging one list keeps the other in place.
+    donation_params = request.GET.copy()
+    request_params = request.GET.copy()
+    for key in ('d_after', 'd_before'):
+        donation_params.pop(key, None)
+    for key in ('r_after', 'r_before'):
+        request_params.pop(key, None)
 
     context = {
         'page_donations': page_donations,
         'page_requests': page_requests,
+        'donation_params': donation_params.urlencode(),
+        'request_params': request_params.urlencode(),
     }
     return render(request, 'core/history.html', context)
 
@@ -199,10 +327,20 @@ class CampaignListView(LoginRequiredMixin, ListView):
     paginate_by = 6
 
     def get_queryset(self):
-        if is_red_cross(self.request.user):
-            return Campaign.objects.all().order_by('-start_datetime')
-        else:
-            return Campaign.objects.filter(start_datetime__gte=timezone.now()).order_by('start_datetime')
+        return campaign_queryset(is_red_cross(self.request.user))
+
+    def paginate_queryset(self, queryset, page_size):
+        # Pages come from the shared per-role cache (core.campaigns), not from the queryset.
+        try:
+            page = get_campaign_page(is_red_cross(self.request.user), int(self.request.GET.get('page') or 1), page_size)
+        except (ValueError, InvalidPage):
+            raise Http404("Invalid page.")
+        return page.paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['manage'] = is_red_cross(self.request.user)
+        return context
 
 
 @login_required
@@ -269,18 +407,19 @@ def create_donor_profile(request):
 # MISSING INVENTORY VIEWS
 
 # UPDATED INVENTORY LIST VIEW
-class InventoryListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class InventoryListView(LoginRequiredMixin, UserPassesTestMixin, ReplicaReadsMixin, KeysetPaginationMixin, ListView):
     model = BloodInventory
     template_name = 'core/inventory_list.html'
     context_object_name = 'inventory_items'
-    ordering = ['expiry_date']
+    ordering = ['expiry_date', 'id']
+    keyset_ordering = ('expiry_date', 'id')
     paginate_by = 8  # LIMIT TO 8 PER PAGE
 
     def test_func(self):
         return is_red_cross(self.request.user)
 
     def get_queryset(self):
-        queryset = BloodInventory.objects.all().order_by('expiry_date')
+        queryset = BloodInventory.objects.select_related('donor__user').order_by(*self.keyset_ordering)
 
         search_query = self.request.GET.get('q')
         blood_filter = self.request.GET.get('blood_group')
@@ -297,13 +436,18 @@ class InventoryListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
 
         return queryset
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        query_params = self.request.GET.copy()
-        if 'page' in query_params:
-            del query_params['page']
-        context['search_params'] = query_params.urlencode()
-        return context
+class InventoryExportView(StreamingExportMixin, InventoryListView):
+    export_name = 'inventory'
+    export_fields = [
+        ('serial_number', 'serial_number'),
+        ('blood_group', 'blood_group'),
+        ('status', 'status'),
+        ('date_collected', 'date_collected'),
+        ('expiry_date', 'expiry_date'),
+        ('donor_first_name', 'donor__user__first_name'),
+        ('donor_last_name', 'donor__user__last_name'),
+        ('campaign', 'campaign__title'),
+    ]
 
 class InventoryCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = BloodInventory
@@ -318,6 +462,61 @@ class InventoryCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         form.instance.processed_by = self.request.user
         return super().form_valid(form)
 
+@login_required
+@user_passes_test(is_red_cross)
+def inventory_import(request):
+    result = None
+    if request.method == 'POST':
+        form = InventoryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Large uploads are spooled to a temp file by Django; wrap it so rows stream line by line.
+            stream = io.TextIOWrapper(form.cleaned_data['csv_file'].file, encoding='utf-8-sig', newline='')
+            result = import_inventory_csv(stream, processed_by=request.user)
+            messages.success(request, f"Imported {result.created} of {result.rows} blood units.")
+            form = InventoryImportForm()
+    else:
+        form = InventoryImportForm()
+
+    return render(request, 'core/inventory_import.html', {'form': form, 'result': result})
+
+@login_required
+@user_passes_test(is_red_cross)
+@replica_reads
+def inventory_report(request):
+    # Reads only the daily rollup; refreshed by the rollup_inventory command.
+    state = RollupState.objects.filter(pk=1).first()
+    last_day = state.last_day if state and state.last_day else timezone.localdate()
+    try:
+        report_day = min(parse_date(request.GET.get('date') or '') or last_day, last_day)
+    except ValueError:
+        report_day = last_day
+
+    counts = snapshot(report_day)
+    snapshot_rows = [
+        (group, [counts[group][status] for status in ROLLUP_STATUSES], sum(counts[group].values()))
+        for group in BLOOD_GROUPS
+    ]
+
+    trend = status_series('AVAILABLE', report_day - timedelta(days=REPORT_TREND_DAYS - 1), report_day)
+    trend_rows = [(day, sum(groups.values())) for day, groups in trend.items()]
+    trend_peak = max([total for _, total in trend_rows] + [1])
+
+    expired_rows = [
+        (month_end, [by_group[group] for group in BLOOD_GROUPS], sum(by_group.values()))
+        for month_end, by_group in monthly_expired(last_day)
+    ]
+
+    context = {
+        'state': state,
+        'report_day': report_day,
+        'statuses': ROLLUP_STATUSES,
+        'blood_groups': BLOOD_GROUPS,
+        'snapshot_rows': snapshot_rows,
+        'trend_rows': [(day, total, round(total * 100 / trend_peak)) for day, total in trend_rows],
+        'expired_rows': expired_rows,
+    }
+    return render(request, 'core/inventory_report.html', context)
+
 class InventoryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = BloodInventory
     form_class = InventoryDonationForm
@@ -327,6 +526,9 @@ class InventoryUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def test_func(self):
         return is_red_cross(self.request.user)
 
+    def get_queryset(self):
+        return BloodInventory.objects.select_related('donor__user')
+
 class InventoryDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = BloodInventory
     template_name = 'core/inventory_confirm_delete.html'
@@ -336,42 +538,122 @@ class InventoryDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return is_red_cross(self.request.user)
 
 # UPDATED DONOR LIST VIEW
-class DonorListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class DonorListView(LoginRequiredMixin, UserPassesTestMixin, ReplicaReadsMixin, KeysetPaginationMixin, ListView):
     model = Donor
     template_name = 'core/donor_list.html'
     context_object_name = 'donors'
-    ordering = ['-user__date_joined']
+    ordering = ['-id']
+    keyset_ordering = ('-id',)
     paginate_by = 8  # LIMIT TO 8 PER PAGE
 
     def test_func(self):
         return is_red_cross(self.request.user)
 
     def get_queryset(self):
-        queryset = Donor.objects.all().select_related('user').order_by('-id')
+        queryset = Donor.objects.all().select_related('user').order_by(*self.keyset_ordering)
 
         search_query = self.request.GET.get('q')
         blood_filter = self.request.GET.get('blood_type')
 
         if search_query:
-            queryset = queryset.filter(
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query) |
-                Q(user__username__icontains=search_query)
-            )
+            queryset = search_donors(queryset, search_query)
 
         if blood_filter:
             queryset = queryset.filter(blood_type=blood_filter)
 
         return queryset
 
+class DonorExportView(StreamingExportMixin, DonorListView):
+    export_name = 'donors'
+    export_fields = [
+        ('id', 'id'),
+        ('username', 'user__username'),
+        ('first_name', 'user__first_name'),
+        ('last_name', 'user__last_name'),
+        ('email', 'user__email'),
+        ('blood_type', 'blood_type'),
+        ('contact_no', 'contact_no'),
+        ('address', 'address'),
+    ]
+
+# DONOR RECALL
+# Donors to call when a blood type runs low: compatible with it and past the donation interval.
+class DonorRecallView(LoginRequiredMixin, UserPassesTestMixin, ReplicaReadsMixin, KeysetPaginationMixin, ListView):
+    model = Donor
+    template_name = 'core/donor_recall.html'
+    context_object_name = 'donors'
+    keyset_ordering = ('next_eligible_at', 'id')  # longest-eligible first
+    paginate_by = 50
+
+    def test_func(self):
+        return is_red_cross(self.request.user)
+
+    def get_recall(self):
+        blood_type = self.request.GET.get('blood_type')
+        if blood_type not in BLOOD_GROUPS:
+            blood_type = 'O-'
+        return blood_type, self.request.GET.get('match') != 'exact'
+
+    def get_queryset(self):
+        blood_type, compatible = self.get_recall()
+        return recall_queryset(blood_type, compatible).select_related('user').order_by(*self.keyset_ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        # Page each donor blood type on its own index range and merge, rather than sort every eligible donor.
+        page = merged_keyset_page(
+            [queryset.filter(blood_type=group) for group in recall_groups(*self.get_recall())],
+            self.keyset_ordering, page_size,
+            after=self.request.GET.get('after'), before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        query_params = self.request.GET.copy()
-        if 'page' in query_params:
-            del query_params['page']
-        context['search_params'] = query_params.urlencode()
+        blood_type, compatible = self.get_recall()
+        context.update({
+            'blood_type': blood_type,
+            'compatible': compatible,
+            'blood_groups': BLOOD_GROUPS,
+            'recall_count': recall_queryset(blood_type, compatible).count(),
+            'interval_days': DONATION_INTERVAL.days,
+            'alert_form': ShortageAlertForm(initial={
+                'blood_type': blood_type, 'match': 'compatible' if compatible else 'exact', 'channel': 'SMS',
+            }),
+        })
         return context
 
+@login_required
+@user_passes_test(is_red_cross)
+@require_POST
+def shortage_alert(request):
+    # Queues a single broadcast row; send_notifications fans it out to every eligible donor.
+    form = ShortageAlertForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, "The alert was not sent: a message and channel are required.")
+        return redirect('donor_recall')
+    data = form.cleaned_data
+    compatible = data['match'] != 'exact'
+    broadcast(
+        data['channel'], data['message'], subject=data['subject'], blood_type=data['blood_type'],
+        compatible=compatible, created_by=request.user,
+    )
+    messages.success(request, f"Shortage alert queued for eligible {data['blood_type']} donors.")
+    query = {'blood_type': data['blood_type'], 'match': 'compatible' if compatible else 'exact'}
+    return redirect(f"{reverse('donor_recall')}?{urlencode(query)}")
+
+class DonorRecallExportView(StreamingExportMixin, DonorRecallView):
+    export_name = 'donor-recall'
+    export_fields = [
+        ('id', 'id'),
+        ('first_name', 'user__first_name'),
+        ('last_name', 'user__last_name'),
+        ('email', 'user__email'),
+        ('contact_no', 'contact_no'),
+        ('blood_type', 'blood_type'),
+        ('last_donation_at', 'last_donation_at'),
+        ('eligible_since', 'next_eligible_at'),
+    ]
+
 class DonorUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Donor
     form_class = DonorForm
@@ -381,6 +663,9 @@ class DonorUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def test_func(self):
         return is_red_cross(self.request.user)
 
+    def get_queryset(self):
+        return Donor.objects.select_related('user')
+
 class DonorDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Donor
     template_name = 'core/donor_confirm_delete.html'
@@ -389,6 +674,9 @@ class DonorDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def test_func(self):
         return is_red_cross(self.request.user)
 
+    def get_queryset(self):
+        return Donor.objects.select_related('user')
+
 
 @login_required
 def profile_view(request):
@@ -439,18 +727,19 @@ class CampaignDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 # BLOOD REQUEST MANAGEMENT
 
-class RequestListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class RequestListView(LoginRequiredMixin, UserPassesTestMixin, ReplicaReadsMixin, KeysetPaginationMixin, ListView):
     model = BloodRequest
     template_name = 'core/request_list.html'
     context_object_name = 'requests'
-    ordering = ['-request_date']
+    ordering = ['-request_date', '-id']
+    keyset_ordering = ('-request_date', '-id')
     paginate_by = 8  # <--- LIMIT TO 8 PER PAGE
 
     def test_func(self):
         return is_red_cross(self.request.user)
 
     def get_queryset(self):
-        queryset = BloodRequest.objects.all().order_by('-request_date')
+        queryset = BloodRequest.objects.all().order_by(*self.keyset_ordering)
 
         search_query = self.request.GET.get('q')  # The search box
         status_filter = self.request.GET.get('status')  # The dropdown
@@ -458,11 +747,7 @@ class RequestListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         blood_filter = self.request.GET.get('blood_type')
 
         if search_query:
-            queryset = queryset.filter(
-                Q(patient_name__icontains=search_query) |
-                Q(hospital_name__icontains=search_query) |
-                Q(physician_name__icontains=search_query)
-            )
+            queryset = search_requests(queryset, search_query)
 
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -475,13 +760,23 @@ class RequestListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
 
         return queryset
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        query_params = self.request.GET.copy()
-        if 'page' in query_params:
-            del query_params['page']
-        context['search_params'] = query_params.urlencode()
-        return context
+
+class RequestExportView(StreamingExportMixin, RequestListView):
+    export_name = 'blood-requests'
+    export_fields = [
+        ('id', 'id'),
+        ('request_date', 'request_date'),
+        ('patient_name', 'patient_name'),
+        ('patient_blood_type', 'patient_blood_type'),
+        ('component', 'component'),
+        ('quantity', 'quantity'),
+        ('urgency', 'urgency'),
+        ('status', 'status'),
+        ('hospital_name', 'hospital_name'),
+        ('physician_name', 'physician_name'),
+        ('physician_license', 'physician_license'),
+        ('assigned_bag', 'assigned_bag__serial_number'),
+    ]
 
 
 class RequestUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
@@ -493,70 +788,110 @@ class RequestUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def test_func(self):
         return is_red_cross(self.request.user)
 
+    def get_queryset(self):
+        return BloodRequest.objects.select_related('requestor__donor_profile', 'assigned_bag')
+
     def form_valid(self, form):
         new_status = form.cleaned_data['status']
         selected_bag = form.cleaned_data['blood_bag']
         request_obj = form.instance
 
-        if new_status == 'APPROVED':
-            if not selected_bag:
-                form.add_error('blood_bag', 'You must select a blood bag to approve this request.')
-                return self.form_invalid(form)
-
-            selected_bag.status = 'RESERVED'
-            selected_bag.save()
-            request_obj.assigned_bag = selected_bag
-
-        elif new_status == 'COMPLETED':
-            bag_to_distribute = selected_bag or request_obj.assigned_bag
-
-            if bag_to_distribute:
-                bag_to_distribute.status = 'DISTRIBUTED'
-                bag_to_distribute.save()
+        # Every bag status change below is a conditional UPDATE, so two staff members working the
+        # queue at the same time can't reserve or hand out the same unit.
+        with transaction.atomic():
+            locked = BloodRequest.objects.select_for_update().select_related('assigned_bag').get(pk=request_obj.pk)
+            current_bag = locked.assigned_bag
+
+            if locked.status == 'COMPLETED':
+                # The unit has left the blood bank: re-saving is a no-op, anything else is refused
+                # rather than handing a distributed bag back to stock or to an open request.
+                changed_bag = selected_bag is not None and selected_bag.pk != getattr(current_bag, 'pk', None)
+                if new_status != 'COMPLETED' or changed_bag:
+                    form.add_error('status', "This request is completed and its blood bag already distributed; it can't be changed.")
+                    return self.form_invalid(form)
+                request_obj.assigned_bag = current_bag
+
+            elif new_status == 'APPROVED':
+                if current_bag and (not selected_bag or selected_bag.pk == current_bag.pk):
+                    bag = current_bag
+                elif not selected_bag:
+                    form.add_error('blood_bag', 'You must select a blood bag to approve this request.')
+                    return self.form_invalid(form)
+                else:
+                    bag = reserve_unit(request_obj.patient_blood_type, preferred=selected_bag)
+                    if bag is None:
+                        form.add_error('blood_bag', 'No compatible blood bag is available anymore.')
+                        return self.form_invalid(form)
+                    if bag.pk != selected_bag.pk:
+                        messages.warning(
+                            self.request,
+                            f"{selected_bag.serial_number} was taken by another request; "
+                            f"reserved {bag.serial_number} ({bag.blood_group}) instead.",
+                        )
+                    if current_bag:
+                        release_unit(current_bag)
+                request_obj.assigned_bag = bag
+
+            elif new_status == 'COMPLETED':
+                bag_to_distribute = selected_bag or current_bag
+
+                if not bag_to_distribute:
+                    form.add_error('blood_bag', 'No blood bag assigned. Please select one to complete distribution.')
+                    return self.form_invalid(form)
+
+                held = current_bag is not None and bag_to_distribute.pk == current_bag.pk
+                if not distribute_unit(bag_to_distribute, request_obj.patient_blood_type, held=held):
+                    form.add_error('blood_bag', f"{bag_to_distribute.serial_number} is no longer available for distribution.")
+                    return self.form_invalid(form)
+                if current_bag and not held:
+                    release_unit(current_bag)
                 request_obj.assigned_bag = bag_to_distribute
-            else:
-                form.add_error('blood_bag', 'No blood bag assigned. Please select one to complete distribution.')
-                return self.form_invalid(form)
-
-        elif new_status in ['PENDING', 'REJECTED']:
-            if request_obj.assigned_bag:
-                old_bag = request_obj.assigned_bag
-                old_bag.status = 'AVAILABLE'
-                old_bag.save()
+
+            elif new_status in ['PENDING', 'REJECTED']:
+                if current_bag:
+                    release_unit(current_bag)
                 request_obj.assigned_bag = None
 
-        messages.success(self.request, f"Request updated to {new_status}")
-        return super().form_valid(form)
+            response = super().form_valid(form)
+            if new_status != locked.status:
+                # Queued in this transaction; send_notifications delivers it after commit.
+                notify_request_status(request_obj)
+            messages.success(self.request, f"Request updated to {new_status}")
+            return response
 
 @login_required
 @user_passes_test(lambda u: u.is_superuser)  # Only Superusers can access
-def superuser_dashboard(request):
-    pending_requests = BloodRequest.objects.filter(status='PENDING').count()
-    available_blood = BloodInventory.objects.filter(status='AVAILABLE').count()
-    active_campaigns = Campaign.objects.filter(end_datetime__gt=timezone.now()).count()
-
-    total_donors = Donor.objects.count()
-    total_volunteers = User.objects.filter(is_staff=True, is_superuser=False).count()
+async def superuser_dashboard(request):
+    # A single cached read, so nothing to gather; async only so it shares the ASGI path with the others.
+    summary = (await run_reads(request, {'summary': get_stock_summary}))['summary']
 
     context = {
-        'pending_requests': pending_requests,
-        'available_blood': available_blood,
-        'active_campaigns': active_campaigns,
-        'total_donors': total_donors,
-        'total_volunteers': total_volunteers,
+        'pending_requests': summary['pending_requests'],
+        'available_blood': summary['available_blood'],
+        'available_by_group': summary['available_by_group'],
+        'active_campaigns': summary['active_campaigns'],
+        'total_donors': summary['total_donors'],
+        'total_volunteers': summary['total_volunteers'],
     }
-    return render(request, 'core/dashboard_superuser.html', context)
+    return await sync_to_async(render)(request, 'core/dashboard_superuser.html', context)
 
 @login_required
-def dashboard_view(request):
-    if request.user.is_superuser:
-        return redirect('superuser_dashboard')
-
-    elif request.user.is_staff or request.user.groups.filter(name='Red Cross').exists():
-        return redirect('redcross_dashboard')
-
-    else:
-        return redirect('donor_dashboard')
+@user_passes_test(lambda u: u.is_superuser)
+def query_profile(request):
+    try:
+        days = min(max(int(request.GET.get('days', 1)), 1), PROFILE_RETENTION.days)
+    except ValueError:
+        days = 1
+    since = timezone.now() - timedelta(days=days)
+    context = {
+        'rows': summarize_profiles(since),
+        'slow_requests': slow_requests(since),
+        'days': days,
+        'day_choices': [1, PROFILE_RETENTION.days],
+        'sample_rate': settings.SQL_PROFILE_SAMPLE_RATE * 100,
+        'slow_ms': settings.SQL_PROFILE_SLOW_MS,
+    }
+    return render(request, 'core/query_profile.html', context)
 
 class VolunteerListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = User
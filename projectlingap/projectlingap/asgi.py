@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projectlingap.settings')
 
+# Persistent connections are closed by the request_started/request_finished handlers on the thread that
+# runs them; under ASGI the ORM runs on executor threads those handlers never visit, so a kept connection
+# would outlive its request. Every request opens and closes its own instead.
+for database in settings.DATABASES.values():
+    database['CONN_MAX_AGE'] = 0
+
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,10 +43,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.replica.ReplicaPinMiddleware',  # removes itself when no replica is configured
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.roles.RoleMiddleware',
+    'core.profiling.SQLProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,7 +58,8 @@ ROOT_URLCONF = 'projectlingap.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfiledDjangoTemplates',  # DjangoTemplates, timed for the SQL profiler
+        'NAME': 'django',
         'DIRS': [BASE_DIR/ 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,14 +77,77 @@ WSGI_APPLICATION = 'projectlingap.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# SQLite tuned for several people writing at once (benchmarks/sqlite_concurrency.py compares it with the bare file):
+# - WAL lets readers carry on while a writer commits. synchronous=NORMAL is safe under WAL: a power cut can lose
+#   the last commits but not corrupt the file.
+# - cache_size (negative = KiB, per connection), mmap_size and temp_store keep hot pages and temp b-trees in memory.
+# - IMMEDIATE transactions take the write lock at BEGIN. Two read-then-write transactions (reserving a unit,
+#   recording a donation) then queue on the busy timeout instead of one failing with "database is locked" when
+#   it tries to upgrade its read lock.
+# - CONN_MAX_AGE keeps each WSGI worker's connection, and its warm page cache, between requests. asgi.py turns it
+#   off: under ASGI the ORM runs on executor threads where a kept connection would outlive its request.
+
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-32000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+]
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # seconds a connection waits for the write lock before "database is locked"
+        },
     }
 }
 
+# READ REPLICA
+# List pages, exports, dashboards and reports read core tables from a 'replica' alias when one is configured
+# (see core.replica); writes, locks and transactions stay on 'default'. A client is pinned to 'default' for
+# REPLICA_PIN_SECONDS after each POST so it reads its own writes; keep it above the replica's usual lag.
+# Locally, LINGAP_REPLICA_DB names a second SQLite file kept in step with `manage.py sync_replica --interval 5`.
+DATABASE_ROUTERS = ['core.replica.ReplicaRouter']
+REPLICA_PIN_SECONDS = 10
+
+if os.environ.get('LINGAP_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['LINGAP_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Dashboard stock counts, campaign list pages, availability ETags and role versions are cached here, and writes
+# invalidate them by bumping version keys. Those bumps only reach every worker process through a shared cache with
+# an atomic incr(), so production needs Redis (or another such backend): set LINGAP_REDIS_URL (needs the redis
+# package). Without it each process keeps its own in-memory cache, which is fine for runserver and the tests; under
+# several workers the others serve stale values until the timeouts on them run out.
+
+if os.environ.get('LINGAP_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['LINGAP_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'projectlingap',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -122,7 +190,40 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
-import os
+# NOTIFICATIONS
+# Queued by core.outbox and sent by `manage.py send_notifications`. Point EMAIL_BACKEND at SMTP and
+# SMS_BACKEND at a gateway client (any class with send(to, body)) in production.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Project Lingap <no-reply@projectlingap.local>'
+SMS_BACKEND = 'core.sms.ConsoleBackend'
+
+# SQL PROFILING
+# core.profiling.SQLProfileMiddleware records queries, DB time and render time for a random sample of
+# requests (a superuser can force one with ?_profile=1); the summary is at /dashboard/admin/queries/.
+# Sampled requests slower than SQL_PROFILE_SLOW_MS are also written to slow_requests.log as JSON lines.
+SQL_PROFILE_SAMPLE_RATE = 0.01
+SQL_PROFILE_SLOW_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'slow_requests.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.profiling.slow': {'handlers': ['slow_requests'], 'level': 'WARNING', 'propagate': False},
+    },
+}
 
 STATIC_URL = 'static/'
 